@@ -0,0 +1,370 @@
+#########################################################
+#                                                       #
+# bench_precure_colormap.py                             #
+#                                                       #
+# precure_colormap のベンチマーク                        #
+#                                                       #
+#########################################################
+
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import timeit
+import tracemalloc
+
+import numpy as np
+from matplotlib.colors import LinearSegmentedColormap
+from matplotlib.colors import ListedColormap
+
+import precure_colorize
+import precure_colormap
+
+
+# 保存した基準値のファイル
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_baseline.json')
+
+# 基準値よりこの倍率以上遅くなったら (メモリが増えたら) 劣化とみなす
+DEFAULT_THRESHOLD = 1.5
+
+# 計測結果。ラベル -> {'seconds': 1回あたりの時間, 'peak_bytes': ピークメモリ}
+results = dict()
+
+
+def bench(func, number=10, repeat=5):
+    '''
+    func を number 回呼ぶのを repeat 回繰り返し、1回あたりの最速の時間 [秒] を返す
+    '''
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+
+def peak_memory(func):
+    '''
+    func を1回呼んだときに、新しく確保したメモリのピーク [byte] を返す
+    (tracemalloc で追える、Python と NumPy の確保だけ)
+    '''
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def report(label, seconds, baseline=None, peak_bytes=None):
+    results[label] = {'seconds': seconds, 'peak_bytes': peak_bytes}
+    line = '{:<40s} {:>12.1f} us'.format(label, seconds * 1e6)
+    if peak_bytes is not None:
+        line += ' {:>10.1f} KiB'.format(peak_bytes / 1024)
+    if baseline is not None:
+        line += '  (x{:.1f})'.format(baseline / seconds)
+    print(line)
+
+
+def measure(label, func, number=10, repeat=5, baseline=None):
+    '''
+    func の時間とピークメモリを測って report する
+    '''
+    seconds = bench(func, number, repeat)
+    report(label, seconds, baseline, peak_memory(func))
+    return seconds
+
+
+
+#########################################################
+#                                                       #
+# 基準値との比較                                         #
+#                                                       #
+#########################################################
+
+def save_baseline(path=BASELINE):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=1, sort_keys=True)
+
+
+def compare_baseline(path=BASELINE, threshold=DEFAULT_THRESHOLD):
+    '''
+    計測結果を保存した基準値と比べる
+
+    Returns
+    ------
+    list of str
+        劣化した項目の説明。なければ空
+    '''
+    with open(path) as f:
+        baseline = json.load(f)
+
+    regressions = []
+    for label, result in sorted(results.items()):
+        base = baseline.get(label)
+        if base is None:
+            continue
+        for key, unit in [('seconds', 's'), ('peak_bytes', 'B')]:
+            old = base.get(key)
+            new = result.get(key)
+            if not old or new is None:
+                continue
+            if new > old * threshold:
+                regressions.append('{}: {} {:.3g}{} -> {:.3g}{} (x{:.2f})'.format(
+                    label, key, old, unit, new, unit, new / old))
+    return regressions
+
+
+
+#########################################################
+#                                                       #
+# import と初期化                                        #
+#                                                       #
+#########################################################
+
+IMPORT_SCRIPT = """
+import time
+t = time.perf_counter()
+import precure_colormap
+print(time.perf_counter() - t)
+"""
+
+def bench_import(repeat=5):
+    # 毎回新しいプロセスで測る
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    times = [float(subprocess.run([sys.executable, '-c', IMPORT_SCRIPT], cwd=cwd, check=True,
+                                  capture_output=True, text=True).stdout)
+             for _ in range(repeat)]
+    print('# import')
+    report('import precure_colormap', min(times))
+
+
+def bench_construction():
+    print('# cure_colormap()')
+    measure('cure_colormap()', precure_colormap.cure_colormap, number=1000)
+
+
+def bench_get_by_name():
+    cure_colors = precure_colormap.cure_colormap()
+    registry = precure_colormap.get_registry()
+    names = list(registry.palettes)
+
+    def lookup_all():
+        for name in names:
+            cure_colors.get_by_name(name)
+
+    print('# get_by_name ({} names)'.format(len(names)))
+    # 初回はカラーマップを生成する
+    measure('get_by_name first call (all names)', lambda: [precure_colormap.cure_colormap().get_by_name(name) for name in names],
+            number=1, repeat=5)
+    seconds = measure('get_by_name cached (all names)', lookup_all, number=20)
+    print('{:<40s} {:>12.0f} lookups/s'.format('', len(names) / seconds))
+    measure('get_by_name normalized', lambda: cure_colors.get_by_name('cure black'), number=1000)
+    measure('get_by_name miss', lambda: cure_colors.get_by_name('キュアゴリラ'), number=1000)
+
+
+def bench_footprint():
+    # すべての配色のカラーマップと LUT を使った後のメモリ (memory_report)
+    names = [palette.name for palette in precure_colormap.get_registry().entries]
+    print('# memory_report after using all {} palettes'.format(len(names)))
+    for label, compact in [('cure_colormap()', False), ('cure_colormap(compact=True)', True)]:
+        cure_colors = precure_colormap.cure_colormap(compact=compact)
+        for name in names:
+            cmap = cure_colors.get_by_name(name)
+            if cmap is not None:
+                cmap(0.5)
+            cure_colors.get_lut(name)
+        del cmap
+        memory = cure_colors.memory_report()
+        print('{:<40s} {:>10.1f} KiB  ({})'.format(label, memory['total'] / 1024, ', '.join(
+            '{} {:.1f}'.format(key, value / 1024) for key, value in memory.items() if key != 'total')))
+        measure('get_lut all ({})'.format('compact' if compact else 'default'),
+                lambda: [cure_colors.get_lut(name) for name in names], number=20)
+
+
+#########################################################
+#                                                       #
+# カラーマップの一括生成                                 #
+#                                                       #
+#########################################################
+
+def generate_cmaps_loop(palettes):
+    # generate_cmaps_batch を入れる前の、1人ずつ from_list で作る方法
+    cmaps = []
+    for palette in palettes:
+        colors = list(palette.colors)
+        if palette.kind == 'qualitative':
+            cmaps.append(ListedColormap(colors))
+            continue
+        vmax = len(colors) - 1
+        cmaps.append(LinearSegmentedColormap.from_list('custom_cmap', [(v / vmax, c) for v, c in enumerate(colors)]))
+    return cmaps
+
+
+def bench_generate_cmaps_batch():
+    cure_colors = precure_colormap.cure_colormap()
+    entries = precure_colormap.get_registry().entries
+    hex_palettes = [list(palette.colors) for palette in entries]
+
+    print('# generate_cmaps_batch ({} palettes)'.format(len(entries)))
+    loop = bench(lambda: generate_cmaps_loop(entries))
+    report('per-call from_list loop', loop)
+    report('generate_cmaps_batch (hex)', bench(lambda: cure_colors.generate_cmaps_batch(hex_palettes)), loop)
+    report('generate_cmaps_batch (cure_palette)', bench(lambda: cure_colors.generate_cmaps_batch(entries)), loop)
+
+    # generate_cmap_q は以前 seaborn を通していた
+    qualitative = [colors for colors, palette in zip(hex_palettes, entries) if palette.kind == 'qualitative']
+    try:
+        import seaborn as sns
+    except ImportError:
+        sns = None
+    print('# generate_cmap_q ({} palettes)'.format(len(qualitative)))
+    seaborn_time = None
+    if sns is not None:
+        seaborn_time = bench(lambda: [ListedColormap(sns.color_palette(colors).as_hex()) for colors in qualitative])
+        report('ListedColormap(sns.color_palette)', seaborn_time)
+    report('generate_cmap_q', bench(lambda: [cure_colors.generate_cmap_q(colors) for colors in qualitative]),
+           seaborn_time)
+
+
+
+#########################################################
+#                                                       #
+# 並列の色付け                                           #
+#                                                       #
+#########################################################
+
+def bench_colorize_parallel(size=4096, max_workers=None):
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    data = np.random.default_rng(0).random((size, size), dtype=np.float32)
+    out = np.empty(data.shape + (4,), dtype=np.uint8)
+    cmap = precure_colormap.cure_colormap.default().get_by_name('Cure Twinkle')
+
+    print('# colorize_parallel ({0}x{0} float32)'.format(size))
+    single = bench(lambda: cmap(data), number=1, repeat=3)
+    report('cmap(data)', single)
+    workers = 1
+    while True:
+        report('colorize_parallel workers={}'.format(workers),
+               bench(lambda: precure_colorize.colorize_parallel(data, 'Cure Twinkle', out, 0, 1, workers=workers),
+                     number=1, repeat=3),
+               single)
+        if workers >= max_workers:
+            break
+        workers = min(workers * 2, max_workers)
+
+
+
+#########################################################
+#                                                       #
+# cmap(data) と描画                                      #
+#                                                       #
+#########################################################
+
+def bench_cmap_data(max_size=10 ** 7):
+    cmap = precure_colormap.cure_colormap.default().get_by_name('Cure Twinkle')
+    rng = np.random.default_rng(0)
+
+    print('# cmap(data)')
+    size = 10 ** 3
+    while size <= max_size:
+        data = rng.random(size)
+        number = max(1, 10 ** 6 // size)
+        measure('cmap(data) 1e{}'.format(len(str(size)) - 1), lambda: cmap(data),
+                number=number, repeat=3 if size >= 10 ** 7 else 5)
+        size *= 10
+        del data
+
+
+def bench_colors_for_categories(size=10 ** 6):
+    try:
+        import pandas as pd
+    except ImportError:
+        print('# colors_for_categories: pandas is not installed')
+        return
+    cure_colors = precure_colormap.cure_colormap.default()
+    cmap = cure_colors.get_by_name('キュアコスモ')
+    labels = pd.Series(np.random.default_rng(0).choice(['label{}'.format(i) for i in range(12)], size))
+
+    def by_row():
+        # 行ごとに辞書で色を引く、これまでのやり方
+        colors = dict((label, cmap.colors[i % len(cmap.colors)]) for i, label in enumerate(sorted(labels.unique())))
+        return np.array(labels.map(colors).tolist())
+
+    print('# colors_for_categories ({:.0e} labels, 12 categories)'.format(size))
+    baseline = measure('Series.map + tolist', by_row, number=1, repeat=3)
+    measure('colors_for_categories', lambda: cure_colors.colors_for_categories(labels, 'キュアコスモ'),
+            number=1, repeat=3, baseline=baseline)
+    measure('colors_for_categories categorical', lambda: cure_colors.colors_for_categories(
+        labels.astype('category'), 'キュアコスモ'), number=1, repeat=3, baseline=baseline)
+
+
+def bench_sample_colormap_all():
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    cure_colors = precure_colormap.cure_colormap()
+
+    def render():
+        fig = cure_colors.plot_palette_sheet(width=256)
+        fig.canvas.draw()
+        plt.close(fig)
+
+    print('# sample_colormap_all (Agg)')
+    measure('plot_palette_sheet + draw', render, number=1, repeat=5)
+
+
+
+#########################################################
+#                                                       #
+# main                                                  #
+#                                                       #
+#########################################################
+
+BENCHMARKS = {
+    'import': bench_import,
+    'construction': bench_construction,
+    'get_by_name': bench_get_by_name,
+    'footprint': bench_footprint,
+    'generate_cmaps_batch': bench_generate_cmaps_batch,
+    'cmap_data': bench_cmap_data,
+    'colorize_parallel': bench_colorize_parallel,
+    'colors_for_categories': bench_colors_for_categories,
+    'sample_colormap_all': bench_sample_colormap_all,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='precure_colormap のベンチマーク')
+    parser.add_argument('benchmarks', nargs='*', metavar='NAME',
+                        help='実行するベンチマーク ({})。省略した場合はすべて'.format(', '.join(BENCHMARKS)))
+    parser.add_argument('--max-size', type=float, default=1e7,
+                        help='cmap(data) で試す配列の最大の要素数 (1e8 には 4GB 程度のメモリが必要)')
+    parser.add_argument('--save', action='store_true', help='結果を基準値として保存する')
+    parser.add_argument('--compare', action='store_true', help='保存した基準値と比べ、劣化していたら終了コード 1')
+    parser.add_argument('--baseline', default=BASELINE, help='基準値のファイル')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='劣化とみなす倍率 (既定 {})'.format(DEFAULT_THRESHOLD))
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.benchmarks if name not in BENCHMARKS]
+    if unknown:
+        parser.error('unknown benchmark: ' + ', '.join(unknown))
+
+    for name in args.benchmarks or list(BENCHMARKS):
+        if name == 'cmap_data':
+            bench_cmap_data(int(args.max_size))
+        else:
+            BENCHMARKS[name]()
+
+    if args.save:
+        save_baseline(args.baseline)
+    if args.compare:
+        regressions = compare_baseline(args.baseline, args.threshold)
+        for line in regressions:
+            print('REGRESSION ' + line)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
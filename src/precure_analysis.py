@@ -0,0 +1,708 @@
+#########################################################
+#                                                       #
+# precure_analysis.py                                   #
+#                                                       #
+# プリキュアの配色を知覚的な色空間 (CIELAB) で            #
+# 比べるための道具                                       #
+#                                                       #
+#########################################################
+
+
+import numpy as np
+
+import precure_colormap
+
+
+
+#########################################################
+#                                                       #
+# 色空間の変換                                           #
+#                                                       #
+#########################################################
+
+# sRGB (D65) -> XYZ
+_SRGB_TO_XYZ = np.array([
+    [0.4124564, 0.3575761, 0.1804375],
+    [0.2126729, 0.7151522, 0.0721750],
+    [0.0193339, 0.1191920, 0.9503041],
+])
+
+# D65 の白色点
+_WHITE_D65 = np.array([0.95047, 1.0, 1.08883])
+
+
+def srgb_to_linear(rgb):
+    '''
+    sRGB (0-1) をリニア RGB にする
+    '''
+    rgb = np.asarray(rgb, dtype=np.float64)
+    return np.where(rgb <= 0.04045, rgb / 12.92, ((rgb + 0.055) / 1.055) ** 2.4)
+
+
+def linear_to_srgb(rgb):
+    '''
+    リニア RGB を sRGB (0-1) にする
+    '''
+    rgb = np.clip(np.asarray(rgb, dtype=np.float64), 0, 1)
+    return np.where(rgb <= 0.0031308, rgb * 12.92, 1.055 * rgb ** (1 / 2.4) - 0.055)
+
+
+def rgb_to_lab(rgb):
+    '''
+    sRGB を CIELAB (D65) にする
+
+    Parameters
+    ---------
+    rgb : array_like, shape (..., 3)
+        sRGB の色。uint8 なら 0-255、それ以外は 0-1 とみなす
+
+    Returns
+    ------
+    numpy.ndarray of float64, shape (..., 3)
+        L*, a*, b*
+
+    '''
+    rgb = np.asarray(rgb)
+    if rgb.dtype == np.uint8:
+        rgb = rgb / 255.0
+    xyz = srgb_to_linear(rgb[..., :3]) @ _SRGB_TO_XYZ.T / _WHITE_D65
+
+    epsilon = 216 / 24389
+    kappa = 24389 / 27
+    f = np.where(xyz > epsilon, np.cbrt(xyz), (kappa * xyz + 16) / 116)
+    lab = np.empty(xyz.shape)
+    lab[..., 0] = 116 * f[..., 1] - 16
+    lab[..., 1] = 500 * (f[..., 0] - f[..., 1])
+    lab[..., 2] = 200 * (f[..., 1] - f[..., 2])
+    return lab
+
+
+def delta_e(lab1, lab2):
+    '''
+    CIE76 の色差 (CIELAB でのユークリッド距離)
+    '''
+    return np.sqrt(np.sum((np.asarray(lab1) - np.asarray(lab2)) ** 2, axis=-1))
+
+
+
+#########################################################
+#                                                       #
+# 配色をまとめた配列                                     #
+#                                                       #
+#########################################################
+
+def pack_palettes(palettes):
+    '''
+    配色の RGB を1本の配列にまとめる
+
+    Parameters
+    ---------
+    palettes : array of cure_palette
+
+    Returns
+    ------
+    rgb : numpy.ndarray of float64, shape (色の総数, 3)
+        0-1 の sRGB
+
+    offsets : numpy.ndarray of int, shape (配色の数 + 1,)
+        i 番目の配色は rgb[offsets[i]:offsets[i + 1]]
+
+    '''
+    counts = [len(palette.rgb) for palette in palettes]
+    offsets = np.zeros(len(counts) + 1, dtype=np.intp)
+    np.cumsum(counts, out=offsets[1:])
+    if offsets[-1] == 0:
+        return np.zeros((0, 3)), offsets
+    rgb = np.concatenate([palette.rgb for palette in palettes]) / 255.0
+    return rgb, offsets
+
+
+def sample_palettes(rgb, offsets, kinds, m):
+    '''
+    まとめた配色から、各配色のカラーマップを m 点ずつ一度に取り出す
+
+    'linear' は色の間を直線補間したグラデーション、
+    'qualitative' は色を等分に並べた帯として取り出す
+
+    Parameters
+    ---------
+    rgb, offsets : pack_palettes の戻り値
+
+    kinds : array of str
+        各配色の種類
+
+    m : int
+        取り出す点の数
+
+    Returns
+    ------
+    numpy.ndarray of float64, shape (配色の数, m, 3)
+
+    '''
+    counts = np.diff(offsets)
+    n_palettes = len(counts)
+    if n_palettes == 0:
+        return np.zeros((0, m, 3))
+    t = np.linspace(0, 1, m)
+    qualitative = np.asarray(kinds) == 'qualitative'
+
+    # 各点が何番目の色の区間にあるか
+    last = np.maximum(counts - 1, 0)[:, np.newaxis]
+    position = np.where(qualitative[:, np.newaxis],
+                        np.minimum(np.floor(t * counts[:, np.newaxis]), last),
+                        t * last)
+    lower = np.floor(position).astype(np.intp)
+    upper = np.minimum(lower + 1, last)
+    frac = (position - lower)[..., np.newaxis]
+
+    start = offsets[:-1, np.newaxis]
+    return rgb[start + lower] * (1 - frac) + rgb[start + upper] * frac
+
+
+
+#########################################################
+#                                                       #
+# 知覚的な均一さ                                         #
+#                                                       #
+#########################################################
+
+def stop_positions(rgb, offsets, samples=32):
+    '''
+    まとめた配色の各色を、CIELAB での道のり (ΔE の累積) が等間隔になる位置に置き直す
+
+    色の間は sRGB で直線補間するので、区間の長さは samples 点に分けた ΔE の和で測る。
+    同じ色が続く区間は長さ 0 になり、2つの色は同じ位置に重なる
+
+    Parameters
+    ---------
+    rgb, offsets : pack_palettes の戻り値
+
+    samples : int
+        区間の長さを測るときの分割数
+
+    Returns
+    ------
+    numpy.ndarray of float64, shape (色の総数,)
+        各色の位置 (0-1)。配色ごとに offsets で区切る。
+        全部が同じ色の配色は等間隔のまま
+
+    '''
+    rgb = np.asarray(rgb, dtype=np.float64)
+    offsets = np.asarray(offsets)
+    n_colors = len(rgb)
+    counts = np.diff(offsets)
+
+    # 隣り合う色の区間の長さ。配色の境目をまたぐ区間は 0
+    lengths = np.zeros(max(n_colors - 1, 0))
+    if n_colors > 1:
+        t = np.linspace(0, 1, samples)[:, np.newaxis]
+        lab = rgb_to_lab(rgb[:-1, np.newaxis] * (1 - t) + rgb[1:, np.newaxis] * t)
+        lengths = delta_e(lab[:, 1:], lab[:, :-1]).sum(axis=1)
+        boundaries = offsets[1:-1] - 1
+        lengths[boundaries[(boundaries >= 0) & (boundaries < n_colors - 1)]] = 0
+    distance = np.concatenate([[0.0], np.cumsum(lengths)])
+
+    # 各色が何番目の配色か
+    palette = np.repeat(np.arange(len(counts)), counts)
+    start = offsets[:-1][palette]
+    end = np.maximum(offsets[1:] - 1, offsets[:-1])[palette]
+    total = distance[end] - distance[start]
+
+    even = (np.arange(n_colors) - start) / np.maximum(end - start, 1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        positions = np.where(total > 0, (distance - distance[start]) / total, even)
+    return positions
+
+
+def uniform_positions(colors, samples=32):
+    '''
+    1つの配色について stop_positions を求める
+
+    Parameters
+    ---------
+    colors : array of color
+        色の配列。色は16進数か色名で指定
+
+    Returns
+    ------
+    numpy.ndarray of float64, shape (色の数,)
+
+    '''
+    rgb = precure_colormap._decode_colors(colors)[:, :3]
+    return stop_positions(rgb, np.array([0, len(rgb)]), samples)
+
+
+def _step_cv(steps):
+    # ΔE の刻みの変動係数 (標準偏差 / 平均)。0 なら完全に均一
+    mean = steps.mean(axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(mean > 0, steps.std(axis=-1) / mean, 0.0)
+
+
+class cure_uniformity :
+    '''登録されている全カラーマップの、明度と色差の変化をまとめて計算したもの
+
+    Attributes
+    ----------
+    registry : cure_registry instance
+        計算したレジストリ
+
+    names : list of str
+        配色の名称 (英語名)
+
+    lightness : numpy.ndarray, shape (配色の数, samples)
+        各カラーマップを samples 点取り出したときの明度 L*
+
+    steps : numpy.ndarray, shape (配色の数, samples - 1)
+        隣り合う点の色差 ΔE
+
+    step_cv : numpy.ndarray, shape (配色の数,)
+        steps の変動係数。大きいほど色の変わり方にむらがある
+
+    monotonic : numpy.ndarray of bool, shape (配色の数,)
+        明度が単調に増える (または減る) か
+
+    positions : numpy.ndarray, shape (色の総数,)
+        知覚的に均一になるよう置き直した各色の位置 (stop_positions)
+
+    '''
+    def __init__(self, registry, samples=256):
+        self.registry = registry
+        self.samples = samples
+        palettes = list(registry.entries)
+        self.names = [palette.name for palette in palettes]
+        self._index = dict((name, i) for i, name in enumerate(self.names))
+
+        rgb, self.offsets = pack_palettes(palettes)
+        self.kinds = np.array([palette.kind for palette in palettes])
+        lab = rgb_to_lab(sample_palettes(rgb, self.offsets, self.kinds, samples))
+        self.lightness = lab[..., 0]
+        self.steps = delta_e(lab[:, 1:], lab[:, :-1])
+        self.step_cv = _step_cv(self.steps)
+
+        dl = np.diff(self.lightness, axis=1)
+        self.monotonic = np.all(dl >= -1e-6, axis=1) | np.all(dl <= 1e-6, axis=1)
+        self.positions = stop_positions(rgb, self.offsets)
+
+    def _lookup(self, name):
+        palette = self.registry.palettes.get(name)
+        if palette is None:
+            raise KeyError(name)
+        return self._index[palette.name]
+
+    def profile(self, name):
+        '''
+        カラーマップの明度と色差の変化を返す
+
+        Parameters
+        ---------
+        name : str
+            プリキュアの名称
+
+        Returns
+        ------
+        (numpy.ndarray, numpy.ndarray)
+            明度 L* (samples 点) と、隣り合う点の色差 ΔE (samples - 1 点)
+
+        '''
+        i = self._lookup(name)
+        return self.lightness[i], self.steps[i]
+
+    def positions_of(self, name):
+        '''
+        知覚的に均一になるよう置き直した、配色の各色の位置を返す
+        '''
+        i = self._lookup(name)
+        return self.positions[self.offsets[i]:self.offsets[i + 1]]
+
+    def least_uniform(self, k=5):
+        '''
+        色の変わり方のむらが大きいグラデーションの配色を返す
+        (Qualitative な配色は色が飛ぶのが当たり前なので除く)
+
+        Returns
+        ------
+        list of (str, float)
+            配色の名称と step_cv を、大きい順に並べたもの
+
+        '''
+        linear = np.flatnonzero(self.kinds == 'linear')
+        order = linear[np.argsort(-self.step_cv[linear], kind='stable')][:k]
+        return [(self.names[i], float(self.step_cv[i])) for i in order]
+
+
+_uniformity = precure_colormap.registry_cache(cure_uniformity)
+
+def get_uniformity(registry=None):
+    '''
+    レジストリの全カラーマップの均一さの計算結果を返す。レジストリが変わったときだけ計算し直す
+
+    Parameters
+    ---------
+    registry : cure_registry instance
+        省略した場合はプロセス全体のレジストリ
+
+    Returns
+    ------
+    cure_uniformity instance
+
+    '''
+    return _uniformity.get(registry)
+
+
+
+#########################################################
+#                                                       #
+# 色覚の多様性とコントラスト                              #
+#                                                       #
+#########################################################
+
+# 色覚のシミュレーション (Machado, Oliveira & Fernandes 2009, 重さ 1.0)。リニア RGB にかける
+CVD_MATRICES = {
+    'protan': np.array([
+        [0.152286, 1.052583, -0.204868],
+        [0.114503, 0.786281, 0.099216],
+        [-0.003882, -0.048116, 1.051998],
+    ]),
+    'deutan': np.array([
+        [0.367322, 0.860646, -0.227968],
+        [0.280085, 0.672501, 0.047413],
+        [-0.011820, 0.042940, 0.968881],
+    ]),
+    'tritan': np.array([
+        [1.255528, -0.076749, -0.178779],
+        [-0.078411, 0.930809, 0.147602],
+        [0.004733, 0.691367, 0.303900],
+    ]),
+}
+
+# 'normal' と CVD_MATRICES の順
+VISIONS = ('normal', 'protan', 'deutan', 'tritan')
+
+# これより色差 (ΔE) が小さい色の組があると、見分けにくいとみなす
+UNSAFE_DELTA_E = 10.0
+
+# コントラストを測る背景
+BACKGROUNDS = {'white': '#FFFFFF', 'dark': '#121212'}
+
+
+def simulate_cvd(rgb, vision):
+    '''
+    色覚のシミュレーションをする
+
+    Parameters
+    ---------
+    rgb : array_like, shape (..., 3)
+        sRGB (0-1)
+
+    vision : str
+        'normal', 'protan' (1型), 'deutan' (2型), 'tritan' (3型)
+
+    Returns
+    ------
+    numpy.ndarray of float64, shape (..., 3)
+        見え方を近似した sRGB (0-1)
+
+    '''
+    if vision == 'normal':
+        return np.asarray(rgb, dtype=np.float64)
+    if vision not in CVD_MATRICES:
+        raise ValueError('unknown vision {!r}'.format(vision))
+    return linear_to_srgb(srgb_to_linear(rgb) @ CVD_MATRICES[vision].T)
+
+
+def relative_luminance(rgb):
+    '''
+    WCAG の相対輝度
+    '''
+    return srgb_to_linear(rgb)[..., :3] @ np.array([0.2126, 0.7152, 0.0722])
+
+
+def contrast_ratio(rgb1, rgb2):
+    '''
+    WCAG のコントラスト比 (1-21)
+    '''
+    l1 = relative_luminance(rgb1)
+    l2 = relative_luminance(rgb2)
+    return (np.maximum(l1, l2) + 0.05) / (np.minimum(l1, l2) + 0.05)
+
+
+def _min_pairwise_delta_e(lab, offsets):
+    # lab : (見え方, 色の総数, 3)。lab[0] が 'normal'。
+    # 配色ごと・見え方ごとの、異なる2色の色差の最小値。同じ色 (重ねた色) の組は除く。
+    # 色の数が同じ配色をまとめて、(見え方, 配色, 色, 色) の距離を一度に計算する
+    counts = np.diff(offsets)
+    result = np.full((lab.shape[0], len(counts)), np.inf)
+    for m in np.unique(counts[counts >= 2]):
+        palettes = np.flatnonzero(counts == m)
+        colors = lab[:, offsets[palettes][:, np.newaxis] + np.arange(m)]
+        distances = delta_e(colors[:, :, :, np.newaxis], colors[:, :, np.newaxis, :])
+        distances[..., np.arange(m), np.arange(m)] = np.inf
+        distances[:, distances[0] == 0] = np.inf
+        result[:, palettes] = distances.min(axis=(2, 3))
+    return result
+
+
+class cure_cvd_report :
+    '''登録されている全配色の、色覚の多様性とコントラストの検査結果
+
+    Attributes
+    ----------
+    registry : cure_registry instance
+        検査したレジストリ
+
+    names : list of str
+        配色の名称 (英語名)
+
+    kinds : numpy.ndarray of str
+        配色の種類
+
+    min_delta_e : numpy.ndarray, shape (配色の数, len(VISIONS))
+        見え方ごとの、配色の異なる2色の色差 (ΔE) の最小値。
+        同じ色を重ねた組は数えない。異なる色が1色しかなければ無限大
+
+    contrast : numpy.ndarray, shape (配色の数, len(BACKGROUNDS))
+        背景ごとの、配色の色とのコントラスト比の最小値
+
+    '''
+    def __init__(self, registry, threshold=UNSAFE_DELTA_E, backgrounds=None):
+        self.registry = registry
+        self.threshold = threshold
+        self.backgrounds = dict(BACKGROUNDS if backgrounds is None else backgrounds)
+        palettes = list(registry.entries)
+        self.names = [palette.name for palette in palettes]
+        self.kinds = np.array([palette.kind for palette in palettes])
+        self._index = dict((name, i) for i, name in enumerate(self.names))
+
+        rgb, self.offsets = pack_palettes(palettes)
+        counts = np.diff(self.offsets)
+        nonempty = counts > 0
+
+        # 全配色・全部の見え方を1回の行列積でシミュレーションする
+        matrices = np.stack([np.eye(3)] + [CVD_MATRICES[vision] for vision in VISIONS[1:]])
+        simulated = linear_to_srgb(np.einsum('vij,nj->vni', matrices, srgb_to_linear(rgb)))
+        simulated[0] = rgb
+        self.min_delta_e = _min_pairwise_delta_e(rgb_to_lab(simulated), self.offsets).T
+
+        # 背景とのコントラスト比。配色の中で一番低い色
+        background_rgb = precure_colormap._decode_colors(list(self.backgrounds.values()))[:, :3]
+        ratios = contrast_ratio(rgb[:, np.newaxis], background_rgb[np.newaxis])
+        self.contrast = np.full((len(palettes), len(background_rgb)), np.nan)
+        if nonempty.any():
+            self.contrast[nonempty] = np.minimum.reduceat(ratios, self.offsets[:-1][nonempty], axis=0)
+
+    def _lookup(self, name):
+        palette = self.registry.palettes.get(name)
+        if palette is None:
+            raise KeyError(name)
+        return self._index[palette.name]
+
+    def is_safe(self, name):
+        '''
+        どの見え方でも、配色の色を見分けられるか (最小の色差が threshold 以上か)
+        '''
+        return bool(self.min_delta_e[self._lookup(name)].min() >= self.threshold)
+
+    def unsafe(self, kind='qualitative'):
+        '''
+        見分けにくい色の組がある配色を返す
+
+        Parameters
+        ---------
+        kind : str
+            調べる配色の種類。None ならすべて
+
+        Returns
+        ------
+        list of (str, str, float)
+            配色の名称、一番見分けにくい見え方、そのときの最小の色差
+
+        '''
+        worst = self.min_delta_e.min(axis=1)
+        flagged = worst < self.threshold
+        if kind is not None:
+            flagged &= self.kinds == kind
+        return [(self.names[i], VISIONS[int(np.argmin(self.min_delta_e[i]))], float(worst[i]))
+                for i in np.flatnonzero(flagged)]
+
+    def report(self, name):
+        '''
+        配色の検査結果を返す
+
+        Returns
+        ------
+        dict
+            {'min_delta_e': {見え方: ΔE}, 'contrast': {背景: コントラスト比}, 'safe': bool}
+
+        '''
+        i = self._lookup(name)
+        return {
+            'min_delta_e': dict((vision, float(value)) for vision, value in zip(VISIONS, self.min_delta_e[i])),
+            'contrast': dict((background, float(value)) for background, value in zip(self.backgrounds, self.contrast[i])),
+            'safe': bool(self.min_delta_e[i].min() >= self.threshold),
+        }
+
+
+_cvd_report = precure_colormap.registry_cache(cure_cvd_report)
+
+def get_cvd_report(registry=None):
+    '''
+    レジストリの全配色の検査結果を返す。
+    カタログを読み込んでレジストリが変わったときだけ検査し直す
+
+    Parameters
+    ---------
+    registry : cure_registry instance
+        省略した場合はプロセス全体のレジストリ
+
+    Returns
+    ------
+    cure_cvd_report instance
+
+    '''
+    return _cvd_report.get(registry)
+
+
+
+#########################################################
+#                                                       #
+# 近い配色を探す索引                                     #
+#                                                       #
+#########################################################
+
+class cure_color_index :
+    '''登録されている全配色を CIELAB に変換して持っておき、近い配色を探す索引
+
+    Attributes
+    ----------
+    registry : cure_registry instance
+        索引を作ったレジストリ
+
+    names : list of str
+        配色の名称 (英語名)
+
+    stops_lab : numpy.ndarray, shape (色の総数, 3)
+        全配色の色 (CIELAB)。配色ごとに offsets で区切る
+
+    samples_lab : numpy.ndarray, shape (配色の数, samples, 3)
+        各カラーマップを samples 点ずつ取り出した色 (CIELAB)
+
+    '''
+    def __init__(self, registry, samples=32):
+        self.registry = registry
+        self.samples = samples
+        palettes = list(registry.entries)
+        self.names = [palette.name for palette in palettes]
+
+        rgb, self.offsets = pack_palettes(palettes)
+        self.stops_lab = rgb_to_lab(rgb)
+        kinds = [palette.kind for palette in palettes]
+        self.samples_lab = rgb_to_lab(sample_palettes(rgb, self.offsets, kinds, samples))
+
+    def _top(self, distances, k):
+        k = min(k, len(distances))
+        if k <= 0:
+            return []
+        top = np.argpartition(distances, k - 1)[:k]
+        top = top[np.argsort(distances[top], kind='stable')]
+        return [(self.names[i], float(distances[i])) for i in top]
+
+    def nearest_color(self, color, k=5):
+        '''
+        指定した色に最も近い色を含む配色を探す
+
+        Returns
+        ------
+        list of (str, float)
+            配色の名称と色差 (ΔE) を、近い順に並べたもの
+
+        Raises
+        ------
+        ValueError
+            RGB の値が範囲外の場合
+
+        '''
+        lab = rgb_to_lab(_decode_rgb([color])[0])
+        distances = delta_e(self.stops_lab, lab)
+        # 配色ごとの最小値。空の配色は無限大
+        counts = np.diff(self.offsets)
+        nonempty = counts > 0
+        per_palette = np.full(len(counts), np.inf)
+        if nonempty.any():
+            per_palette[nonempty] = np.minimum.reduceat(distances, self.offsets[:-1][nonempty])
+        return self._top(per_palette, k)
+
+    def nearest_palette(self, colors, k=5, kind='linear'):
+        '''
+        指定した配色に最も近い配色を探す。
+        両方のカラーマップを同じ点数ずつ取り出し、色差の平均で比べる
+
+        Returns
+        ------
+        list of (str, float)
+            配色の名称と色差 (ΔE) の平均を、近い順に並べたもの
+
+        '''
+        rgb = _decode_rgb(colors)
+        offsets = np.array([0, len(rgb)])
+        query = rgb_to_lab(sample_palettes(rgb, offsets, [kind], self.samples))[0]
+        distances = delta_e(self.samples_lab, query[np.newaxis]).mean(axis=1)
+        return self._top(distances, k)
+
+    def nearest(self, color_or_palette, k=5):
+        '''
+        色か配色に近い配色を探す (nearest_color と nearest_palette を参照)
+
+        Parameters
+        ---------
+        color_or_palette : color or array of color
+            色 (16進数・色名・RGB の tuple) か、色の配列。
+            RGB の tuple は 0-1 の小数か 0-255 の整数
+
+        k : int
+            返す候補の数
+
+        Returns
+        ------
+        list of (str, float)
+
+        '''
+        if _is_single_color(color_or_palette):
+            return self.nearest_color(color_or_palette, k)
+        return self.nearest_palette(color_or_palette, k)
+
+
+def _decode_rgb(colors):
+    # 色の配列を RGB (float64, 0-1) にする。整数の tuple (255, 0, 0) などは 0-255 とみなす
+    colors = [c if isinstance(c, str) or np.asarray(c).dtype.kind not in 'iu' else np.asarray(c) / 255
+              for c in colors]
+    rgb = precure_colormap._decode_colors(colors)[:, :3]
+    if np.any((rgb < 0) | (rgb > 1)):
+        raise ValueError('RGB values must be within 0-1 (or 0-255 for integers)')
+    return rgb
+
+
+def _is_single_color(value):
+    if isinstance(value, str):
+        return True
+    value = np.asarray(value)
+    return value.ndim == 1 and value.dtype.kind in 'fiu' and len(value) in (3, 4)
+
+
+_color_index = precure_colormap.registry_cache(cure_color_index)
+
+def get_color_index(registry=None):
+    '''
+    レジストリの色の索引を返す。レジストリが変わったときだけ作り直す
+
+    Parameters
+    ---------
+    registry : cure_registry instance
+        省略した場合はプロセス全体のレジストリ
+
+    Returns
+    ------
+    cure_color_index instance
+
+    '''
+    return _color_index.get(registry)
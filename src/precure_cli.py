@@ -0,0 +1,234 @@
+#########################################################
+#                                                       #
+# precure_cli.py                                        #
+#                                                       #
+# python -m precure_colormap のコマンド                   #
+# 画面を使わず (Agg)、カラーマップの一覧や                  #
+# 色を付けた配列をファイルに描く                            #
+#                                                       #
+#########################################################
+
+
+# 起動を速くするため、重いモジュールは各コマンドの中で読み込む
+import argparse
+import os
+import shlex
+import sys
+
+
+def _use_agg():
+    # GUI のバックエンドを読み込まないようにする
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+def _load_catalogs(paths):
+    import precure_colormap
+    for path in paths:
+        precure_colormap.load_catalog(path)
+
+
+
+#########################################################
+#                                                       #
+# コマンド                                               #
+#                                                       #
+#########################################################
+
+def command_sheet(args):
+    '''
+    作品ごとのカラーマップの一覧 (sample_colormap_all / sample_colormap_by_title) を画像に描く
+    '''
+    _use_agg()
+    import precure_colormap
+    _load_catalogs(args.catalog)
+
+    cure_colors = precure_colormap.cure_colormap.default()
+    titles = args.title or None
+    if titles is not None:
+        unknown = [title for title in titles if cure_colors.characters_of(title) is None]
+        if unknown:
+            raise SystemExit('unknown title: ' + ', '.join(unknown))
+    cure_colors.plot_palette_sheet(titles, path=args.output, width=args.width, dpi=args.dpi)
+    return [args.output]
+
+
+def _read_array(path):
+    import numpy as np
+    if path.endswith('.npy'):
+        return np.load(path, mmap_mode='r')
+    if path.endswith('.npz'):
+        with np.load(path) as npz:
+            return npz[npz.files[0]]
+    return np.loadtxt(path, delimiter=',' if path.endswith('.csv') else None, ndmin=2)
+
+
+def command_colorize(args):
+    '''
+    配列にプリキュアのカラーマップで色を付けて、PNG か .npy (uint8 の RGBA) に書く
+    '''
+    import precure_colorize
+    import precure_colormap
+    _load_catalogs(args.catalog)
+
+    data = _read_array(args.input)
+    if data.ndim != 2 and args.output.endswith('.png'):
+        raise SystemExit('{}: PNG needs a 2-D array (got shape {})'.format(args.input, data.shape))
+    cure_colors = precure_colormap.cure_colormap.default()
+    if cure_colors.name_to_cmap.find(args.name) is None:
+        raise SystemExit('unknown name: ' + args.name)
+
+    if args.output.endswith('.npy'):
+        precure_colorize.colorize_stream(data, args.name, args.output, args.vmin, args.vmax, n=args.n,
+                                         cure_colors=cure_colors, workers=args.threads)
+        return [args.output]
+
+    from PIL import Image
+    rgba = precure_colorize.colorize_parallel(data, args.name, vmin=args.vmin, vmax=args.vmax, workers=args.threads,
+                                              n=args.n, cure_colors=cure_colors)
+    Image.fromarray(rgba, 'RGBA').save(args.output)
+    return [args.output]
+
+
+def command_export(args):
+    '''
+    全配色の LUT を書き出す (precure_export を参照)
+    '''
+    import precure_export
+    formats = precure_export.EXPORT_FORMATS if args.format is None else args.format
+    unknown = [f for f in formats if f not in precure_export.EXPORT_FORMATS]
+    if unknown:
+        raise SystemExit('unknown format: {} (choose from {})'.format(
+            ', '.join(unknown), ', '.join(precure_export.EXPORT_FORMATS)))
+    if args.n < 1:
+        raise SystemExit('-n must be at least 1')
+
+    _load_catalogs(args.catalog)
+    return list(precure_export.export_catalog(args.output, formats, args.n).values())
+
+
+def _run_job(argv):
+    # プロセスプールで1つのジョブを実行する。書いたファイルのパスを返す
+    args = build_parser().parse_args(argv)
+    if args.command in ('jobs', 'serve'):
+        raise SystemExit('{} cannot be run as a job'.format(args.command))
+    return args.func(args)
+
+
+def read_jobs(path):
+    '''
+    ジョブの一覧を読む。1行に1つ、コマンドと引数を書く (空行と # から後は無視する)
+
+        sheet -o all.png
+        sheet -o futari.png --title "Futari wa Pretty Cure"
+        colorize キュアブラック data.npy -o data.png
+
+    Returns
+    ------
+    list of list of str
+
+    '''
+    if path == '-':
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(path, encoding='utf-8') as f:
+            lines = f.read().splitlines()
+    return [argv for argv in (shlex.split(line, comments=True) for line in lines) if argv]
+
+
+def command_jobs(args):
+    '''
+    ジョブの一覧を、プロセスプールで並列に実行する
+    '''
+    jobs = read_jobs(args.jobs)
+    # 実行する前に、すべてのジョブの引数を確かめる
+    parser = build_parser()
+    for argv in jobs:
+        if parser.parse_args(argv).command in ('jobs', 'serve'):
+            raise SystemExit('{} cannot be run as a job'.format(argv[0]))
+
+    workers = args.workers or os.cpu_count() or 1
+    if workers == 1 or len(jobs) <= 1:
+        return [path for argv in jobs for path in _run_job(argv)]
+
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs)), initializer=_use_agg) as pool:
+        return [path for paths in pool.map(_run_job, jobs) for path in paths]
+
+
+def command_serve(args):
+    '''
+    配色を HTTP で配るサービスを起動する (precure_service を参照)
+    '''
+    import precure_service
+    _load_catalogs(args.catalog)
+    if args.watch is not None:
+        import precure_watch
+        precure_watch.watch_palettes(args.watch)
+    precure_service.serve(args.host, args.port, args.unix, args.lut_size)
+    return []
+
+
+#########################################################
+#                                                       #
+# 引数                                                  #
+#                                                       #
+#########################################################
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m precure_colormap',
+                                     description='プリキュアっぽいカラーマップを画面なしでファイルに描く')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    def add_command(name, func, help):
+        command = commands.add_parser(name, help=help, description=help)
+        command.set_defaults(func=func)
+        command.add_argument('--catalog', action='append', default=[],
+                             help='追加で読み込む配色カタログ (load_catalog)。複数指定できる')
+        return command
+
+    sheet = add_command('sheet', command_sheet, '作品ごとのカラーマップの一覧を画像に描く')
+    sheet.add_argument('-o', '--output', required=True, help='書き出す画像 (拡張子で形式を決める)')
+    sheet.add_argument('-t', '--title', action='append',
+                       help='描く作品 (英語・日本語)。複数指定できる。省略した場合は全作品')
+    sheet.add_argument('--width', type=int, default=256, help='グラデーションの段階数')
+    sheet.add_argument('--dpi', type=int, default=100, help='解像度')
+
+    colorize = add_command('colorize', command_colorize, '配列にカラーマップで色を付けて画像に描く')
+    colorize.add_argument('name', help='プリキュアの名称')
+    colorize.add_argument('input', help='色を付ける配列 (.npy, .npz, .csv, 空白区切りのテキスト)')
+    colorize.add_argument('-o', '--output', required=True, help='書き出す画像 (.png など) か .npy (uint8 の RGBA)')
+    colorize.add_argument('--vmin', type=float, help='カラーマップの下端の値 (省略した場合は最小値)')
+    colorize.add_argument('--vmax', type=float, help='カラーマップの上端の値 (省略した場合は最大値)')
+    colorize.add_argument('-n', type=int, help='LUT の段階数')
+    colorize.add_argument('--threads', type=int, default=1, help='色付けのスレッド数')
+
+    export = add_command('export', command_export, '全配色の LUT を書き出す')
+    export.add_argument('-o', '--output', default='.', help='書き出すディレクトリ (既定はカレントディレクトリ)')
+    export.add_argument('-f', '--format', type=lambda value: [f.strip() for f in value.split(',') if f.strip()],
+                        help='書き出す形式をカンマ区切りで (npy, csv など)。既定はすべて')
+    export.add_argument('-n', type=int, default=256, help='LUT の段階数 (既定 256)')
+
+    jobs = add_command('jobs', command_jobs, 'ジョブの一覧をプロセスプールで並列に実行する')
+    jobs.add_argument('jobs', help='ジョブの一覧のファイル (1行に1つのコマンド。- なら標準入力)')
+    jobs.add_argument('-j', '--workers', type=int, help='プロセス数 (省略した場合は CPU の数)')
+
+    serve = add_command('serve', command_serve, '配色を HTTP (TCP か Unix ソケット) で配るサービスを起動する')
+    serve.add_argument('--host', default='127.0.0.1', help='待ち受けるアドレス (既定 127.0.0.1)')
+    serve.add_argument('--port', type=int, default=8765, help='待ち受けるポート (既定 8765)')
+    serve.add_argument('--unix', help='待ち受ける Unix ソケットのパス。指定した場合は --host と --port は使わない')
+    serve.add_argument('--lut-size', type=int, default=256, help='起動時に作っておく LUT の段階数 (既定 256)')
+    serve.add_argument('--watch', help='監視する配色ディレクトリ。*.json の配色を追加・変更・削除したら配り直す')
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    for path in args.func(args):
+        print(path)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,247 @@
+#########################################################
+#                                                       #
+# precure_client.py                                     #
+#                                                       #
+# precure_service から配色を受け取るクライアント             #
+# matplotlib を読み込まずに cure_colormap と同じように使う   #
+#                                                       #
+#########################################################
+
+
+import http.client
+import json
+import socket
+import threading
+from collections import OrderedDict
+from urllib.parse import quote
+from urllib.parse import urlencode
+
+import numpy as np
+
+
+
+# ETag と一緒に取っておく応答の数
+CACHE_SIZE = 256
+
+
+class _unix_connection(http.client.HTTPConnection):
+    # Unix ソケットで話す HTTPConnection
+    def __init__(self, path, timeout=None):
+        super().__init__('localhost', timeout=timeout)
+        self.unix_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            self.sock.settimeout(self.timeout)
+        self.sock.connect(self.unix_path)
+
+
+class remote_colormap :
+    '''サービスから受け取った LUT で色を付けるカラーマップ
+
+    matplotlib.colors.Colormap と同じく、0-1 の値の配列を呼び出すと RGBA を返す
+    (範囲外の値は両端の色、NaN は透明)
+
+    Attributes
+    ----------
+    name : str
+        プリキュアの名称 (英語名)
+
+    lut : numpy.ndarray of uint8, shape (N, 4)
+        LUT
+
+    N : int
+        LUT の段階数
+
+    '''
+    def __init__(self, name, lut):
+        self.name = name
+        self.lut = lut
+        self.N = len(lut)
+        # 末尾は NaN の色
+        self._lut = np.concatenate([lut, np.zeros((1, 4), dtype=np.uint8)])
+
+    def __call__(self, X, bytes=False):
+        X = np.asarray(X, dtype=np.float64)
+        xa = X * self.N
+        with np.errstate(invalid='ignore'):
+            index = np.where(np.isnan(xa), self.N, np.clip(xa, 0, self.N - 1)).astype(np.intp)
+        rgba = self._lut.take(index, axis=0)
+        if bytes:
+            return rgba
+        return rgba / 255.0
+
+    def to_matplotlib(self):
+        '''
+        同じ色の matplotlib.colors.ListedColormap を返す (ここで matplotlib を読み込む)
+        '''
+        from matplotlib.colors import ListedColormap
+        return ListedColormap(self.lut / 255.0, name=self.name)
+
+    def __repr__(self):
+        return 'remote_colormap({!r}, N={})'.format(self.name, self.N)
+
+
+class cure_colormap_client :
+    '''precure_service に問い合わせて、cure_colormap と同じように配色を引くクライアント
+
+    応答は ETag と一緒に最近使った CACHE_SIZE 個まで取っておき、次からは If-None-Match で問い合わせる。
+    変わっていなければ (304) 取っておいた応答を使う
+
+    Examples
+    --------
+    >>> cure_colors = cure_colormap_client(port=8765)
+    >>> cmap = cure_colors.get_by_name('キュアトゥインクル')
+    >>> rgba = cmap(np.linspace(0, 1, 10), bytes=True)
+
+    '''
+    def __init__(self, host='127.0.0.1', port=8765, path=None, timeout=10.0):
+        self.host = host
+        self.port = port
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        # パス -> (ETag, 本文) (LRU)
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            if self.path is not None:
+                connection = _unix_connection(self.path, self.timeout)
+            else:
+                connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self._local.connection = connection
+        return connection
+
+    def close(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def _get(self, target):
+        # 本文を返す。見つからなければ None
+        with self._cache_lock:
+            cached = self._cache.get(target)
+            if cached is not None:
+                self._cache.move_to_end(target)
+        headers = {'If-None-Match': cached[0]} if cached is not None else {}
+
+        for retry in (True, False):
+            connection = self._connection()
+            try:
+                connection.request('GET', target, headers=headers)
+                response = connection.getresponse()
+                body = response.read()
+                break
+            except (ConnectionError, http.client.HTTPException):
+                # サーバーが keep-alive を切ったら、つなぎ直して1回だけやり直す
+                self.close()
+                if not retry:
+                    raise
+
+        if response.status == 304 and cached is not None:
+            return cached[1]
+        if response.status == 404:
+            return None
+        if response.status != 200:
+            raise RuntimeError('{} {}: {}'.format(response.status, response.reason, body.decode('utf-8', 'replace')))
+
+        etag = response.getheader('ETag')
+        if etag is not None:
+            with self._cache_lock:
+                self._cache[target] = (etag, body)
+                self._cache.move_to_end(target)
+                while len(self._cache) > CACHE_SIZE:
+                    self._cache.popitem(last=False)
+        return body
+
+    def _get_json(self, target):
+        body = self._get(target)
+        return None if body is None else json.loads(body.decode('utf-8'))
+
+    def version(self):
+        '''
+        サービスのレジストリの番号
+        '''
+        return self._get_json('/version')['version']
+
+    def palette(self, name):
+        '''
+        配色の情報 (name, aliases, kind, title, titles, attribute, colors) を返す。
+        知らないプリキュアならNone
+        '''
+        return self._get_json('/palettes/' + quote(name, safe=''))
+
+    def get_lut(self, name, n=None):
+        '''
+        cure_colormap.get_lut と同じ
+
+        Returns
+        ------
+        numpy.ndarray of uint8, shape (n, 4)
+            書き込み不可。n を省略した場合の段階数はサービスが決める
+            (カラーマップの段階数。qualitative なら色の数)。一致するプリキュアがいなければNone
+
+        '''
+        target = '/lut/' + quote(name, safe='')
+        if n is not None:
+            target += '?' + urlencode({'n': n})
+        body = self._get(target)
+        if body is None:
+            return None
+        return np.frombuffer(body, dtype=np.uint8).reshape(-1, 4)
+
+    def get_by_name(self, name):
+        '''
+        cure_colormap.get_by_name と同じ。ただし返すのは remote_colormap
+
+        Returns
+        ------
+        remote_colormap instance
+            一致するプリキュアがいなければNone
+
+        '''
+        palette = self.palette(name)
+        if palette is None:
+            return None
+        return remote_colormap(palette['name'], self.get_lut(palette['name']))
+
+    def __getattr__(self, name):
+        # cure_black などの属性
+        if name.startswith('_'):
+            raise AttributeError(name)
+        palette = self.palette(name)
+        if palette is None or palette['attribute'] != name:
+            raise AttributeError(name)
+        return self.get_by_name(palette['name'])
+
+    @property
+    def title_to_characters(self):
+        titles = self._get_json('/titles')
+        return dict((title, tuple(names)) for title, names in titles.items())
+
+    def characters_of(self, title):
+        '''
+        cure_colormap.characters_of と同じ
+        '''
+        characters = self._get_json('/titles/' + quote(title, safe=''))
+        return None if characters is None else tuple(characters)
+
+    def title_of(self, name):
+        '''
+        cure_colormap.title_of と同じ
+        '''
+        palette = self.palette(name)
+        if palette is None:
+            return None
+        return palette['titles'][0] if palette['titles'] else palette['title']
+
+    def search(self, query, k=5):
+        '''
+        cure_colormap.search と同じ
+        '''
+        return [tuple(item) for item in self._get_json('/search?' + urlencode({'q': query, 'k': k}))]
@@ -0,0 +1,239 @@
+#########################################################
+#                                                       #
+# precure_colorize.py                                   #
+#                                                       #
+# プリキュアっぽい配色で                                  #
+# 大きな配列に色を付ける                                  #
+#                                                       #
+#########################################################
+
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import precure_colormap
+
+
+
+# 1要素あたりの作業領域 [byte]
+# 入力のコピー (最大8) + 量子化した値 (8) + インデックス (8) + NaN の判定 (1)
+_WORK_BYTES_PER_ELEMENT = 25
+
+# 既定の作業領域の上限 [byte]
+DEFAULT_MAX_MEMORY = 64 * 1024 * 1024
+
+
+def _lut_for(name, cure_colors, n):
+    if cure_colors is None:
+        cure_colors = precure_colormap.cure_colormap.default()
+    lut = cure_colors.get_lut(name, n)
+    if lut is None:
+        raise KeyError(name)
+    return lut
+
+
+def iter_tiles(shape, max_elements):
+    '''
+    配列を、先頭の軸から順に max_elements 要素以下のタイルに分ける
+
+    Parameters
+    ---------
+    shape : tuple of int
+        配列の形
+
+    max_elements : int
+        1タイルの要素数の上限
+
+    Yields
+    ------
+    tuple of slice
+        タイルの範囲。data[tile] でタイルを取り出せる
+
+    '''
+    if len(shape) == 0:
+        yield ()
+        return
+
+    inner = int(np.prod(shape[1:], dtype=np.int64))
+    if inner <= max_elements:
+        step = max(1, max_elements // max(inner, 1))
+        for start in range(0, shape[0], step):
+            yield (slice(start, min(start + step, shape[0])),)
+        return
+
+    # 1行でも上限を超えるので、次の軸でも分ける
+    for i in range(shape[0]):
+        for tile in iter_tiles(shape[1:], max_elements):
+            yield (slice(i, i + 1),) + tile
+
+
+def _open_output(out, shape):
+    if isinstance(out, str):
+        return np.lib.format.open_memmap(out, mode='w+', dtype=np.uint8, shape=shape)
+    if out.shape != shape or out.dtype != np.uint8:
+        raise ValueError('out must be a uint8 array of shape {}'.format(shape))
+    return out
+
+
+def data_range(data, max_memory=DEFAULT_MAX_MEMORY):
+    '''
+    配列をタイルごとに読んで、NaN とマスクした値を除いた最小値・最大値を返す
+
+    Parameters
+    ---------
+    data : array_like
+        numpy.memmap など、スライスで部分を読める配列
+
+    max_memory : int
+        作業領域の上限 [byte]
+
+    Returns
+    ------
+    (float, float)
+        最小値と最大値。値がなければ (0.0, 1.0)
+
+    '''
+    vmin = np.inf
+    vmax = -np.inf
+    for tile in iter_tiles(data.shape, max(1, max_memory // _WORK_BYTES_PER_ELEMENT)):
+        block = np.asanyarray(data[tile])
+        if np.ma.isMaskedArray(block):
+            # マスクした値は範囲に含めない
+            block = block.compressed()
+        if block.size == 0 or np.all(np.isnan(block)):
+            continue
+        vmin = min(vmin, float(np.nanmin(block)))
+        vmax = max(vmax, float(np.nanmax(block)))
+    if vmin > vmax:
+        return 0.0, 1.0
+    return vmin, vmax
+
+
+def colorize_stream(data, name, out, vmin=None, vmax=None, max_memory=DEFAULT_MAX_MEMORY, n=None, cure_colors=None,
+                    workers=1):
+    '''
+    メモリに載らない大きな配列に、プリキュアのカラーマップで色を付ける
+
+    入力をタイルごとに読み、uint8 の RGBA を out に書き込む。
+    作業領域は max_memory 以下に抑える (入力と出力の memory-map は含まない)
+
+    Parameters
+    ---------
+    data : array_like
+        numpy.memmap など、スライスで部分を読める配列
+
+    name : str
+        プリキュアの名称
+
+    out : str or numpy.ndarray of uint8, shape data.shape + (4,)
+        結果を書き込む配列。パスを指定した場合は .npy 形式の memory-map を作る
+
+    vmin, vmax : float
+        カラーマップの両端に対応する値。
+        省略した場合は、先に全体を一度読んで最小値・最大値を求める
+
+    max_memory : int
+        作業領域の上限 [byte]
+
+    n : int
+        LUT の段階数
+
+    cure_colors : cure_colormap instance
+        カラーマップを引くインスタンス。省略した場合は cure_colormap.default()
+
+    workers : int
+        タイルを処理するスレッド数 (colorize_parallel を参照)
+
+    Returns
+    ------
+    numpy.ndarray of uint8, shape data.shape + (4,)
+        out (パスを指定した場合は作った memory-map)
+
+    '''
+    lut = _lut_for(name, cure_colors, n)
+    out = _open_output(out, tuple(data.shape) + (4,))
+
+    if vmin is None or vmax is None:
+        data_min, data_max = data_range(data, max_memory)
+        vmin = data_min if vmin is None else vmin
+        vmax = data_max if vmax is None else vmax
+
+    _colorize_tiles(lut, data, out, vmin, vmax, max_memory, workers)
+
+    if isinstance(out, np.memmap):
+        out.flush()
+    return out
+
+
+def colorize_parallel(data, name, out=None, vmin=None, vmax=None, workers=None,
+                      max_memory=DEFAULT_MAX_MEMORY, n=None, cure_colors=None):
+    '''
+    配列をタイルに分け、複数のスレッドでプリキュアのカラーマップの色を付ける
+
+    各タイルの計算は GIL を解放する NumPy の演算だけで行い、
+    結果は out の該当部分に直接書き込む
+
+    Parameters
+    ---------
+    data : array_like
+        色を付ける配列
+
+    name : str
+        プリキュアの名称
+
+    out : str or numpy.ndarray of uint8, shape data.shape + (4,)
+        結果を書き込む配列。省略した場合は新しく確保する。
+        パスを指定した場合は .npy 形式の memory-map を作る
+
+    vmin, vmax : float
+        カラーマップの両端に対応する値。省略した場合は data の最小値・最大値
+
+    workers : int
+        スレッド数。省略した場合は CPU の数
+
+    max_memory : int
+        全スレッド合計の作業領域の上限 [byte]
+
+    n : int
+        LUT の段階数
+
+    cure_colors : cure_colormap instance
+        カラーマップを引くインスタンス。省略した場合は cure_colormap.default()
+
+    Returns
+    ------
+    numpy.ndarray of uint8, shape data.shape + (4,)
+
+    '''
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if out is None:
+        out = np.empty(tuple(data.shape) + (4,), dtype=np.uint8)
+    return colorize_stream(data, name, out, vmin, vmax, max_memory, n, cure_colors, workers)
+
+
+def _colorize_tiles(lut, data, out, vmin, vmax, max_memory, workers):
+    # 作業領域の上限はスレッドで分け合う
+    workers = max(1, workers)
+    max_elements = max(1, max_memory // (_WORK_BYTES_PER_ELEMENT * workers))
+
+    if workers > 1:
+        # 全スレッドがそろって動けるよう、タイルは少なくともスレッド数の数倍に分ける
+        size = int(np.prod(data.shape, dtype=np.int64))
+        max_elements = max(1, min(max_elements, size // (workers * 4)))
+
+    def colorize_tile(tile):
+        # MaskedArray はマスクごと渡して、マスクした値を透明にする
+        precure_colormap.apply_lut(lut, np.asanyarray(data[tile]), vmin, vmax, out=out[tile])
+
+    tiles = iter_tiles(data.shape, max_elements)
+    if workers == 1:
+        for tile in tiles:
+            colorize_tile(tile)
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for _ in pool.map(colorize_tile, tiles):
+            pass
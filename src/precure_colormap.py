@@ -9,17 +9,1582 @@
 
 
 
-import unittest
+# import 時間を短くするため、ここでは matplotlib.colors と numpy だけを読み込む。
+# matplotlib.pyplot は使うときに読み込む
 import numpy as np
-import pandas as pd
-import matplotlib as mpl
-import matplotlib.pyplot as plt
-import matplotlib.cm as cm
-import seaborn as sns
+import hashlib
+import json
+import os
+import shutil
+import threading
+import weakref
 from collections import OrderedDict
+from collections.abc import Mapping
+from types import MappingProxyType
 
 from matplotlib.colors import LinearSegmentedColormap
 from matplotlib.colors import ListedColormap
+from matplotlib.colors import to_rgba_array
+
+import precure_stats
+
+
+
+#########################################################
+#                                                       #
+# 配色のレジストリ                                       #
+#                                                       #
+#########################################################
+
+class cure_palette :
+    '''プリキュア1人分の配色を表すレコード
+
+    Attributes
+    ----------
+    name : str
+        プリキュアの名称 (英語名)
+
+    aliases : tuple of str
+        カラーマップと対応させるプリキュアの名称 (日本語名・英語名)
+
+    colors : tuple of str
+        色の配列。色は16進数か色名
+
+    rgb : numpy.ndarray of uint8, shape (N, 3)
+        色の配列の RGB 値。バイナリのカタログから読んだ場合は
+        カタログを memory-map した領域のビューになる
+
+    title : str
+        初登場の作品タイトル。どの作品にも属さなければ None
+
+    kind : str
+        カラーマップの種類。'linear' か 'qualitative'
+
+    attribute : str
+        cure_colormap の属性名 (cure_black など)。なければ None
+
+    '''
+    __slots__ = ('name', 'aliases', '_colors', '_rgb', 'title', 'kind', 'attribute')
+
+    def __init__(self, name, aliases, colors=None, title=None, kind='linear', attribute=None, rgb=None):
+        self.name = name
+        self.aliases = tuple(aliases)
+        self._colors = None if colors is None else tuple(colors)
+        self._rgb = rgb
+        self.title = title
+        self.kind = kind
+        self.attribute = attribute
+
+    @property
+    def colors(self):
+        if self._colors is None:
+            self._colors = tuple('#{:02x}{:02x}{:02x}'.format(*c) for c in self._rgb.tolist())
+        return self._colors
+
+    @property
+    def rgb(self):
+        if self._rgb is None:
+            rgb = np.round(to_rgba_array(self._colors)[:, :3] * 255).astype(np.uint8)
+            rgb.flags.writeable = False
+            self._rgb = rgb
+        return self._rgb
+
+    def __repr__(self):
+        return 'cure_palette({!r}, kind={!r}, colors={!r})'.format(self.name, self.kind, self.colors)
+
+
+class cure_registry :
+    '''全インスタンスで共有する、変更不可の配色テーブル
+
+    Attributes
+    ----------
+    palettes : Mapping object
+        プリキュアの名称 (日本語名・英語名) と cure_palette のマップ
+
+    attributes : Mapping object
+        属性名 (cure_black など) と cure_palette のマップ
+
+    title_to_characters : Mapping object
+        作品タイトルと登場プリキュア (英語名の tuple) のマップ
+
+    title_aliases : Mapping object
+        作品タイトルの別名 (日本語のタイトルなど) と作品タイトルのマップ
+
+    name_to_titles : Mapping object
+        プリキュアの名称 (英語名) と、登場する作品タイトルの tuple のマップ
+
+    entries : tuple of cure_palette
+        登録順に並べた cure_palette
+
+    version : int
+        レジストリを作り直すたびに増える番号
+
+    '''
+    def __init__(self, entries, titles, version=0, title_aliases=None):
+        self.entries = tuple(entries)
+        self.version = version
+
+        palettes = dict()
+        attributes = dict()
+        for entry in self.entries:
+            for name in entry.aliases:
+                palettes[name] = entry
+            if entry.attribute is not None:
+                attributes[entry.attribute] = entry
+
+        # 作品の登場プリキュアは英語名にそろえる。
+        # 登録されていない名前はそのまま残し、validate で見つける
+        title_to_characters = OrderedDict()
+        name_to_titles = dict()
+        for title, names in titles:
+            names = tuple(palettes[name].name if name in palettes else name for name in names)
+            title_to_characters[title] = names
+            for name in names:
+                name_to_titles.setdefault(name, [])
+                if title not in name_to_titles[name]:
+                    name_to_titles[name].append(title)
+
+        aliases = dict(title_aliases or {})
+        aliases.update((title, title) for title in title_to_characters)
+
+        self.palettes = MappingProxyType(palettes)
+        self.attributes = MappingProxyType(attributes)
+        self.title_to_characters = MappingProxyType(title_to_characters)
+        self.title_aliases = MappingProxyType(aliases)
+        self.name_to_titles = MappingProxyType(dict((name, tuple(t)) for name, t in name_to_titles.items()))
+
+    def validate(self):
+        '''
+        作品の登場プリキュアが、すべて配色として登録されているか確かめる
+
+        Raises
+        ------
+        ValueError
+            登録されていないプリキュアがいる場合
+
+        '''
+        missing = ['{} ({})'.format(name, title)
+                   for title, names in self.title_to_characters.items()
+                   for name in names if name not in self.palettes]
+        if len(missing) > 0:
+            raise ValueError('characters without a palette: ' + ', '.join(missing))
+        return self
+
+    def merged(self, other):
+        '''
+        other の配色を追加したレジストリを返す。
+        同じ名前 (英語名) の配色は other で置き換える
+
+        Parameters
+        ---------
+        other : cure_registry instance
+            追加する配色
+
+        Returns
+        ------
+        cure_registry instance
+
+        Raises
+        ------
+        ValueError
+            other の配色の名称・属性名が、ほかの配色 (英語名が違う配色) と重なる場合
+
+        '''
+        _check_names(self, other.entries)
+        replaced = dict((entry.name, entry) for entry in other.entries)
+        entries = [replaced.pop(entry.name, entry) for entry in self.entries]
+        entries.extend(entry for entry in other.entries if entry.name in replaced)
+
+        titles = OrderedDict(self.title_to_characters)
+        titles.update(other.title_to_characters)
+        title_aliases = dict(self.title_aliases)
+        title_aliases.update(other.title_aliases)
+        return cure_registry(entries, titles.items(), self.version + 1, title_aliases)
+
+    def updated(self, palettes=(), remove=()):
+        '''
+        配色を追加・削除したレジストリを返す。作品タイトルはそのまま残す
+
+        Parameters
+        ---------
+        palettes : array of cure_palette
+            追加する配色。同じ名前 (英語名) の配色は置き換える
+
+        remove : array of str
+            削除する配色の名前 (英語名)。削除したプリキュアは作品の登場プリキュアからも除く
+
+        Returns
+        ------
+        cure_registry instance
+
+        '''
+        replaced = dict((palette.name, palette) for palette in palettes)
+        removed = set(remove) - set(replaced)
+        entries = [replaced.pop(entry.name, entry) for entry in self.entries if entry.name not in removed]
+        entries.extend(palette for palette in palettes if palette.name in replaced)
+
+        titles = [(title, tuple(name for name in names if name not in removed))
+                  for title, names in self.title_to_characters.items()]
+        return cure_registry(entries, titles, self.version + 1, self.title_aliases)
+
+
+
+#########################################################
+#                                                       #
+# 配色カタログ                                           #
+#                                                       #
+#########################################################
+
+# 配色の元データ (JSON) と、それをコンパイルしたバイナリ
+CATALOG_JSON = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'precure_palettes.json')
+CATALOG_BIN = os.path.splitext(CATALOG_JSON)[0] + '.bin'
+
+# バイナリカタログのレイアウト (数値はすべてリトルエンディアン)
+#
+#   magic    8 bytes           _CATALOG_MAGIC
+#   header   uint32 x 3        配色の数 n, メタデータのバイト数, 色の総数
+#   offsets  uint32 x (n + 1)  各配色の色の開始位置 (色単位)
+#   meta     utf-8 JSON        名称・作品・種類など、色以外の情報
+#   padding  0-3 bytes         4 バイト境界に揃える
+#   rgb      uint8 x (色の総数 x 3)
+_CATALOG_MAGIC = b'PRECURE\x01'
+_CATALOG_HEADER = np.dtype([('n_palettes', '<u4'), ('meta_size', '<u4'), ('n_colors', '<u4')])
+
+_PALETTE_KINDS = ('linear', 'qualitative')
+
+
+def _registry_from_json(catalog, rgb=None, offsets=None):
+    # 最初に登場した作品を、そのプリキュアの作品とする。
+    # 作品の登場プリキュアは日本語名でも英語名でもよい
+    alias_to_name = dict((alias, palette['names'][-1]) for palette in catalog['palettes'] for alias in palette['names'])
+    name_to_title = dict()
+    for title in catalog.get('titles', ()):
+        for name in title['characters']:
+            name_to_title.setdefault(alias_to_name.get(name, name), title['title'])
+
+    entries = []
+    for i, palette in enumerate(catalog['palettes']):
+        names = palette['names']
+        name = names[-1]
+        kind = palette.get('kind', 'linear')
+        if kind not in _PALETTE_KINDS:
+            raise ValueError('unknown palette kind {!r} for {!r}'.format(kind, name))
+
+        if rgb is None:
+            entry = cure_palette(name, names, palette['colors'], name_to_title.get(name), kind, palette.get('attribute'))
+        else:
+            entry = cure_palette(name, names, None, name_to_title.get(name), kind, palette.get('attribute'),
+                                 rgb=rgb[offsets[i]:offsets[i + 1]])
+        entries.append(entry)
+
+    titles = [(title['title'], title['characters']) for title in catalog.get('titles', ())]
+    title_aliases = dict((title['title_ja'], title['title']) for title in catalog.get('titles', ()) if 'title_ja' in title)
+    return cure_registry(entries, titles, title_aliases=title_aliases)
+
+
+def compile_catalog(src=CATALOG_JSON, dst=None):
+    '''
+    JSON の配色カタログを、memory-map で読めるバイナリにコンパイルする
+
+        $ python -c "import precure_colormap; precure_colormap.compile_catalog()"
+
+    Parameters
+    ---------
+    src : str
+        JSON カタログのパス
+
+    dst : str
+        出力するバイナリのパス。省略した場合は src の拡張子を .bin にしたもの
+
+    Returns
+    ------
+    str
+        出力したバイナリのパス
+
+    '''
+    if dst is None:
+        dst = os.path.splitext(src)[0] + '.bin'
+
+    with open(src, encoding='utf-8') as f:
+        catalog = json.load(f)
+
+    # 色は RGB (各8bit) で持つ。透明度は持てない
+    colors = [palette['colors'] for palette in catalog['palettes']]
+    counts = [len(c) for c in colors]
+    rgba = to_rgba_array([c for palette in colors for c in palette]) if sum(counts) > 0 else np.zeros((0, 4))
+    if np.any(rgba[:, 3] != 1.0):
+        raise ValueError('catalog colors must be opaque: ' + src)
+    rgb = np.round(rgba[:, :3] * 255).astype(np.uint8)
+
+    offsets = np.zeros(len(counts) + 1, dtype='<u4')
+    np.cumsum(counts, out=offsets[1:])
+
+    meta = dict(catalog)
+    meta['palettes'] = [dict((k, v) for k, v in palette.items() if k != 'colors') for palette in catalog['palettes']]
+    meta = json.dumps(meta, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    meta += b' ' * (-(len(_CATALOG_MAGIC) + _CATALOG_HEADER.itemsize + offsets.nbytes + len(meta)) % 4)
+
+    header = np.array([(len(counts), len(meta), len(rgb))], dtype=_CATALOG_HEADER)
+    with open(dst, 'wb') as f:
+        f.write(_CATALOG_MAGIC)
+        f.write(header.tobytes())
+        f.write(offsets.tobytes())
+        f.write(meta)
+        f.write(rgb.tobytes())
+    return dst
+
+
+def read_catalog(path, mmap=True):
+    '''
+    配色カタログを読み込む。レジストリには登録しない
+
+    Parameters
+    ---------
+    path : str
+        カタログのパス。拡張子が .json なら JSON、それ以外はバイナリとして読む
+
+    mmap : bool
+        バイナリを memory-map で読むかどうか。
+        False の場合はファイル全体をメモリに読み込む
+
+    Returns
+    ------
+    cure_registry instance
+
+    '''
+    if path.endswith('.json'):
+        with open(path, encoding='utf-8') as f:
+            return _registry_from_json(json.load(f))
+
+    if mmap:
+        data = np.memmap(path, dtype=np.uint8, mode='r')
+    else:
+        data = np.fromfile(path, dtype=np.uint8)
+
+    magic_size = len(_CATALOG_MAGIC)
+    if data[:magic_size].tobytes() != _CATALOG_MAGIC:
+        raise ValueError('not a precure palette catalog: ' + path)
+
+    pos = magic_size
+    header = data[pos:pos + _CATALOG_HEADER.itemsize].view(_CATALOG_HEADER)[0]
+    pos += _CATALOG_HEADER.itemsize
+    n_palettes, meta_size, n_colors = int(header['n_palettes']), int(header['meta_size']), int(header['n_colors'])
+
+    offsets = data[pos:pos + (n_palettes + 1) * 4].view('<u4')
+    pos += offsets.nbytes
+    catalog = json.loads(data[pos:pos + meta_size].tobytes().decode('utf-8'))
+    pos += meta_size
+    rgb = data[pos:pos + n_colors * 3].reshape(-1, 3)
+
+    return _registry_from_json(catalog, rgb, offsets.tolist())
+
+
+def _read_builtin_catalog():
+    # コンパイル済みのバイナリがなければ JSON を読む
+    if os.path.exists(CATALOG_BIN):
+        return read_catalog(CATALOG_BIN).validate()
+    return read_catalog(CATALOG_JSON).validate()
+
+
+_registry = None
+_registry_lock = threading.RLock()
+
+def get_registry():
+    '''
+    プロセス全体で共有する配色テーブルを返す。
+    初めて呼ばれたときに一度だけ作る
+
+    Returns
+    ------
+    cure_registry instance
+
+    '''
+    global _registry
+    registry = _registry
+    if registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = _read_builtin_catalog()
+            registry = _registry
+    return registry
+
+
+class registry_cache :
+    '''レジストリから作るオブジェクト (索引や計算結果) を1つだけ持つキャッシュ
+
+    レジストリが変わったときだけ build(registry) で作り直す。ロックと作り直しの判定は
+    ここだけで行うので、ほかのモジュールのレジストリごとのキャッシュもこれを使う
+    (precure_names.get_name_index、precure_analysis.get_color_index など)
+
+    Attributes
+    ----------
+    build : function
+        レジストリを受け取ってオブジェクトを作る関数。
+        作ったオブジェクトは、元のレジストリを registry 属性に持つこと
+
+    Examples
+    --------
+    >>> _index = registry_cache(cure_name_index)
+    >>> _index.get().lookup('cure black')
+
+    '''
+    def __init__(self, build):
+        self.build = build
+        self._value = None
+        self._lock = threading.Lock()
+
+    def get(self, registry=None):
+        '''
+        registry から作ったオブジェクトを返す。まだなければ作る
+
+        Parameters
+        ---------
+        registry : cure_registry instance
+            省略した場合はプロセス全体のレジストリ
+
+        '''
+        if registry is None:
+            registry = get_registry()
+        value = self._value
+        if value is None or value.registry is not registry:
+            with self._lock:
+                value = self._value
+                if value is None or value.registry is not registry:
+                    value = self._value = self.build(registry)
+        return value
+
+    def peek(self, registry):
+        '''
+        作り直さずに返す。registry から作ったものがなければ None
+        '''
+        value = self._value
+        return value if value is not None and value.registry is registry else None
+
+
+def load_catalog(path, mmap=True):
+    '''
+    配色カタログを読み込み、プロセス全体のレジストリに追加する。
+    同じ名前 (英語名) の配色はカタログのもので置き換える
+
+    Parameters
+    ---------
+    path : str
+        カタログのパス (JSON かバイナリ)
+
+    mmap : bool
+        バイナリを memory-map で読むかどうか
+
+    Returns
+    ------
+    cure_registry instance
+        追加後のレジストリ
+
+    Raises
+    ------
+    ValueError
+        作品の登場プリキュアに、配色が登録されていないものがいる場合や、
+        名称・属性名がほかの配色と重なる場合
+
+    '''
+    catalog = read_catalog(path, mmap=mmap)
+    return _update_registry(lambda registry: registry.merged(catalog).validate())
+
+
+# 生成済みのカラーマップを持っている _lazy_cmap_table。
+# 配色を置き換えたり削除したりしたときに、その配色の分だけ消す
+# (Mapping はハッシュできないので id をキーにする)
+_cmap_tables = weakref.WeakValueDictionary()
+
+def _update_registry(update):
+    # update(今のレジストリ) で作った新しいレジストリに切り替え、
+    # 置き換えた・削除した配色から作ったカラーマップと LUT を消す
+    global _registry
+    with _registry_lock:
+        old = get_registry()
+        registry = update(old)
+        _registry = registry
+        tables = list(_cmap_tables.values())
+
+    stale = set(old.entries).difference(registry.entries)
+    if len(stale) > 0:
+        for table in tables:
+            table.discard(stale)
+    return registry
+
+
+def _check_palette(palette):
+    if palette.kind not in _PALETTE_KINDS:
+        raise ValueError('unknown palette kind {!r} for {!r}'.format(palette.kind, palette.name))
+    if len(palette.colors) == 0:
+        raise ValueError('palette {!r} has no colors'.format(palette.name))
+    # 色として読めるか確かめる
+    palette.rgb
+    return palette
+
+
+def _check_names(registry, palettes, remove=(), errors=None):
+    # palettes を registry に追加・置き換え、remove を削除したときに、
+    # 名称と属性名がほかの配色 (英語名が違う配色) と重ならないか確かめて、登録できる配色を返す。
+    # errors に dict を渡すと、重なる配色は除いて 英語名 -> 例外 を入れる。渡さなければ ValueError
+    palettes = list(palettes)
+    while True:
+        replaced = set(palette.name for palette in palettes).union(remove)
+        kept = [entry for entry in registry.entries if entry.name not in replaced]
+        names = dict((alias, entry.name) for entry in kept for alias in entry.aliases)
+        attributes = dict((entry.attribute, entry.name) for entry in kept if entry.attribute is not None)
+        for palette in palettes:
+            taken = [alias for alias in palette.aliases if names.get(alias, palette.name) != palette.name]
+            if palette.attribute is not None and attributes.get(palette.attribute, palette.name) != palette.name:
+                taken.append(palette.attribute)
+            if len(taken) > 0:
+                error = ValueError('already registered: ' + ', '.join(taken))
+                if errors is None:
+                    raise error
+                # 除いた配色の元の配色が残るので、初めから確かめ直す
+                errors[palette.name] = error
+                palettes = [other for other in palettes if other is not palette]
+                break
+            names.update((alias, palette.name) for alias in palette.aliases)
+            if palette.attribute is not None:
+                attributes[palette.attribute] = palette.name
+        else:
+            return palettes
+
+
+def _replaced_registry(registry, palettes=(), remove=(), errors=None):
+    # 配色を追加・置き換え・削除したレジストリを作る。
+    # 配色を登録・変更する関数は、すべてここで色・種類と名称・属性名を確かめる
+    checked = []
+    for palette in palettes:
+        try:
+            checked.append(_check_palette(palette))
+        except ValueError as e:
+            if errors is None:
+                raise
+            errors[palette.name] = e
+    return registry.updated(_check_names(registry, checked, remove, errors), remove)
+
+
+def replace_palettes(palettes=(), remove=()):
+    '''
+    配色をまとめて追加・置き換え・削除し、レジストリを1回だけ切り替える。
+    register_palette・update_palette・unregister_palette と同じことを確かめる
+
+    Parameters
+    ---------
+    palettes : array of cure_palette
+        追加する配色。同じ名前 (英語名) の配色は置き換える
+
+    remove : array of str
+        削除する配色の名前 (英語名)
+
+    Returns
+    ------
+    dict
+        置き換えた・削除した配色の、元の配色 (英語名 -> cure_palette)
+
+    Raises
+    ------
+    ValueError
+        色・種類が正しくない配色や、名称・属性名がほかの配色と重なる配色がある場合
+
+    '''
+    palettes = list(palettes)
+    previous = dict()
+
+    def update(registry):
+        names = set(palette.name for palette in palettes).union(remove)
+        previous.clear()
+        previous.update((entry.name, entry) for entry in registry.entries if entry.name in names)
+        return _replaced_registry(registry, palettes, remove)
+
+    _update_registry(update)
+    return previous
+
+
+def check_palettes(palettes, remove=()):
+    '''
+    replace_palettes で登録できるか確かめる。レジストリは変えない
+
+    Returns
+    ------
+    dict
+        登録できない配色の英語名と例外。すべて登録できれば空
+
+    '''
+    errors = dict()
+    _replaced_registry(get_registry(), palettes, remove, errors)
+    return errors
+
+
+def register_palette(name, colors, aliases=(), kind='linear', attribute=None, title=None):
+    '''
+    配色を1つ、プロセス全体のレジストリに追加する。
+    ほかの配色のカラーマップやキャッシュはそのまま使える
+
+    Parameters
+    ---------
+    name : str
+        プリキュアの名称 (英語名)
+
+    colors : array of color (hexcode or color name)
+        色の配列
+
+    aliases : array of str
+        ほかの名称 (日本語名など)
+
+    kind : str
+        カラーマップの種類。'linear' か 'qualitative'
+
+    attribute : str
+        cure_colormap の属性名 (cure_black など)
+
+    title : str
+        初登場の作品タイトル
+
+    Returns
+    ------
+    cure_palette instance
+        登録した配色
+
+    Raises
+    ------
+    ValueError
+        同じ名称の配色がすでにある場合や、色・種類が正しくない場合
+
+    '''
+    names = tuple(alias for alias in aliases if alias != name) + (name,)
+    palette = cure_palette(name, names, colors, title, kind, attribute)
+
+    def update(registry):
+        if name in registry.palettes:
+            raise ValueError('already registered: ' + name)
+        return _replaced_registry(registry, [palette])
+
+    _update_registry(update)
+    return palette
+
+
+def update_palette(name, colors=None, aliases=None, kind=None, attribute=None, title=None):
+    '''
+    登録されている配色を1つ置き換える。
+    置き換えた配色から作ったカラーマップと LUT だけを作り直す
+
+    Parameters
+    ---------
+    name : str
+        プリキュアの名称 (日本語名・英語名)
+
+    colors, aliases, kind, attribute, title
+        変える項目 (register_palette を参照)。省略した項目は元の配色のまま
+
+    Returns
+    ------
+    cure_palette instance
+        置き換えた後の配色
+
+    Raises
+    ------
+    KeyError
+        登録されていない名称の場合
+
+    ValueError
+        名称・属性名がほかの配色と重なる場合や、色・種類が正しくない場合
+
+    '''
+    result = []
+
+    def update(registry):
+        old = registry.palettes.get(name)
+        if old is None:
+            raise KeyError(name)
+        names = old.aliases if aliases is None else tuple(a for a in aliases if a != old.name) + (old.name,)
+        palette = cure_palette(
+            old.name, names,
+            old.colors if colors is None else colors,
+            old.title if title is None else title,
+            old.kind if kind is None else kind,
+            old.attribute if attribute is None else attribute,
+            rgb=old.rgb if colors is None else None)
+        result.append(palette)
+        return _replaced_registry(registry, [palette])
+
+    _update_registry(update)
+    return result[0]
+
+
+def unregister_palette(name):
+    '''
+    登録されている配色を1つ削除する。作品の登場プリキュアからも除く
+
+    Parameters
+    ---------
+    name : str
+        プリキュアの名称 (日本語名・英語名)
+
+    Returns
+    ------
+    cure_palette instance
+        削除した配色
+
+    Raises
+    ------
+    KeyError
+        登録されていない名称の場合
+
+    '''
+    result = []
+
+    def update(registry):
+        palette = registry.palettes.get(name)
+        if palette is None:
+            raise KeyError(name)
+        result.append(palette)
+        return _replaced_registry(registry, remove=[palette.name])
+
+    _update_registry(update)
+    return result[0]
+
+
+def _cmap_nbytes(cmap):
+    # Colormap の (定義の配列, matplotlib が作った float64 の LUT) のバイト数
+    data = getattr(cmap, '_segmentdata', None)
+    if data is not None:
+        size = sum(np.asarray(value).nbytes for value in data.values() if not callable(value))
+    else:
+        size = np.asarray(getattr(cmap, 'colors', ())).nbytes
+    lut = cmap.__dict__.get('_lut')
+    return size, 0 if lut is None else lut.nbytes
+
+
+# 段階数・種類・向きを変えたカラーマップを、インスタンスごとにいくつまで取っておくか
+VARIANT_CACHE_SIZE = 256
+
+# compact なインスタンスで取っておく数
+COMPACT_VARIANT_CACHE_SIZE = 16
+
+_VARIANT_KINDS = ('linear', 'qualitative', 'banded')
+
+
+class _lazy_cmap_table(Mapping):
+    '''プリキュアの名称から Colormap を引く辞書
+
+    配色は共有のレジストリから引き、Colormap は初めて参照されたときに生成する。
+    同じ配色に対応する名前 (日本語名・英語名) は、生成した Colormap を共有する。
+    generate_cure_cmap で追加した配色は、このインスタンスだけに登録する。
+
+    compact が True なら、生成した Colormap は使われている間だけ持ち (弱参照)、
+    LUT は全インスタンスで共有する cure_palette_store から引く。
+
+    '''
+    def __init__(self, build, max_variants=VARIANT_CACHE_SIZE, compact=False):
+        self._build = build
+        self.compact = compact
+        # インスタンスだけに追加した配色。名前 -> cure_palette
+        self._local = dict()
+        # インスタンスだけに追加した配色の正規化した名称。キー -> cure_palette
+        self._local_keys = dict()
+        # 生成済みの Colormap。cure_palette -> Colormap
+        self._cmaps = weakref.WeakValueDictionary() if compact else dict()
+        # compact のとき、インスタンスだけに追加した配色の Colormap (作り直せないので持っておく)
+        self._pinned = dict()
+        # 生成済みの LUT。(cure_palette, 段階数) -> LUT
+        self._luts = dict()
+        # カテゴリに割り当てる色 (float64 の RGBA)。cure_palette -> 色の配列
+        self._category_colors = dict()
+        # 生成済みの変形したカラーマップ (LRU)。(cure_palette, 段階数, 種類, 反転) -> Colormap
+        self._variants = OrderedDict()
+        self._variants_lock = threading.Lock()
+        self.max_variants = max_variants
+        _cmap_tables[id(self)] = self
+
+    def register(self, palette, cmap=None):
+        import precure_names
+        for name in palette.aliases:
+            self._local[name] = palette
+            for key in precure_names.name_keys(name):
+                self._local_keys[key] = palette
+        if cmap is not None and len(palette.aliases) > 0:
+            self._cmaps[palette] = cmap
+            if self.compact:
+                self._pinned[palette] = cmap
+
+    def palette(self, name):
+        palette = self._local.get(name)
+        if palette is None:
+            palette = get_registry().palettes[name]
+        return palette
+
+    def find(self, name):
+        '''
+        名称に対応する cure_palette を返す。
+        完全一致しなければ、正規化した名称 (大文字・小文字、空白、全角・半角、
+        ひらがな・カタカナ・ローマ字の違いを無視) で探す。なければ None
+        '''
+        palette = self._local.get(name)
+        if palette is None:
+            registry = get_registry()
+            palette = registry.palettes.get(name)
+            if palette is None and isinstance(name, str):
+                import precure_names
+                # インスタンスだけに追加した配色を先に探す
+                for key in precure_names.name_keys(name):
+                    palette = self._local_keys.get(key)
+                    if palette is not None:
+                        return palette
+                palette = precure_names.get_name_index(registry).lookup(name)
+        return palette
+
+    def build(self, palette):
+        cmap = self._cmaps.get(palette)
+        if cmap is None:
+            with precure_stats.timer('cmap_cache.build'):
+                cmap = self._build(palette)
+            if cmap is not None:
+                cmap = self._cmaps.setdefault(palette, cmap)
+            if precure_stats.active is not None:
+                precure_stats.active.count('cmap_cache.miss')
+        elif precure_stats.active is not None:
+            precure_stats.active.count('cmap_cache.hit')
+        return cmap
+
+    def cached(self, palette):
+        '''
+        生成済みの Colormap を返す。なければ None
+        '''
+        return self._cmaps.get(palette)
+
+    def insert(self, palette, cmap):
+        '''
+        まとめて生成した Colormap を入れ、実際に持っている Colormap を返す。
+        compact なら弱参照なので、呼び出し側が返り値を持っておく
+        '''
+        return self._cmaps.setdefault(palette, cmap)
+
+    def lut(self, palette, n=None):
+        if n is not None and n < 1:
+            raise ValueError('n must be at least 1')
+        if self.compact and n is None:
+            store = get_palette_store()
+            if palette in store:
+                precure_stats.count('lut_cache.store')
+                return store.lut(palette)
+
+        lut = self._luts.get((palette, n))
+        if lut is None:
+            if self.compact and palette not in self._pinned:
+                # Colormap を作らずに、配色から直接作る
+                lut = palettes_to_luts([palette], native_lut_size(palette) if n is None else n)[0]
+            else:
+                lut = colormap_to_lut(self.build(palette), n)
+            lut.flags.writeable = False
+            lut = self._luts.setdefault((palette, n), lut)
+            precure_stats.count('lut_cache.miss')
+        elif precure_stats.active is not None:
+            precure_stats.active.count('lut_cache.hit')
+        return lut
+
+    def category_colors(self, palette):
+        # generate_cmap_q と同じ色 (8bit に丸めて不透明にした RGBA)
+        colors = self._category_colors.get(palette)
+        if colors is None:
+            colors = np.ones((len(palette.rgb), 4))
+            colors[:, :3] = palette.rgb / 255
+            colors.flags.writeable = False
+            colors = self._category_colors.setdefault(palette, colors)
+        return colors
+
+    def variant(self, palette, n=None, kind=None, reverse=False):
+        key = (palette, n, kind, reverse)
+        with self._variants_lock:
+            cmap = self._variants.get(key)
+            if cmap is not None:
+                self._variants.move_to_end(key)
+        if cmap is not None:
+            precure_stats.count('variant_cache.hit')
+            return cmap
+
+        precure_stats.count('variant_cache.miss')
+        cmap = _variant_cmap(self.build(palette), palette, n, kind, reverse)
+        if cmap is None:
+            return None
+        with self._variants_lock:
+            cmap = self._variants.setdefault(key, cmap)
+            self._variants.move_to_end(key)
+            while len(self._variants) > self.max_variants:
+                self._variants.popitem(last=False)
+        return cmap
+
+    def memory_report(self):
+        # 部分ごとのバイト数。memory_report を参照
+        cmaps = list(self._cmaps.values())
+        with self._variants_lock:
+            variants = list(self._variants.values())
+        cmap_sizes = [_cmap_nbytes(cmap) for cmap in cmaps]
+        variant_sizes = [_cmap_nbytes(cmap) for cmap in variants]
+        return {
+            'colormaps': sum(size for size, _ in cmap_sizes),
+            'colormap_luts': sum(lut for _, lut in cmap_sizes),
+            'luts': sum(lut.nbytes for lut in list(self._luts.values()) + list(self._category_colors.values())),
+            'variants': sum(size + lut for size, lut in variant_sizes),
+        }
+
+    def discard(self, palettes):
+        '''
+        指定した配色から作ったカラーマップ・LUT・変形したカラーマップを消す
+        '''
+        for palette in palettes:
+            self._cmaps.pop(palette, None)
+            self._category_colors.pop(palette, None)
+        for key in [key for key in list(self._luts) if key[0] in palettes]:
+            self._luts.pop(key, None)
+        with self._variants_lock:
+            for key in [key for key in self._variants if key[0] in palettes]:
+                del self._variants[key]
+        precure_stats.count('cmap_cache.discard', len(palettes))
+
+    def __getitem__(self, name):
+        return self.build(self.palette(name))
+
+    def __iter__(self):
+        palettes = get_registry().palettes
+        yield from palettes
+        for name in self._local:
+            if name not in palettes:
+                yield name
+
+    def __len__(self):
+        palettes = get_registry().palettes
+        return len(palettes) + sum(1 for name in self._local if name not in palettes)
+
+    def __contains__(self, name):
+        return name in self._local or name in get_registry().palettes
+
+
+
+#########################################################
+#                                                       #
+# カラーマップの生成                                     #
+#                                                       #
+#########################################################
+
+# 16進数の文字 (ASCII) -> 値。16進数でない文字は -1
+_HEX_DIGITS = np.full(256, -1, dtype=np.int16)
+for _i, _c in enumerate(b'0123456789abcdef'):
+    _HEX_DIGITS[_c] = _i
+for _i, _c in enumerate(b'ABCDEF'):
+    _HEX_DIGITS[_c] = _i + 10
+del _i, _c
+
+
+def _decode_colors(colors):
+    '''
+    色の配列をまとめて RGBA (float64, shape (N, 4)) に変換する
+
+    '#rrggbb' 形式の色は NumPy でまとめて変換し、
+    それ以外 (色名や '#rgb' など) は matplotlib に任せる
+
+    '''
+    colors = list(colors)
+    rgba = np.ones((len(colors), 4))
+    if len(colors) == 0:
+        return rgba
+
+    is_hex = np.fromiter((isinstance(c, str) and len(c) == 7 and c[0] == '#' and c.isascii() for c in colors),
+                         dtype=bool, count=len(colors))
+    if is_hex.all():
+        # よくある全部16進数の場合は、インデックスを使わずに変換する
+        digits = _HEX_DIGITS[np.frombuffer(''.join(colors).encode('ascii'), dtype=np.uint8).reshape(-1, 7)[:, 1:]]
+        if digits.min() >= 0:
+            rgba[:, :3] = (digits[:, 0::2] * 16 + digits[:, 1::2]) / 255
+            return rgba
+
+    index = np.flatnonzero(is_hex)
+    if len(index) > 0:
+        text = ''.join(colors[i] for i in index).encode('ascii')
+        digits = _HEX_DIGITS[np.frombuffer(text, dtype=np.uint8).reshape(-1, 7)[:, 1:]]
+        valid = np.all(digits >= 0, axis=1)
+        rgba[index[valid], :3] = (digits[valid, 0::2] * 16 + digits[valid, 1::2]) / 255
+        is_hex[index[~valid]] = False
+
+    others = np.flatnonzero(~is_hex)
+    if len(others) > 0:
+        rgba[others] = to_rgba_array([colors[i] for i in others])
+    return rgba
+
+
+def _linear_cmap(rgba, name='custom_cmap', vals=None):
+    # LinearSegmentedColormap.from_list と同じ segmentdata を直接作る。
+    # vals を指定した場合は、その位置に色を置く
+    if vals is None:
+        vals = np.arange(len(rgba)) / (len(rgba) - 1)
+    segmentdata = dict((channel, np.column_stack([vals, rgba[:, i], rgba[:, i]]))
+                       for i, channel in enumerate(('red', 'green', 'blue', 'alpha')))
+    return LinearSegmentedColormap(name, segmentdata)
+
+
+def _listed_cmap(rgba, n=None):
+    # Qualitative なカラーマップは不透明にし、各色を 8bit に丸める
+    # (seaborn.color_palette(colors).as_hex() を通したときと同じ色)。
+    # n を指定した場合は、色を繰り返して n 色にする
+    if n is not None:
+        rgba = np.take(rgba, np.arange(n), axis=0, mode='wrap')
+    rgba = np.round(rgba * 255) / 255
+    rgba[:, 3] = 1.0
+    return ListedColormap(rgba)
+
+
+
+def _palette_rgba(palette):
+    # 配色の色を RGBA (float64) にする。色の指定があればそれを使う
+    if palette._colors is not None:
+        return _decode_colors(palette._colors)
+    rgba = np.ones((len(palette.rgb), 4))
+    rgba[:, :3] = palette.rgb / 255
+    return rgba
+
+
+def _variant_cmap(base, palette, n, kind, reverse):
+    # base (palette のカラーマップ) から、段階数・種類・向きを変えたカラーマップを作る
+    if base is None:
+        return None
+    if kind is None:
+        kind = palette.kind
+
+    if kind == 'banded':
+        # n 色の帯。グラデーションは両端を含めて等間隔に取り出し、Qualitative は色を繰り返す
+        if n is None:
+            n = len(palette.rgb)
+        if isinstance(base, ListedColormap):
+            cmap = _listed_cmap(to_rgba_array(base.colors), n)
+        else:
+            cmap = ListedColormap(base(np.linspace(0, 1, n)))
+    elif kind == 'qualitative':
+        cmap = base if palette.kind == 'qualitative' and n is None else _listed_cmap(_palette_rgba(palette), n)
+    else:
+        if palette.kind == 'linear':
+            cmap = base
+        else:
+            rgba = _palette_rgba(palette)
+            if len(rgba) < 2:
+                return None
+            cmap = _linear_cmap(rgba)
+        if n is not None:
+            cmap = cmap.resampled(n)
+
+    if reverse:
+        cmap = cmap.reversed()
+    return cmap
+
+
+
+#########################################################
+#                                                       #
+# LUT (ルックアップテーブル)                              #
+#                                                       #
+#########################################################
+
+# NaN やマスクされた値の色 (matplotlib の既定と同じく透明)
+_BAD_RGBA = np.zeros(4, dtype=np.uint8)
+
+
+def colormap_to_lut(cmap, n=None):
+    '''
+    カラーマップを uint8 の LUT にする
+
+    Parameters
+    ---------
+    cmap : matplotlib.colors.Colormap instance
+        generate_cmap か generate_cmap_q で作ったカラーマップ
+
+    n : int
+        LUT の段階数。省略した場合はカラーマップの段階数 (cmap.N)
+
+    Returns
+    ------
+    numpy.ndarray of uint8, shape (n, 4)
+        0 から 1 を n 等分した各区間の RGBA
+
+    '''
+    if n is None:
+        n = cmap.N
+    if n < 1:
+        raise ValueError('n must be at least 1')
+
+    # i 番目の区間 [i/n, (i+1)/n) の代表値で引く。
+    # n == cmap.N なら cmap の LUT そのものになる
+    return cmap((np.arange(n) + 0.5) / n, bytes=True)
+
+
+def _gradient_tables(rgba, N):
+    # 色の数が同じ配色のグラデーションの LUT (float64, shape (配色の数, N, 4)) をまとめて作る。
+    # matplotlib の _create_lookup_table と同じ計算を、配色の軸を足して一度に行う
+    m = rgba.shape[1]
+    x = (np.arange(m) / (m - 1)) * (N - 1)
+    xind = (N - 1) * np.linspace(0, 1, N)
+    ind = np.searchsorted(x, xind)[1:-1]
+    distance = ((xind[1:-1] - x[ind - 1]) / (x[ind] - x[ind - 1]))[:, np.newaxis]
+    table = np.concatenate([rgba[:, :1], distance * (rgba[:, ind] - rgba[:, ind - 1]) + rgba[:, ind - 1], rgba[:, -1:]],
+                           axis=1)
+    return np.clip(table, 0.0, 1.0)
+
+
+def palettes_to_luts(palettes, n=256):
+    '''
+    配色の LUT をまとめて作る
+
+    カラーマップを1つずつ作らず、色の数が同じ配色ごとに NumPy でまとめて計算する。
+    結果は generate_cmaps_batch で作ったカラーマップの colormap_to_lut と同じ
+
+    Parameters
+    ---------
+    palettes : array of cure_palette
+
+    n : int
+        LUT の段階数
+
+    Returns
+    ------
+    numpy.ndarray of uint8, shape (配色の数, n, 4)
+        グラデーションにできない配色 (1色以下の 'linear') の行は 0
+
+    '''
+    palettes = list(palettes)
+    luts = np.zeros((len(palettes), n, 4), dtype=np.uint8)
+    # i 番目の区間の代表値 (colormap_to_lut と同じ)
+    x = (np.arange(n) + 0.5) / n
+
+    groups = dict()
+    for i, palette in enumerate(palettes):
+        groups.setdefault((palette.kind, len(palette.rgb)), []).append(i)
+
+    for (kind, m), index in groups.items():
+        if m == 0 or (kind == 'linear' and m < 2):
+            continue
+        rgba = np.ones((len(index), m, 4))
+        rgba[..., :3] = np.stack([palettes[i].rgb for i in index]) / 255
+        if kind == 'qualitative':
+            # _listed_cmap と同じく 8bit に丸めて不透明にする
+            rgba = np.round(rgba * 255) / 255
+            rgba[..., 3] = 1.0
+            N = m
+            table = rgba
+        else:
+            N = 256
+            table = _gradient_tables(rgba, N)
+
+        # cmap(x, bytes=True) と同じ引き方
+        xa = x * N
+        xa[xa == N] = N - 1
+        luts[index] = (table * 255).astype(np.uint8)[:, np.minimum(xa.astype(int), N - 1)]
+    return luts
+
+
+def native_lut_size(palette):
+    '''
+    配色のカラーマップの段階数 (get_lut で n を省略したときの LUT の段階数) を返す
+
+    Parameters
+    ---------
+    palette : cure_palette instance
+
+    Returns
+    ------
+    int
+        'qualitative' なら色の数、それ以外は 256。カラーマップを作れない配色なら 0
+
+    '''
+    m = len(palette.rgb)
+    if palette.kind == 'qualitative':
+        return m
+    return 256 if m > 1 else 0
+
+
+class cure_palette_store :
+    '''全配色の色と LUT を、それぞれ1つの連続した uint8 の配列に詰めて持つ
+
+    i 番目の配色の色は rgb[color_offsets[i]:color_offsets[i + 1]]、
+    LUT (カラーマップの段階数の分。colormap_to_lut(cmap) と同じ) は
+    luts[lut_offsets[i]:lut_offsets[i + 1]]。
+    どちらも書き込み不可で、取り出すのは配列のビューなのでコピーしない
+
+    Attributes
+    ----------
+    registry : cure_registry instance
+        ストアを作ったレジストリ
+
+    rgb : numpy.ndarray of uint8, shape (色の総数, 3)
+
+    color_offsets : numpy.ndarray of int64, shape (配色の数 + 1,)
+
+    luts : numpy.ndarray of uint8, shape (LUT の行の総数, 4)
+
+    lut_offsets : numpy.ndarray of int64, shape (配色の数 + 1,)
+
+    '''
+    def __init__(self, registry):
+        self.registry = registry
+        palettes = registry.entries
+        self._index = dict((palette, i) for i, palette in enumerate(palettes))
+
+        self.color_offsets = np.zeros(len(palettes) + 1, dtype=np.int64)
+        np.cumsum([len(palette.rgb) for palette in palettes], out=self.color_offsets[1:])
+        self.rgb = np.zeros((self.color_offsets[-1], 3), dtype=np.uint8)
+        for palette, start, stop in zip(palettes, self.color_offsets[:-1], self.color_offsets[1:]):
+            self.rgb[start:stop] = palette.rgb
+
+        sizes = [native_lut_size(palette) for palette in palettes]
+        self.lut_offsets = np.zeros(len(palettes) + 1, dtype=np.int64)
+        np.cumsum(sizes, out=self.lut_offsets[1:])
+        self.luts = np.zeros((self.lut_offsets[-1], 4), dtype=np.uint8)
+        # 段階数が同じ配色ごとに、palettes_to_luts でまとめて作る
+        groups = dict()
+        for i, n in enumerate(sizes):
+            if n > 0:
+                groups.setdefault(n, []).append(i)
+        for n, index in groups.items():
+            for i, lut in zip(index, palettes_to_luts([palettes[i] for i in index], n)):
+                self.luts[self.lut_offsets[i]:self.lut_offsets[i + 1]] = lut
+
+        self.rgb.flags.writeable = False
+        self.luts.flags.writeable = False
+
+    def __contains__(self, palette):
+        return palette in self._index
+
+    def colors(self, palette):
+        '''
+        配色の RGB 値 (uint8, shape (色の数, 3)) のビューを返す
+        '''
+        i = self._index[palette]
+        return self.rgb[self.color_offsets[i]:self.color_offsets[i + 1]]
+
+    def lut(self, palette):
+        '''
+        配色の LUT (uint8, shape (cmap.N, 4)) のビューを返す。カラーマップを作れない配色なら None
+        '''
+        i = self._index[palette]
+        start, stop = self.lut_offsets[i], self.lut_offsets[i + 1]
+        return self.luts[start:stop] if stop > start else None
+
+    @property
+    def nbytes(self):
+        return self.rgb.nbytes + self.luts.nbytes + self.color_offsets.nbytes + self.lut_offsets.nbytes
+
+
+_palette_store = registry_cache(cure_palette_store)
+
+def get_palette_store(registry=None):
+    '''
+    レジストリの全配色を詰めた cure_palette_store を返す。レジストリが変わったときだけ作り直す
+
+    Parameters
+    ---------
+    registry : cure_registry instance
+        省略した場合はプロセス全体のレジストリ
+
+    Returns
+    ------
+    cure_palette_store instance
+
+    '''
+    return _palette_store.get(registry)
+
+
+def factorize(values):
+    '''
+    ラベルの配列を、カテゴリの番号とカテゴリの一覧にする
+
+    pandas の Categorical (とそれを持つ Series) はカテゴリの番号をそのまま使う。
+    それ以外は値を並べ替えた順に番号を付ける (並べ替えられなければ出てきた順)。
+    pandas.factorize を使い、pandas がなければ numpy.unique (object 配列は dict) を使う
+
+    Parameters
+    ---------
+    values : array_like or pandas.Series
+        ラベルの配列
+
+    Returns
+    ------
+    (numpy.ndarray of int, array)
+        カテゴリの番号と、カテゴリの一覧。欠損値 (NaN, None) の番号は -1
+
+    '''
+    try:
+        import pandas as pd
+    except ImportError:
+        pd = None
+
+    if pd is not None:
+        if isinstance(getattr(values, 'dtype', None), pd.CategoricalDtype):
+            categorical = values.array if isinstance(values, (pd.Series, pd.Index)) else values
+            return np.asarray(categorical.codes), categorical.categories
+        if not isinstance(values, (pd.Series, pd.Index)):
+            values = np.asarray(values).ravel()
+        # ハッシュで番号を付けてからカテゴリだけを並べ替えるので、numpy.unique より速い
+        try:
+            return pd.factorize(values, sort=True)
+        except TypeError:
+            return pd.factorize(values)
+
+    values = np.asarray(values).ravel()
+    if values.dtype.kind == 'O':
+        return _factorize_objects(values)
+    categories, codes = np.unique(values, return_inverse=True)
+    if values.dtype.kind in 'fc':
+        # NaN は最後に1つにまとまる
+        missing = np.isnan(categories)
+        if missing.any():
+            codes[codes >= np.argmax(missing)] = -1
+            categories = categories[~missing]
+    return codes.ravel(), categories
+
+
+def _factorize_objects(values):
+    # None や型の混ざった object 配列は numpy.unique で比べられないので、出てきた順に dict で番号を付ける。
+    # 並べ替えられればカテゴリを並べ替えた順に付け直す (pandas.factorize(sort=True) と同じ結果)
+    index = {}
+    codes = np.empty(len(values), dtype=np.intp)
+    for i, value in enumerate(values):
+        if value is None or (isinstance(value, float) and value != value):
+            codes[i] = -1
+        else:
+            codes[i] = index.setdefault(value, len(index))
+    categories = np.empty(len(index), dtype=object)
+    for i, value in enumerate(index):
+        categories[i] = value
+    try:
+        order = sorted(range(len(categories)), key=categories.__getitem__)
+    except TypeError:
+        return codes, categories
+    renumber = np.empty(len(order) + 1, dtype=np.intp)
+    renumber[order] = np.arange(len(order))
+    renumber[-1] = -1
+    return renumber[codes], categories[order]
+
+
+def apply_lut(lut, data, vmin=None, vmax=None, out=None):
+    '''
+    LUT で配列に色を付ける
+
+    vmin から vmax を LUT の段階数で等分して量子化し、LUT を引く。
+    matplotlib の cmap(Normalize(vmin, vmax)(data), bytes=True) と同じ色になる。
+    範囲外の値は両端の色、NaN とマスクされた値は透明にする
+
+    Parameters
+    ---------
+    lut : numpy.ndarray of uint8, shape (n, 4)
+        colormap_to_lut で作った LUT
+
+    data : array_like
+        色を付ける配列
+
+    vmin, vmax : float
+        LUT の両端に対応する値。省略した場合は data の最小値・最大値
+
+    out : numpy.ndarray of uint8, shape data.shape + (4,)
+        結果を書き込む配列。省略した場合は新しく確保する
+
+    Returns
+    ------
+    numpy.ndarray of uint8, shape data.shape + (4,)
+
+    '''
+    mask = np.ma.getmask(data) if np.ma.isMaskedArray(data) else None
+    # 範囲はマスクしていない値から求める
+    valid = np.ma.compressed(data) if mask is not None else np.asarray(data)
+    data = np.asarray(data)
+    if vmin is None:
+        vmin = np.nanmin(valid) if valid.size > 0 else 0.0
+    if vmax is None:
+        vmax = np.nanmax(valid) if valid.size > 0 else 1.0
+    vmin = float(vmin)
+    vmax = float(vmax)
+
+    n = len(lut)
+    if out is None:
+        out = np.empty(data.shape + (4,), dtype=np.uint8)
+    elif out.shape != data.shape + (4,) or out.dtype != np.uint8:
+        raise ValueError('out must be a uint8 array of shape {}'.format(data.shape + (4,)))
+
+    # float32 の配列は float32 のまま計算して、一時配列を小さくする
+    dtype = np.float32 if data.dtype == np.float32 else np.float64
+    scaled = np.subtract(data, vmin, dtype=dtype)
+    if vmax > vmin:
+        scaled /= (vmax - vmin)
+        scaled *= n
+    else:
+        scaled[...] = 0
+    np.clip(scaled, 0, n - 1, out=scaled)
+
+    # LUT の末尾に「値なし」の色を足して、NaN とマスクをそこへ向ける
+    bad = np.isnan(scaled)
+    if mask is not None and mask is not np.ma.nomask:
+        bad |= mask
+    if bad.any():
+        lut = np.concatenate([lut, _BAD_RGBA[np.newaxis]])
+        scaled[bad] = n
+
+    # インデックスは範囲内に揃えてあるので、mode='clip' で out への直接書き込みにする
+    np.take(lut, scaled.astype(np.intp), axis=0, out=out, mode='clip')
+    return out
+
+
+
+#########################################################
+#                                                       #
+# グラデーション画像のキャッシュ                          #
+#                                                       #
+#########################################################
+
+class swatch_cache :
+    '''描画したグラデーションの帯 (uint8 の RGBA 画像) をディスクに保存するキャッシュ
+
+    配色の色・種類・段階数・画像の大きさから作ったハッシュをファイル名にして
+    PNG で保存する。合計サイズが max_bytes を超えたら、
+    最後に使ってから時間が経ったものから消す
+
+    Attributes
+    ----------
+    directory : str
+        PNG を保存するディレクトリ
+
+    max_bytes : int
+        キャッシュの合計サイズの上限 [byte]
+
+    '''
+    def __init__(self, directory, max_bytes=64 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # 合計サイズの見込み [byte]。None なら次の put でディレクトリを調べる
+        self._total = None
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(palette, width, height):
+        '''
+        配色とグラデーションの大きさからキャッシュのキーを作る
+        '''
+        digest = hashlib.sha1()
+        # 透明度も含め、色を丸めずに比べる
+        digest.update(np.ascontiguousarray(_decode_colors(palette.colors), dtype=np.float64).tobytes())
+        digest.update('{}:{}:{}'.format(palette.kind, width, height).encode('ascii'))
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + '.png')
+
+    def get(self, key):
+        '''
+        キャッシュした画像を返す。なければ None
+        '''
+        from PIL import Image
+
+        path = self.path(key)
+        try:
+            with Image.open(path) as image:
+                swatch = np.asarray(image.convert('RGBA'))
+        except OSError:
+            return None
+
+        # 使ったので LRU の順番を更新する
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return swatch
+
+    def put(self, key, swatch):
+        '''
+        画像をキャッシュに保存し、上限を超えた分を古いものから消す
+        '''
+        from PIL import Image
+
+        path = self.path(key)
+        tmp_path = '{}.{}.{}.tmp'.format(path, os.getpid(), threading.get_ident())
+        Image.fromarray(swatch, 'RGBA').save(tmp_path, format='PNG')
+        size = os.path.getsize(tmp_path)
+        try:
+            replaced = os.path.getsize(path)
+        except FileNotFoundError:
+            replaced = 0
+        os.replace(tmp_path, path)
+
+        # 合計の見込みが上限以下なら、ディレクトリを調べずに済ませる
+        with self._lock:
+            if self._total is not None:
+                self._total += size - replaced
+                if self._total <= self.max_bytes:
+                    return path
+        self.evict()
+        return path
+
+    def evict(self):
+        '''
+        ディレクトリを調べて合計サイズを数え直し、上限を超えた分を古いものから消す
+        '''
+        with self._lock:
+            files = []
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith('.png'):
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+
+            total = sum(size for _, size, _ in files)
+            for _, size, path in sorted(files):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+            self._total = total
+
+    def clear(self):
+        with self._lock:
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith('.png'):
+                    os.remove(entry.path)
+            self._total = 0
+
+
+_swatch_cache = None
+
+def set_swatch_cache(cache, max_bytes=64 * 1024 * 1024):
+    '''
+    グラデーション画像のキャッシュを設定する。
+    環境変数 PRECURE_SWATCH_CACHE にディレクトリを指定しても有効になる
+
+    Parameters
+    ---------
+    cache : str or swatch_cache instance
+        キャッシュのディレクトリか swatch_cache。None ならキャッシュしない
+
+    max_bytes : int
+        ディレクトリを指定した場合の、キャッシュの合計サイズの上限 [byte]
+
+    Returns
+    ------
+    swatch_cache instance
+
+    '''
+    global _swatch_cache
+    if isinstance(cache, str):
+        cache = swatch_cache(cache, max_bytes)
+    _swatch_cache = cache
+    return cache
+
+
+def get_swatch_cache():
+    '''
+    設定されているグラデーション画像のキャッシュを返す。なければ None
+    '''
+    global _swatch_cache
+    if _swatch_cache is None and os.environ.get('PRECURE_SWATCH_CACHE'):
+        set_swatch_cache(os.environ['PRECURE_SWATCH_CACHE'])
+    return _swatch_cache
 
 
 
@@ -28,11 +1593,12 @@ class cure_colormap :
     
     Attributes
     ----------
-    name_to_cmap : dictionary object
-        プリキュアの名称と Colormap インスタンスのマップ
+    name_to_cmap : Mapping object
+        プリキュアの名称と Colormap インスタンスのマップ。
+        Colormap は参照されたときに生成する
     
-    title_to_characters : OrderedDict object
-       作品タイトルと登場プリキュアのマップ
+    title_to_characters : Mapping object
+       作品タイトルと登場プリキュアのマップ。全インスタンスで共有するので変更できない
     
     cure_black
     cure_white
@@ -41,9 +1607,15 @@ class cure_colormap :
     <ALL Precure> : matplotlib.colors.Colormap object
         各プリキュアのカラーマップ
         
-        TODO：インスタンス直接呼び出したかったからこうしていたけど、
-              全プリキュア分のインスタンス保持しとくのは無駄じゃない？
-              せっかく名前で呼べるんだから、呼び出されたときに生成すれば？
+        配色(16進数の色コード)はプロセス全体で共有する cure_registry に持ち、
+        Colormap は get_by_name や属性で初めて呼ばれたときに生成する。
+        一度生成した Colormap はインスタンスごとに使い回す。
+        インスタンスを使い回したいときは cure_colormap.default() を使う。
+
+        compact=True で作ったインスタンスは、Colormap を使われている間だけ持ち、
+        LUT は全インスタンスで共有する1つの uint8 の配列 (cure_palette_store) から引く。
+        段階数・種類・向きを変えたカラーマップは COMPACT_VARIANT_CACHE_SIZE 個までしか取っておかない。
+        使用量は memory_report() で確かめられる。
     
 
     Examples
@@ -71,292 +1643,538 @@ class cure_colormap :
     >>> plt.show()
 
     '''
-    def __init__(self):
-        self.name_to_cmap = dict()
-
-        # ふたりはプリキュア
-        self.cure_black = self.generate_cure_cmap(['#00072A', '#00072A', '#6e4001', '#FF3398', '#FBFBFB'], ['キュアブラック', 'Cure Black'])
-        self.cure_white = self.generate_cure_cmap(['#F4F4F4', '#F4F4F4', '#78DDE4', '#0365B5', '#120c4f'], ['キュアホワイト', 'Cure White'])
-
-        # ふたりはプリキュア Max Heart
-        self.shiny_luminous = self.generate_cure_cmap(['#FECF04', '#FEFB53', '#F5F7F7', '#FEB1D1', '#FE3521'], ['シャイニールミナス', 'Shiny Luminous'])
+    _default = None
+
+    def __init__(self, compact=False):
+        # 配色はプロセス全体で共有するレジストリから引く
+        if compact:
+            self.name_to_cmap = _lazy_cmap_table(self._build_cmap, max_variants=COMPACT_VARIANT_CACHE_SIZE,
+                                                 compact=True)
+        else:
+            self.name_to_cmap = _lazy_cmap_table(self._build_cmap)
+
+    @classmethod
+    def default(cls):
+        '''
+        プロセス全体で共有する cure_colormap インスタンスを返す
 
-        # ふたりはプリキュア Splash Star
-        self.cure_bloom = self.generate_cure_cmap(['#FCAC35', '#FFFF8E', '#FF3292', '#942953'], ['キュアブルーム', 'Cure Bloom'])
-        self.cure_bright = self.generate_cure_cmap(['#FDAD38', '#FBCF84', '#FFFFA6', '#F0E947', '#97F518', '#FFFFDF', '#F93B9A', '#DC0067', '#942953'], ['キュアブライト', 'Cure Bright']) # 東映公式に大きめの画像がない？ # https://www.asahi.co.jp/precure_ss/character/img/cb.gif
-        self.cure_eglet = self.generate_cure_cmap(['#711391', '#FFFFF3', '#D0D6FF', '#06FCD5'], ['キュアイーグレット', 'Cure Egret'])        
-        self.cure_windy = self.generate_cure_cmap(['#741B93', '#711391', '#D16FE7', '#F8F8F8', '#FFF3FD', '#FDB2E1', '#DFFFFF', '#01FEDE'], ['キュアウインディ', 'Cure Windy']) # 東映公式に大きめの画像がない？ # https://www.asahi.co.jp/precure_ss/character/img/cw.gif
-        self.kaoru_kiryuu = self.generate_cure_cmap(['#275D8A', '#DDECF1', '#E7F5FD', '#DDB9CB', '#CC87BB'], ['霧生薫', 'Kaoru Kiryuu']) # https://lohas.nicoseiga.jp/thumb/8016685i?1522857603
-        self.michiru_kiryuu = self.generate_cure_cmap(['#8D2045', '#DC98A9', '#C5E462', '#FFEE2C', '#F9FA9B', '#C11E7A'], ['霧生満', 'Michiru Kiryuu']) # https://lohas.nicoseiga.jp/thumb/8016685i?1522857603
+        Returns
+        ------
+        cure_colormap instance
 
-        # Yes!プリキュア5
-        self.cure_dream = self.generate_cure_cmap(['#A6366B', '#F14694', '#FFB8F9', '#FFFBCD', '#FFFBCD', '#ECD01B'], ['キュアドリーム', 'Cure Dream'])
-        self.cure_rouge = self.generate_cure_cmap(['#D34B32', '#EC9689', '#EC9689', '#FCEDFD', '#FCEDFD', '#FF1EA9'], ['キュアルージュ', 'Cure Rouge']) # 紫を入れたい #680CB1
-        self.cure_lemonade = self.generate_cure_cmap(['#D8A725', '#FFEE9E', '#FAF4C2', '#FDFDF7', '#FAC04D', '#E39B14'], ['キュアレモネード', 'Cure Lemonade'])
-        self.cure_mint = self.generate_cure_cmap(['#029476', '#55E5CD', '#FFFFF0', '#21AA03'], ['キュアミント', 'Cure Mint'])
-        self.cure_aqua = self.generate_cure_cmap(['#1452A4', '#B3D3FE', '#F2FDFD', '#0974CC', '#3C3DA3'], ['キュアアクア', 'Cure Aqua'])
-        
-        self.dark_dream = self.generate_cure_cmap(['#D02674', '#F9D1EC', '#313144', '#000000'], ['ダークドリーム', 'Dark Dream'])
-        self.dark_rouge = self.generate_cure_cmap(['#A92E3F', '#F8C8D6', '#313144', '#000000'], ['ダークルージュ', 'Dark Rouge'])
-        self.dark_remonade = self.generate_cure_cmap(['#AB7221', '#FCD516', '#313144', '#000000'], ['ダークレモネード', 'Dark Lemonade'])
-        self.dark_mint = self.generate_cure_cmap(['#05A67C', '#E1FEEF', '#313144', '#000000'], ['ダークミント', 'Dark Mint'])
-        self.dark_aqua = self.generate_cure_cmap(['#366CCB', '#B9E8F8', '#313144', '#000000'], ['ダークアクア', 'Dark Aqua'])
-
-        # Yes!プリキュア5GoGo!
-        self.milky_rose = self.generate_cure_cmap(['#9136cf', '#CA2DA2', '#E7C8F9', '#B4EBEA', '#0386F3'], ['ミルキィローズ', 'Milky Rose'])
-
-        # フレッシュプリキュア!
-        self.cure_peach = self.generate_cure_cmap(['#953678', '#DC3E72', '#FF8ABF', '#FFF4AC'], ['キュアピーチ', 'Cure Peach'])
-        self.cure_berry = self.generate_cure_cmap(['#353A57', '#2E7DCA', '#6AB7FE', '#C7B3FA'], ['キュアベリー', 'Cure Berry'])
-        self.cure_pine = self.generate_cure_cmap(['#9B4750', '#FD8E18', '#FFDA5C', '#DB7A45'], ['キュアパイン', 'Cure Pine'])
-        self.cure_passion = self.generate_cure_cmap(['#242B33', '#8E0331', '#DA2A3D', '#FFCBE5'], ['キュアパッション', 'Cure Passion'])
-        
-        # ハートキャッチプリキュア！
-        self.cure_blossom = self.generate_cure_cmap(['#cf1b71', '#F954BD', '#FD98D7', '#FEF3FE'], ['キュアブロッサム', 'Cure Blossom'])
-        self.cure_marine = self.generate_cure_cmap(['#4A7AED', '#6EB2F1', '#63DEED', '#EFFAFF'], ['キュアマリン', 'Cure Marine'])
-        self.cure_sunshine = self.generate_cure_cmap(['#F98435', '#FFAC05', '#FFE55C', '#DD991D'], ['キュアサンシャイン', 'Cure Sunshine'])
-        self.cure_moonlight = self.generate_cure_cmap(['#404A8F', '#6F7FDE', '#CDD5E2', '#D0B0D9'], ['キュアムーンライト', 'Cure Moonlight'])
-        self.cure_flower = self.generate_cure_cmap(['#CE7AAE', '#F8D1EC', '#F9FCBF', '#FD9CBF', '#CB1C55'], ['キュアフラワー', 'Cure Flower']) # https://www.asahi.co.jp/heartcatch_precure/img/character/photo/flower.png
-        self.dark_precure = self.generate_cure_cmap(['#171717', '#042F36', '#A6D8C6', '#FDA4BE', '#980E13'], ['ダークプリキュア', 'Dark Precure'])
-        
-        # スイートプリキュア♪
-        self.cure_melody = self.generate_cure_cmap(['#DC3688', '#FF78C4', '#F9A5C9', '#FFFFFF'], ['キュアメロディ', 'Cure Melody'])
-        self.cure_rhythm = self.generate_cure_cmap(['#D0A947', '#FDF48B', '#FAB7E5', '#FFFFFF'], ['キュアリズム', 'Cure Rhythm']) # まだやりようがある ＃ #FFFFFF が真ん中のほうがよくない？？？？
-        self.cure_beat = self.generate_cure_cmap(['#303277', '#728CF1', '#C2EBFC', '#D393F8', '#FFFFFF'], ['キュアビート', 'Cure Beat'])
-        self.cure_muse = self.generate_cure_cmap(['#C86424', '#FFAC4E', '#FACC2A', '#FFFB52', '#FFFFFF'], ['キュアミューズ', 'Cure Muse'])
-
-        # スマイルプリキュア! 
-        self.cure_happy = self.generate_cure_cmap(['#A62169', '#EB4CB0', '#FFFFFF'], ['キュアハッピー', 'Cure Happy'])
-        self.cure_sunny = self.generate_cure_cmap(['#A42C04', '#F95000', '#FEFFD5'], ['キュアサニー', 'Cure Sunny'])
-        self.cure_peace = self.generate_cure_cmap(['#D3A502', '#FDE552', '#FFFFEE'], ['キュアピース', 'Cure Peace'])
-        self.cure_march = self.generate_cure_cmap(['#208635', '#4DDC50', '#F3FED6'], ['キュアマーチ', 'Cure March'])
-        self.cure_beauty = self.generate_cure_cmap(['#3135A5', '#86A6FF', '#DAE7FA'], ['キュアビューティ', 'Cure Beauty'])
-
-        # ドキドキ!プリキュア
-        self.cure_heart = self.generate_cure_cmap(['#D4A615', '#FFF99E', '#FAFAFA', '#FAB1E2', '#EC3C9C'], ['キュアハート', 'Cure Heart'])
-        self.cure_diamond = self.generate_cure_cmap(['#4245AF', '#A8ACF9', '#FAFAFA', '#5791F1', '#597AA7'], ['キュアダイヤモンド', 'Cure Diamond'])
-        self.cure_rosetta = self.generate_cure_cmap(['#B3481E', '#FFC05C', '#FAFAFA', '#C9EFB6', '#F7DB3D'], ['キュアロゼッタ', 'Cure Rosetta'])
-        self.cure_sword = self.generate_cure_cmap(['#AE57B5', '#EEB4F8', '#FAFAFA', '#ADBBF5', '#8B87B2'], ['キュアソード', 'Cure Sword'])
-        self.cure_ace = self.generate_cure_cmap(['#A51318', '#FD757D', '#FFE8EC', '#FAFAFA', '#FFFFFF'], ['キュアハート', 'Cure Ace'])
-        self.cure_sebastian = self.generate_cure_cmap(['#36424E', '#E0EBF1', '#DB0517', '#DB3FA2', '#F48484'], ['キュアセバスチャン', 'Cure Sebastian'])
-
-        # ハピネスチャージプリキュア!
-        self.cure_lovely = self.generate_cure_cmap(['#B51573', '#FB8DDE', '#FFE7FD', '#334463'], ['キュアラブリー', 'Cure Lovely'])
-        self.cure_princess = self.generate_cure_cmap(['#3C558E', '#BEDBFF', '#FAEFAB', '#334463'], ['キュアプリンセス', 'Cure Princess'])
-        self.cure_honey = self.generate_cure_cmap(['#F3A11E', '#FFD144', '#FFF0CC', '#334463'], ['キュアハニー', 'Cure Honey'])
-        self.cure_fortune = self.generate_cure_cmap(['#756BD8', '#A79AF8', '#EAD3FF', '#334463'], ['キュアフォーチュン', 'Cure Fortune'])
-        self.cure_tender = self.generate_cure_cmap(['#67729C', '#7A87B4', '#BFBDFE', '#354463'], ['キュアテンダー', 'Cure Tender']) # https://www.asahi.co.jp/precure/happiness/story/backnum_39.html
-        self.cure_mirage = self.generate_cure_cmap(['#E34F4B', '#F06C7A', '#F1C3C6', '#354463'], ['キュアミラージュ', 'Cure Mirage']) # https://blogs.yahoo.co.jp/pkrgn012/folder/519751.html?m=lc&p=1
-
-        # Go!プリンセスプリキュア
-        self.cure_flora = self.generate_cure_cmap(['#DC3482', '#FE8ADA', '#FFF5FD', '#F8F5A2'], ['キュアフローラ', 'Cure Flora'])
-        self.cure_marmaid = self.generate_cure_cmap(['#3C57D8', '#8EE9D8', '#F1FBF2', '#FCC3DD'], ['キュアマーメイド', 'Cure Mermaid'])
-        self.cure_twinkle = self.generate_cure_cmap(['#F15312', '#FF9A18', '#FDFF94', '#FCE92D', '#BA70F8'], ['キュアトゥインクル', 'Cure Twinkle'])
-        self.cure_scarlet = self.generate_cure_cmap(['#E73F94', '#FEC8FC', '#F6D437', '#E01646'], ['キュアスカーレット', 'Cure Scarlet'])        
-
-        # 魔法つかいプリキュア!
-        self.cure_miracle = self.generate_cure_cmap(['#E53972', '#F05EB1', '#FED6F5', '#FFE36F', '#F08A6A'], ['キュアミラクル', 'Cure Miracle']) # ダイヤスタイルで統一
-        self.cure_magical = self.generate_cure_cmap(['#575E60', '#6A509D', '#8F79B5', '#AC7BB3', '#DE1A3F'], ['キュアマジカル', 'Cure Magical']) # ダイヤスタイルで統一
-        self.cure_felice = self.generate_cure_cmap(['#FF649F', '#FFC8E7', '#FBFBF8', '#FFF75F', '#FBFBF8', '#D6FBEC', '#54E0A3'], ['キュアフェリーチェ', 'Cure Felice'])
-        self.cure_mofurun = self.generate_cure_cmap(['#E37EAF', '#F8BA66', '#F29118', '#fff259', '#AD7BB3'], ['キュアモフルン', 'Cure Mofurun'])
-
-        # キラキラ☆プリキュアアラモード
-        self.cure_whip = self.generate_cure_cmap(['#A40945', '#FF488D', '#FEBDCA', '#F7EEB5'], ['キュアホイップ', 'Cure Whip'])
-        self.cure_custard = self.generate_cure_cmap(['#BB3E26', '#FFF324', '#F9F9CF', '#FD663E'], ['キュアカスタード', 'Cure Custard'])
-        self.cure_gelato = self.generate_cure_cmap(['#5959C9', '#3F6BEC', '#6CCDFF', '#FDFCDB'], ['キュアジェラート', 'Cure Gelato'])
-        self.cure_macalon = self.generate_cure_cmap(['#F528AF', '#8B51D9', '#FBD2ED', '#D166D1'], ['キュアマカロン', 'Cure Macaron'])
-        self.cure_chocolat = self.generate_cure_cmap(['#623114', '#986147', '#D80014', '#FFE9C2'], ['キュアショコラ', 'Cure Chocolat'])
-        self.cure_parfait = self.generate_cure_cmap(['#FFC4EA', '#D21953', '#FF4766', '#FFA523', '#F5F78A', '#55F897', '#4FDBE8'], ['キュアパルフェ', 'Cure Parfait'], method=self.generate_cmap_q)
-        self.cure_pekorin = self.generate_cure_cmap(['#DA064C', '#FF8AB4', '#F5CD5F', '#F3EBC1'], ['キュアペコリン', 'Cure Pekorin'])
-
-        # HUGっと！プリキュア
-        self.cure_yell = self.generate_cure_cmap(['#B30D39', '#F457A4', '#FEE0FE', '#A4EFCF', '#FEF395'], ['キュアエール', 'Cure Yell'])
-        self.cure_ange = self.generate_cure_cmap(['#07A4FD', '#0EC9FE', '#A2EEFE', '#B9C9FB', '#FFF29C'], ['キュアアンジュ', 'Cure Ange'])
-        self.cure_etoile = self.generate_cure_cmap(['#EFAB17', '#F7D95D', '#FFFB86', '#FFAD0C', '#6796EB'], ['キュアエトワール', 'Cure Etoile'])
-        self.cure_macherie = self.generate_cure_cmap(['#DA003B', '#FF4D6F', '#FF8AAE', '#FF6FBB', '#F56AD5', '#FAFAA0'], ['キュアマシェリ', 'Cure Macherie'])
-        self.cure_amour = self.generate_cure_cmap(['#B9C0FF', '#BC80E6', '#E35EEA', '#9044B0', '#FF5DC0'], ['キュアアムール', 'Cure Amour'])
-        self.cure_anfini = self.generate_cure_cmap(['#C5E8E1', '#F4F5F9', '#FCEDB3', '#CDD7FE', '#A3A8E7'], ['キュアアンフィニ', 'Cure Anfini'])
-        self.cure_tomorrow = self.generate_cure_cmap(['#FE1D79', '#FF98C2', '#FFD4ED', '#7CBFF3', '#FFF28F'], ['キュアトゥモロー', 'Cure Tomorrow']) # http://neoapo.com/characters/33689
-
-        # スター☆トゥインクルプリキュア
-        self.cure_star = self.generate_cure_cmap(['#E94471', '#F04878', '#FEE0F1', '#FFF6C0', '#FFE354'], ['キュアスター', 'Cure Star'])
-        self.cure_milky = self.generate_cure_cmap(['#1E5DF6', '#16C1D0', '#BDF7FF', '#FEFFC0', '#FBE950'], ['キュアミルキー', 'Cure Milky'])
-        self.cure_soleil = self.generate_cure_cmap(['#C659AC', '#DB70A6', '#E26B14', '#FFBE2C', '#FFDE3A', '#FFF599'], ['キュアソレイユ', 'Cure Soleil'])
-        self.cure_selene = self.generate_cure_cmap(['#8969DA', '#AA96FF', '#CDA5FD', '#E8FDFF', '#FEFA70'], ['キュアセレーネ', 'Cure Selene'])
-        self.cure_cosmo = self.generate_cure_cmap(['#4F78FF', '#8AF0FC', '#B3FF7A', '#FFE63A', '#FF9D27', '#FF72D6', '#CD55ED', '#474969'], ['キュアコスモ', 'Cure Cosmo'], method=self.generate_cmap_q)
-
-
-        # 作品タイトルと登場プリキュアのマップ
-        self.title_to_characters = OrderedDict()
-
-        # ふたりはプリキュア
-        self.title_to_characters['Futari wa Pretty Cure'] = [
-            'Cure Black',
-            'Cure White'
-        ]
-
-        # ふたりはプリキュア Max Heart
-        self.title_to_characters['Futari wa Pretty Cure Max Heart'] = [
-            'Cure Black',
-            'Cure White',
-            'Shiny Luminous'
-        ]
-
-        # ふたりはプリキュア Splash Star
-        self.title_to_characters['Futari wa Pretty Cure Splash Star'] = [
-            'Cure Bloom',
-            'Cure Bright',
-            'Cure Egret',
-            'Cure Windy',
-            'Kaoru Kiryuu', # TODO: 日本語対応 霧生薫
-            'Michiru Kiryuu',  # TODO: 日本語対応 霧生満
-        ]
-
-        # Yes!プリキュア5
-        self.title_to_characters['Yes! PreCure 5'] = [
-            'Cure Dream',
-            'Cure Rouge',
-            'Cure Lemonade',
-            'Cure Mint',
-            'Cure Aqua',
-            'Dark Dream',
-            'Dark Rouge',
-            'Dark Lemonade',
-            'Dark Mint',
-            'Dark Aqua'
-        ]
-
-        # Yes!プリキュア5GoGo!
-        self.title_to_characters['Yes! PreCure 5 GoGo!'] = [
-            'Cure Dream',
-            'Cure Rouge',
-            'Cure Lemonade',
-            'Cure Mint',
-            'Cure Aqua',
-            'Milky Rose'
-        ]
-
-        # フレッシュプリキュア!
-        self.title_to_characters['Fresh Pretty Cure!'] = [
-            'Cure Peach',
-            'Cure Berry',
-            'Cure Pine',
-            'Cure Passion'
-        ]
-
-        # ハートキャッチプリキュア！
-        self.title_to_characters['HeartCatch PreCure!'] = [
-            'Cure Blossom',
-            'Cure Marine',
-            'Cure Sunshine',
-            'Cure Moonlight',
-            'Cure Flower',
-            'Dark Precure'
-        ]
-
-        # スイートプリキュア♪
-        self.title_to_characters['Suite PreCure'] = [
-            'Cure Melody',
-            'Cure Rhythm',
-            'Cure Beat',
-            'Cure Muse'
-        ]
-
-        # スマイルプリキュア!
-        self.title_to_characters['Smile PreCure!'] = [
-            'Cure Happy',
-            'Cure Sunny',
-            'Cure Peace',
-            'Cure March',
-            'Cure Beauty',
-        ]
-
-        # ドキドキ!プリキュア
-        self.title_to_characters['DokiDoki! PreCure'] = [
-            'Cure Heart',
-            'Cure Diamond',
-            'Cure Rosetta',
-            'Cure Sword',
-            'Cure Ace',
-            'Cure Sebastian',
-        ]
-
-        # ハピネスチャージプリキュア!
-        self.title_to_characters['HappinessCharge PreCure!'] = [
-            'Cure Lovely',
-            'Cure Princess',
-            'Cure Honey',
-            'Cure Fortune',
-            'Cure Tender',
-            'Cure Mirage'
-        ]
-
-        # Go!プリンセスプリキュア
-        self.title_to_characters['Go! Princess PreCure'] = [
-            'Cure Flora',
-            'Cure Mermaid',
-            'Cure Twinkle',
-            'Cure Scarlet'
-        ]
-
-        # 魔法つかいプリキュア!
-        self.title_to_characters['Witchy PreCure!'] = [
-            'Cure Miracle',
-            'Cure Magical',
-            'Cure Felice',
-            'Cure Mofurun'
-        ]
-
-        # キラキラ☆プリキュアアラモード
-        self.title_to_characters['Kirakira PreCure a la Mode'] = [
-            'Cure Whip',
-            'Cure Custard',
-            'Cure Gelato',
-            'Cure Macaron',
-            'Cure Chocolat',
-            'Cure Parfait',
-            'Cure Pekorin'
-        ]
-
-        # HUGっと！プリキュア
-        self.title_to_characters['Hugtto! PreCure'] = [
-            'Cure Yell',
-            'Cure Ange',
-            'Cure Etoile',
-            'Cure Macherie',
-            'Cure Amour',
-            'Cure Anfini',
-            'Cure Tomorrow'
-        ]
-
-        # スター☆トゥインクルプリキュア
-        self.title_to_characters['Star Twinkle PreCure'] = [
-            'Cure Star',
-            'Cure Milky',
-            'Cure Soleil',
-            'Cure Selene',
-            'Cure Cosmo',
-        ]
-
-    def get_by_name(self, name):
+        '''
+        instance = cls._default
+        if instance is None:
+            with _registry_lock:
+                if cls._default is None:
+                    cls._default = cls()
+                instance = cls._default
+        return instance
+
+    @property
+    def title_to_characters(self):
+        return get_registry().title_to_characters
+
+    def __getattr__(self, attr):
+        # self.cure_black などの属性は、呼ばれたときにカラーマップを生成する
+        table = self.__dict__.get('name_to_cmap')
+        palette = get_registry().attributes.get(attr)
+        if table is None or palette is None:
+            raise AttributeError("'cure_colormap' object has no attribute '{}'".format(attr))
+        return table.build(palette)
+
+    def _build_cmap(self, palette):
+        return self.generate_cmaps_batch([palette])[0]
+
+    def get_by_name(self, name, n=None, reversed=False, kind=None):
         '''
         プリキュアの名前を受取り、対応するカラーマップを返す
+
+        名前は大文字・小文字、空白、全角・半角、ひらがな・カタカナ・ローマ字の
+        違いを無視して探す ('cure twinkle', 'CureTwinkle', 'きゅあとぅいんくる' など)
+
+        n, reversed, kind を指定すると、段階数・向き・種類を変えたカラーマップを返す。
+        変えたカラーマップは組み合わせごとに一度だけ作り、
+        最近使った VARIANT_CACHE_SIZE 個 (compact なら COMPACT_VARIANT_CACHE_SIZE 個) まで取っておく
         
         Parameters
         ---------
         name : str 
             プリキュアの名称
+
+        n : int
+            段階数。'linear' なら LUT の段階数 (Colormap.resampled)、
+            'qualitative' と 'banded' なら色の数
+
+        reversed : bool
+            True なら色の並びを逆にする
+
+        kind : str
+            カラーマップの種類。省略した場合は配色の種類
+            'linear'      : グラデーション
+            'qualitative' : 配色の色をそのまま並べたもの。n 色に足りなければ繰り返す
+            'banded'      : グラデーションから等間隔に n 色取り出した帯 (コロプレス図の階級など)
         
         Returns
         ------
         matplotlib.colors.Colormap instance
             一致するプリキュアがいなければNone
+
+        Raises
+        ------
+        ValueError
+            kind が上のどれでもない場合、n が1以上の整数でない場合
         
         '''
-        return self.name_to_cmap.get(name)
+        if n is not None or reversed or kind is not None:
+            if kind is not None and kind not in _VARIANT_KINDS:
+                raise ValueError('unknown colormap kind {!r}'.format(kind))
+            if n is not None and (isinstance(n, bool) or not isinstance(n, (int, np.integer)) or n < 1):
+                raise ValueError('n must be a positive integer, got {!r}'.format(n))
+            palette = self.name_to_cmap.find(name)
+            if palette is None:
+                return None
+            return self.name_to_cmap.variant(palette, n, kind, bool(reversed))
+
+        stats = precure_stats.active
+        if stats is None:
+            palette = self.name_to_cmap.find(name)
+            if palette is None:
+                return None
+            return self.name_to_cmap.build(palette)
+
+        start = precure_stats.clock()
+        palette = self.name_to_cmap.find(name)
+        cmap = None if palette is None else self.name_to_cmap.build(palette)
+        stats.record('get_by_name', precure_stats.clock() - start)
+        stats.count('get_by_name.miss' if palette is None else 'get_by_name.hit')
+        return cmap
+
+    def search(self, query, k=5):
+        '''
+        プリキュアの名前をあいまい検索する
+
+        Parameters
+        ---------
+        query : str
+            検索する文字列
+
+        k : int
+            返す候補の数
+
+        Returns
+        ------
+        list of (str, float)
+            プリキュアの名称 (英語名) と類似度 (0-1) の組を、類似度の高い順に並べたもの
+
+        '''
+        import precure_names
+        return precure_names.get_name_index(get_registry()).search(query, k)
     
 
-    def generate_cmap(self, colors):
+    def characters_of(self, title):
+        '''
+        作品に登場するプリキュアを返す
+
+        Parameters
+        ---------
+        title : str
+            作品タイトル (英語・日本語)
+
+        Returns
+        ------
+        tuple of str
+            プリキュアの名称 (英語名)。知らない作品ならNone
+
+        '''
+        registry = get_registry()
+        title = registry.title_aliases.get(title)
+        if title is None:
+            return None
+        return registry.title_to_characters[title]
+
+    def title_of(self, name):
+        '''
+        プリキュアが初めて登場した作品を返す
+
+        Parameters
+        ---------
+        name : str
+            プリキュアの名称
+
+        Returns
+        ------
+        str
+            作品タイトル (英語)。知らないプリキュアか、どの作品にも属さなければNone
+
+        '''
+        palette = self.name_to_cmap.find(name)
+        if palette is None:
+            return None
+        titles = get_registry().name_to_titles.get(palette.name)
+        if titles:
+            return titles[0]
+        return palette.title
+
+    def titles_of(self, name):
+        '''
+        プリキュアが登場する作品をすべて返す
+
+        Parameters
+        ---------
+        name : str
+            プリキュアの名称
+
+        Returns
+        ------
+        tuple of str
+            作品タイトル (英語)。知らないプリキュアならNone
+
+        '''
+        palette = self.name_to_cmap.find(name)
+        if palette is None:
+            return None
+        return get_registry().name_to_titles.get(palette.name, ())
+
+    def cmaps_for_titles(self, titles=None):
+        '''
+        作品ごとに、登場プリキュアのカラーマップをまとめて返す
+
+        まだ生成していないカラーマップは generate_cmaps_batch で一度に生成する
+
+        Parameters
+        ---------
+        titles : Array of str
+            作品タイトル (英語・日本語) を格納した配列。省略した場合は全作品
+
+        Returns
+        ------
+        OrderedDict object
+            作品タイトル (英語) -> OrderedDict (プリキュアの名称 -> Colormap)
+
+        Raises
+        ------
+        KeyError
+            知らない作品が含まれている場合
+
+        '''
+        registry = get_registry()
+        if titles is None:
+            titles = list(registry.title_to_characters)
+
+        resolved = []
+        for title in titles:
+            if title not in registry.title_aliases:
+                raise KeyError(title)
+            resolved.append(registry.title_aliases[title])
+
+        table = self.name_to_cmap
+        palettes = [table.find(name) for title in resolved for name in registry.title_to_characters[title]]
+        pending = list(OrderedDict.fromkeys(p for p in palettes if p is not None and table.cached(p) is None))
+        # compact なら table は弱参照しか持たないので、結果を作り終えるまでここで持っておく
+        built = [table.insert(palette, cmap)
+                 for palette, cmap in zip(pending, self.generate_cmaps_batch(pending)) if cmap is not None]
+
+        result = OrderedDict()
+        for title in resolved:
+            result[title] = OrderedDict((name, self.get_by_name(name)) for name in registry.title_to_characters[title])
+        del built
+        return result
+
+    def nearest(self, color_or_palette, k=5):
+        '''
+        色か配色に、知覚的に最も近いプリキュアの配色を探す
+
+        色を指定した場合は、その色に最も近い色を含む配色を、
+        配色を指定した場合は、グラデーション全体の色差の平均が小さい配色を返す。
+        色差は CIELAB での距離 (ΔE)
+
+        Parameters
+        ---------
+        color_or_palette : color or array of color
+            色 (16進数・色名・RGB の tuple) か、色の配列
+
+        k : int
+            返す候補の数
+
+        Returns
+        ------
+        list of (str, float)
+            プリキュアの名称 (英語名) と色差を、近い順に並べたもの
+
+        '''
+        import precure_analysis
+        return precure_analysis.get_color_index(get_registry()).nearest(color_or_palette, k)
+
+    def perceptual_profile(self, name):
+        '''
+        カラーマップの明度 L* と、隣り合う点の色差 ΔE の変化を返す
+
+        登録されている全カラーマップの分をまとめて計算し、レジストリが変わるまで使い回す
+
+        Parameters
+        ---------
+        name : str
+            プリキュアの名称
+
+        Returns
+        ------
+        (numpy.ndarray, numpy.ndarray)
+            明度 (256 点) と色差 (255 点)。知らないプリキュアならNone
+
+        '''
+        import precure_analysis
+        palette = self.name_to_cmap.find(name)
+        registry = get_registry()
+        if palette is None or registry.palettes.get(palette.name) is not palette:
+            return None
+        return precure_analysis.get_uniformity(registry).profile(palette.name)
+
+    def colorblind_report(self, name):
+        '''
+        配色を、色覚の多様性 (1型・2型・3型) と背景とのコントラストで検査した結果を返す
+
+        登録されている全配色の分をまとめて検査し、レジストリが変わるまで使い回す
+        (precure_analysis.cure_cvd_report を参照)
+
+        Parameters
+        ---------
+        name : str
+            プリキュアの名称
+
+        Returns
+        ------
+        dict
+            {'min_delta_e': {見え方: 色差}, 'contrast': {背景: コントラスト比}, 'safe': bool}。
+            知らないプリキュアならNone
+
+        '''
+        import precure_analysis
+        palette = self.name_to_cmap.find(name)
+        registry = get_registry()
+        if palette is None or registry.palettes.get(palette.name) is not palette:
+            return None
+        return precure_analysis.get_cvd_report(registry).report(palette.name)
+
+    def get_lut(self, name, n=None):
+        '''
+        プリキュアの名前を受取り、対応するカラーマップの LUT を返す
+
+        Parameters
+        ---------
+        name : str
+            プリキュアの名称
+
+        n : int
+            LUT の段階数。省略した場合はカラーマップの段階数
+
+        Returns
+        ------
+        numpy.ndarray of uint8, shape (n, 4)
+            書き込み不可。一致するプリキュアがいなければNone
+
+        '''
+        palette = self.name_to_cmap.find(name)
+        if palette is None:
+            return None
+        return self.name_to_cmap.lut(palette, n)
+
+    def colors_for_categories(self, values, name, bytes=False, return_categories=False):
+        '''
+        ラベルの配列に、カテゴリごとにプリキュアの色を割り当てる
+
+        ラベルは一度だけ factorize し、generate_cmap_q と同じ色の配列を
+        カテゴリの番号で引く (行ごとに Python で色を探さない)。
+        カテゴリが色より多ければ、色を最初から繰り返す。欠損値は透明 (0, 0, 0, 0)。
+        結果はそのまま scatter(c=...) に渡せる
+
+        Parameters
+        ---------
+        values : array_like or pandas.Series
+            ラベルの配列 (factorize を参照)
+
+        name : str
+            プリキュアの名称。'linear' の配色でも、色をそのまま使う
+
+        bytes : bool
+            True なら uint8 (0-255)、False なら float64 (0-1) で返す
+
+        return_categories : bool
+            True ならカテゴリの一覧も返す (凡例を作るときに使う)
+
+        Returns
+        ------
+        numpy.ndarray, shape (len(values), 4)
+            各ラベルの RGBA。return_categories が True なら (RGBA, カテゴリの一覧)。
+            カテゴリの一覧の i 番目の色は、色の配列の i % 色の数 番目
+
+        Raises
+        ------
+        KeyError
+            一致するプリキュアがいない場合
+
+        Examples
+        --------
+        >>> rgba = cure_colors.colors_for_categories(df['species'], 'キュアコスモ')
+        >>> ax.scatter(df['x'], df['y'], c=rgba)
+
+        '''
+        palette = self.name_to_cmap.find(name)
+        if palette is None or len(palette.rgb) == 0:
+            raise KeyError(name)
+
+        with precure_stats.timer('colors_for_categories'):
+            codes, categories = factorize(values)
+            colors = self.name_to_cmap.category_colors(palette)
+            # カテゴリごとの色と、最後に欠損値の透明な色を並べた表を作り、
+            # -1 は mode='wrap' で最後の行を引く
+            table = np.zeros((len(categories) + 1, 4))
+            table[:-1] = colors.take(np.arange(len(categories)), axis=0, mode='wrap')
+            if bytes:
+                table = np.round(table * 255).astype(np.uint8)
+            rgba = table.take(codes, axis=0, mode='wrap')
+
+        if return_categories:
+            return rgba, categories
+        return rgba
+
+    def memory_report(self):
+        '''
+        配色とカラーマップが使っているメモリを、部分ごとに返す
+
+        Returns
+        ------
+        dict
+            部分 -> バイト数
+
+            'palettes'      : レジストリの配色の RGB 値 (全インスタンスで共有。memory-map した分も含む)
+            'palette_store' : cure_palette_store (全インスタンスで共有。作っていなければ 0)
+            'colormaps'     : このインスタンスが持っている Colormap の定義 (segmentdata や色)
+            'colormap_luts' : その Colormap に matplotlib が作った float64 の LUT
+            'luts'          : このインスタンスが持っている uint8 の LUT
+            'variants'      : 段階数・向き・種類を変えた Colormap
+            'total'         : 合計
+
+        '''
+        registry = get_registry()
+        store = _palette_store.peek(registry)
+        report = {
+            'palettes': sum(palette.rgb.nbytes for palette in registry.entries),
+            'palette_store': store.nbytes if store is not None else 0,
+        }
+        report.update(self.name_to_cmap.memory_report())
+        report['total'] = sum(report.values())
+        return report
+
+    def colorize(self, name, data, vmin=None, vmax=None, out=None, n=None):
+        '''
+        プリキュアのカラーマップで配列に色を付ける (apply_lut を参照)
+
+        Parameters
+        ---------
+        name : str
+            プリキュアの名称
+
+        data : array_like
+            色を付ける配列
+
+        vmin, vmax : float
+            カラーマップの両端に対応する値。省略した場合は data の最小値・最大値
+
+        out : numpy.ndarray of uint8, shape data.shape + (4,)
+            結果を書き込む配列
+
+        n : int
+            LUT の段階数
+
+        Returns
+        ------
+        numpy.ndarray of uint8, shape data.shape + (4,)
+
+        '''
+        lut = self.get_lut(name, n)
+        if lut is None:
+            raise KeyError(name)
+        return apply_lut(lut, data, vmin, vmax, out)
+
+    def get_swatch(self, name, width=256, height=1):
+        '''
+        プリキュアのカラーマップのグラデーションを、uint8 の RGBA 画像で返す。
+        キャッシュ (set_swatch_cache) が設定されていれば、そこから読む
+
+        Parameters
+        ---------
+        name : str
+            プリキュアの名称
+
+        width : int
+            グラデーションの横方向の段階数
+
+        height : int
+            画像の高さ
+
+        Returns
+        ------
+        numpy.ndarray of uint8, shape (height, width, 4)
+            一致するプリキュアがいなければNone
+
+        '''
+        palette = self.name_to_cmap.find(name)
+        if palette is None:
+            return None
+
+        cache = get_swatch_cache()
+        if cache is None:
+            return np.repeat(self.name_to_cmap.lut(palette, width)[np.newaxis], height, axis=0)
+
+        key = cache.key(palette, width, height)
+        swatch = cache.get(key)
+        if swatch is None:
+            precure_stats.count('swatch_cache.miss')
+            swatch = np.repeat(self.name_to_cmap.lut(palette, width)[np.newaxis], height, axis=0)
+            cache.put(key, swatch)
+        else:
+            precure_stats.count('swatch_cache.hit')
+        return swatch
+
+    def save_swatch(self, name, path, width=256, height=32):
+        '''
+        プリキュアのカラーマップのグラデーションを PNG に保存する。
+        キャッシュにファイルが残っていれば、それをコピーする
+
+        Parameters
+        ---------
+        name : str
+            プリキュアの名称
+
+        path : str
+            保存先のパス
+
+        width : int
+            グラデーションの横方向の段階数
+
+        height : int
+            画像の高さ
+
+        '''
+        swatch = self.get_swatch(name, width, height)
+        if swatch is None:
+            raise KeyError(name)
+
+        cache = get_swatch_cache()
+        palette = self.name_to_cmap.find(name)
+        if cache is not None and palette is not None:
+            # キャッシュのファイルは上限を超えると消えるので、なければ画像から書き出す
+            try:
+                shutil.copyfile(cache.path(cache.key(palette, width, height)), path)
+                return
+            except FileNotFoundError:
+                pass
+
+        from PIL import Image
+        Image.fromarray(swatch, 'RGBA').save(path, format='PNG')
+
+    def generate_cmap(self, colors, uniform=False):
         '''
         指定した色で作成したカラーマップを返す
 
@@ -365,26 +2183,29 @@ class cure_colormap :
         colors : array of color hexcode
             色の配列。色は16進数数か色名で指定。
 
+        uniform : bool
+            True の場合、色を等間隔ではなく、CIELAB での色差が均一になる位置に置く
+
         Returns
         ------
         matplotlib.colors.Colormap instance
             作れなかった場合はNone
         '''
 
-        values = range(len(colors))
-        if len(values) == 0:
+        # グラデーションなので2色以上必要
+        if len(colors) < 2:
             return None
 
-        vmax = np.ceil(np.max(values))
-        if vmax == 0.0:
-            return None
-        
-        color_list = []
-        for v, c in zip(values, colors):
-            color_list.append((v/vmax, c))
-        return LinearSegmentedColormap.from_list('custom_cmap', color_list)
+        with precure_stats.timer('generate_cmap'):
+            rgba = _decode_colors(colors)
+            if not uniform:
+                return _linear_cmap(rgba)
+
+            import precure_analysis
+            vals = precure_analysis.stop_positions(rgba[:, :3], np.array([0, len(rgba)]))
+            return _linear_cmap(rgba, vals=vals)
     
-    def generate_cmap_q(self, colors) :
+    def generate_cmap_q(self, colors, n=None) :
         '''
         指定した色で、Qualitative(質的)なカラーマップを生成して返す
         
@@ -393,12 +2214,81 @@ class cure_colormap :
         colors : array of color hexcode
         色の配列。色は16進数数か色名で指定。
 
+        n : int
+            カテゴリの数。色が足りない場合は先頭から繰り返す。
+            省略した場合は色の数
+
         Returns
         ------
         matplotlib.colors.ListedColormap instance
+            色がなければNone
         
         '''
-        return ListedColormap(sns.color_palette(colors).as_hex())
+        if len(colors) < 1:
+            return None
+
+        with precure_stats.timer('generate_cmap_q'):
+            return _listed_cmap(_decode_colors(colors), n)
+
+    def generate_cmaps_batch(self, palettes, kind='linear'):
+        '''
+        複数の配色から、カラーマップをまとめて生成する
+
+        全配色の色を NumPy でまとめて RGBA に変換し、
+        各カラーマップはその配列のビューから作る
+
+        Parameters
+        ---------
+        palettes : array of (array of color or cure_palette)
+            配色の配列。色の配列か cure_palette を指定する。
+            cure_palette の場合は、その kind に従って生成する
+
+        kind : str
+            色の配列で指定した配色のカラーマップの種類。
+            'linear' (generate_cmap) か 'qualitative' (generate_cmap_q)
+
+        Returns
+        ------
+        list of matplotlib.colors.Colormap instance
+            palettes と同じ順に並べたカラーマップ。
+            作れなかった配色は None
+
+        '''
+        if kind not in _PALETTE_KINDS:
+            raise ValueError('unknown palette kind {!r}'.format(kind))
+
+        palettes = list(palettes)
+        kinds = []
+        counts = []
+        hex_colors = []
+        rgb_parts = []
+        for palette in palettes:
+            if isinstance(palette, cure_palette):
+                kinds.append(palette.kind)
+                counts.append(len(palette.rgb))
+                rgb_parts.append(palette.rgb)
+            else:
+                kinds.append(kind)
+                counts.append(len(palette))
+                hex_colors.extend(palette)
+
+        # 色の配列は16進数をまとめて変換し、cure_palette は RGB をそのまま使う
+        rgba = np.ones((sum(counts), 4))
+        is_palette = np.repeat([isinstance(palette, cure_palette) for palette in palettes], counts).astype(bool)
+        rgba[~is_palette] = _decode_colors(hex_colors)
+        if len(rgb_parts) > 0:
+            rgba[is_palette, :3] = np.concatenate(rgb_parts) / 255
+
+        cmaps = []
+        pos = 0
+        for palette_kind, count in zip(kinds, counts):
+            view = rgba[pos:pos + count]
+            pos += count
+            if palette_kind == 'qualitative':
+                cmaps.append(_listed_cmap(view) if count > 0 else None)
+            else:
+                cmaps.append(_linear_cmap(view) if count > 1 else None)
+        return cmaps
 
     def generate_cure_cmap(self, colors, names, method=None):
         '''
@@ -433,12 +2323,14 @@ class cure_colormap :
         if len(colors) < 1:
             return None
         
-        cmap = method(colors)
-        if cmap is None:
-            return None
+        with precure_stats.timer('generate_cure_cmap'):
+            cmap = method(colors)
+            if cmap is None:
+                return None
 
-        for name in names:
-            self.name_to_cmap[name] = cmap
+            kind = 'qualitative' if method == self.generate_cmap_q else 'linear'
+            name = names[-1] if len(names) > 0 else None
+            self.name_to_cmap.register(cure_palette(name, names, colors, kind=kind), cmap=cmap)
         
         return cmap
 
@@ -455,26 +2347,111 @@ class cure_colormap :
             一覧に表示するカラーマップを格納した配列
 
         '''
-        # 表示するデータとして (1, 256) の配列を作成する。
-        gradient = np.linspace(0, 1, 256).reshape(1, -1)
+        import matplotlib.pyplot as plt
 
         cure_colors = self
         num_cmap_list = len(cmap_list)
-        fig, axes = plt.subplots(num_cmap_list, 1, figsize=(9, num_cmap_list * 0.35))
-        fig.subplots_adjust(wspace=0.4)
-        axes[0].set_title(cmap_category + ' colormaps', fontsize=14, x=0.5)
-        
-        def plot_color_map(ax, gradient, name):
-            cmap = cure_colors.get_by_name(name) 
-            if cmap is None:
-                return
+        with precure_stats.timer('plot_color_maps'):
+            with precure_stats.timer('plot_color_maps.subplots'):
+                fig, axes = plt.subplots(num_cmap_list, 1, figsize=(9, num_cmap_list * 0.35))
+                fig.subplots_adjust(wspace=0.4)
+                axes[0].set_title(cmap_category + ' colormaps', fontsize=14, x=0.5)
             
-            ax.imshow(gradient, aspect='auto', cmap=cmap)
-            ax.set_axis_off()
-            ax.text(-10, 0, name, va='center', ha='right', fontsize=10)
-        
-        for ax, name in zip(axes, cmap_list):
-            plot_color_map(ax, gradient, name)
+            def plot_color_map(ax, name):
+                # グラデーションは (1, 256) の画像。キャッシュがあればそこから読む
+                with precure_stats.timer('plot_color_maps.swatch'):
+                    swatch = cure_colors.get_swatch(name)
+                if swatch is None:
+                    return
+                
+                with precure_stats.timer('plot_color_maps.imshow'):
+                    ax.imshow(swatch, aspect='auto')
+                    ax.set_axis_off()
+                    ax.text(-10, 0, name, va='center', ha='right', fontsize=10)
+            
+            for ax, name in zip(axes, cmap_list):
+                plot_color_map(ax, name)
+
+    def plot_palette_sheet(self, titles=None, path=None, width=256, dpi=100):
+        '''
+        指定した作品のカラーマップを1枚の図に一覧表示する
+
+        全カラーマップのグラデーションを NumPy で1枚の RGBA 画像にまとめ、
+        imshow 1回で描く。名前は y 軸の目盛りとしてまとめて付ける
+
+        Parameters
+        ----------
+        titles : Array of str
+            表示したい作品名を格納した配列。省略した場合は全作品
+
+        path : str
+            指定した場合は pyplot を使わずに Agg で描画して、
+            PNG などの画像ファイルに保存する
+
+        width : int
+            グラデーションの横方向の段階数
+
+        dpi : int
+            保存する画像の解像度
+
+        Returns
+        ------
+        matplotlib.figure.Figure instance
+
+        '''
+        if titles is None:
+            titles = list(self.title_to_characters)
+
+        # 作品名の行 (空白) とプリキュアの行を上から順に並べる
+        blank = np.zeros((width, 4), dtype=np.uint8)
+        rows = []
+        labels = []
+        is_title = []
+        title_aliases = get_registry().title_aliases
+        with precure_stats.timer('plot_palette_sheet.swatches'):
+            for title in titles:
+                cmap_list = self.characters_of(title)
+                if cmap_list is None:
+                    continue
+
+                rows.append(blank)
+                labels.append(title_aliases.get(title, title))
+                is_title.append(True)
+                for name in cmap_list:
+                    swatch = self.get_swatch(name, width)
+                    if swatch is None:
+                        continue
+                    rows.append(swatch[0])
+                    labels.append(name)
+                    is_title.append(False)
+
+        with precure_stats.timer('plot_palette_sheet.figure'):
+            figsize = (9, max(1, len(rows)) * 0.25)
+            if path is None:
+                import matplotlib.pyplot as plt
+                fig = plt.figure(figsize=figsize)
+            else:
+                from matplotlib.backends.backend_agg import FigureCanvasAgg
+                from matplotlib.figure import Figure
+                fig = Figure(figsize=figsize)
+                FigureCanvasAgg(fig)
+
+            ax = fig.add_axes([0.3, 0.0, 0.68, 1.0])
+            if len(rows) > 0:
+                ax.imshow(np.stack(rows), aspect='auto', interpolation='nearest')
+            ax.set_xticks([])
+            ax.set_yticks(range(len(labels)), labels, fontsize=10)
+            ax.tick_params(axis='y', length=0)
+            for label, title in zip(ax.get_yticklabels(), is_title):
+                if title:
+                    label.set_fontweight('bold')
+            for spine in ax.spines.values():
+                spine.set_visible(False)
+
+        if path is not None:
+            with precure_stats.timer('plot_palette_sheet.savefig'):
+                fig.savefig(path, dpi=dpi)
+        return fig
 
     def sample_colormap_by_title(self, titles):
         '''
@@ -486,97 +2463,37 @@ class cure_colormap :
             表示したい作品名を格納した配列
 
         '''
+        import matplotlib.pyplot as plt
+
         for title in titles:
-            cmap_list = self.title_to_characters.get(title)
+            cmap_list = self.characters_of(title)
             if cmap_list is None:
                 continue
             
             self.plot_color_maps(title, cmap_list)
-        plt.show()
+        with precure_stats.timer('plot_color_maps.show'):
+            plt.show()
 
-    def sample_colormap_all(self):
+    def sample_colormap_all(self, path=None):
         '''
         全カラーマップ表示
 
+        全作品分を1枚の図にまとめて描く (plot_palette_sheet を参照)
+
         Parameters
         ---------
-        None
+        path : str
+            指定した場合は画面に表示せず、画像ファイルに保存する
 
         Returns
         ------
         None
 
         '''
-        
-        for cmap_category, cmap_list in self.title_to_characters.items():
-            self.plot_color_maps(cmap_category, cmap_list)
-        plt.show()
-
-
-
-#########################################################
-#                                                       #
-# unittest                                              #
-#                                                       #
-#########################################################
-
-class test_cure_colormap(unittest.TestCase) :
-    def setUp(self):
-        self.cure_colors = cure_colormap()
-    
-    def tearDown(self):
-        # 終了処理
-        del self.cure_colors
-    
-    def test_generate_cure_cmap_no_color(self):
-        # 色指定がないので生成しない
-        cmap = self.cure_colors.generate_cure_cmap([], [], method=self.cure_colors.generate_cmap)
-        self.assertIsNone(cmap, msg='generate_cure_cmap([], [], method=self.cure_colors.generate_cmap)')
-
-    def test_generate_cure_cmap_no_color_q(self):
-        cmap = self.cure_colors.generate_cure_cmap([], [], method=self.cure_colors.generate_cmap_q)
-        self.assertIsNone(cmap, msg='generate_cure_cmap([], [], method=self.cure_colors.generate_cmap_q)')
-
-    def test_generate_cure_cmap_single_color(self):
-        # 1色で生成しない。グラデーションだからできない
-        cmap = self.cure_colors.generate_cure_cmap( ['black'], [], method=self.cure_colors.generate_cmap)
-        self.assertIsNone(cmap, msg="generate_cure_cmap(['black'], [], method=self.cure_colors.generate_cmap)")
-
-    def test_generate_cure_cmap_single_color_q(self):
-        # 質的なものは1色で生成できる
-        cmap = self.cure_colors.generate_cure_cmap( ['black'], [], method=self.cure_colors.generate_cmap_q)
-        self.assertIsNotNone(cmap, msg="generate_cure_cmap(['black'], [], method=self.cure_colors.generate_cmap_q)")
-
-    def test_generate_cure_cmap(self):
-        # 生成する
-        cmap = self.cure_colors.generate_cure_cmap( ['black', 'white'], ['cure_tmp'], method=self.cure_colors.generate_cmap)
-        self.assertIsInstance(cmap, LinearSegmentedColormap, msg="generate_cure_cmap(['black', 'white'], [])")
-
-    def test_generate_cure_cmap_q(self):
-        cmap = self.cure_colors.generate_cure_cmap( ['black', 'white'], ['cure_tmp'], method=self.cure_colors.generate_cmap_q)
-        self.assertIsInstance(cmap, ListedColormap, msg="generate_cure_cmap(['black', 'white'], [])")
-
-    def test_get_by_name(self):
-        # 名前で呼ぶ
-        self.assertIsNotNone(self.cure_colors.get_by_name('キュアトゥインクル'), msg="cure_colors.get_by_name('キュアトゥインクル')")
-        # 存在しない場合はNone
-        self.assertIsNone(self.cure_colors.get_by_name('キュアゴリラ'), msg="cure_colors.get_by_name('キュアゴリラ')")
-
-    def test_sample_colormap_all(self):
-        self.cure_colors.sample_colormap_all()
-
-    def test_sample_colormap_by_title_empty(self):
-        # 表示なし
-        self.cure_colors.sample_colormap_by_title([])
-
-    def test_sample_colormap_by_title_invalid(self):
-        # 知らない作品はスルー
-        self.cure_colors.sample_colormap_by_title(['*** PreCure'])
-
-    def test_sample_colormap_by_title(self):
-        # 指定した作品のカラーマップを表示
-        self.cure_colors.sample_colormap_by_title(['Futari wa Pretty Cure', 'Futari wa Pretty Cure Max Heart'])
-
+        self.plot_palette_sheet(path=path)
+        if path is None:
+            import matplotlib.pyplot as plt
+            plt.show()
 
 
 
@@ -587,5 +2504,14 @@ class test_cure_colormap(unittest.TestCase) :
 #########################################################
 
 if __name__ == '__main__':
-    unittest.main(verbosity=2)
+    import sys
+
+    # python -m precure_colormap sheet / colorize / export / jobs (precure_cli を参照)
+    if len(sys.argv) > 1:
+        import precure_cli
+        sys.exit(precure_cli.main(sys.argv[1:]))
+
+    # テストは test_precure_colormap.py に分けた
+    import unittest
+    unittest.main(module='test_precure_colormap', verbosity=2)
 
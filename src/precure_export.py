@@ -0,0 +1,148 @@
+#########################################################
+#                                                       #
+# precure_export.py                                     #
+#                                                       #
+# 登録されている全配色を、Python 以外でも使える形式           #
+# (npy/npz, CSV, JSON, CSS, PNG) に書き出す                #
+#                                                       #
+#########################################################
+
+
+import csv
+import json
+import os
+import re
+
+import numpy as np
+
+import precure_colormap
+
+
+
+# 書き出せる形式
+EXPORT_FORMATS = ('npy', 'npz', 'csv', 'json', 'css', 'png')
+
+# 書き出すファイル名
+_FILENAMES = {
+    'npy': 'precure_luts.npy',
+    'npz': 'precure_luts.npz',
+    'csv': 'precure_luts.csv',
+    'json': 'precure_luts.json',
+    'css': 'precure_gradients.css',
+    'png': 'precure_atlas.png',
+}
+
+# npy と png の行の順番 (英語名を1行に1つ)
+NAMES_FILENAME = 'precure_names.txt'
+
+
+def css_class(name):
+    '''
+    プリキュアの名称 (英語名) を CSS のクラス名にする ('Cure Black' -> 'precure-cure-black')
+    '''
+    return 'precure-' + re.sub(r'[^0-9a-z]+', '-', name.lower()).strip('-')
+
+
+def _css_gradient(palette):
+    # 配色の色をそのまま使う。Qualitative は色の境目をぼかさない
+    colors = palette.colors
+    m = len(colors)
+    if palette.kind == 'qualitative':
+        stops = ['{} {:.4g}% {:.4g}%'.format(color, 100 * i / m, 100 * (i + 1) / m) for i, color in enumerate(colors)]
+    elif m == 1:
+        stops = [colors[0], colors[0]]
+    else:
+        stops = ['{} {:.4g}%'.format(color, 100 * i / (m - 1)) for i, color in enumerate(colors)]
+    return 'linear-gradient(to right, {})'.format(', '.join(stops))
+
+
+def export_catalog(directory, formats=EXPORT_FORMATS, n=256, registry=None):
+    '''
+    登録されている全配色の LUT を、指定した形式でまとめて書き出す
+
+    LUT は palettes_to_luts で全配色の分を一度に作り、どの形式にも同じものを書く。
+    行の順番はレジストリの登録順
+
+    Parameters
+    ---------
+    directory : str
+        書き出すディレクトリ。なければ作る
+
+    formats : array of str
+        書き出す形式。EXPORT_FORMATS のどれか
+        'npy'  : uint8 の配列 (配色の数, n, 4)。行の順番は precure_names.txt
+        'npz'  : 'luts' (npy と同じ配列) と 'names' (英語名)
+        'csv'  : name, index, r, g, b, a の表
+        'json' : 名称・作品・種類と LUT ([r, g, b, a] の配列)
+        'css'  : 配色ごとの linear-gradient を background-image にしたクラス
+        'png'  : 1行に1人の RGBA 画像 (幅 n)。行の順番は precure_names.txt
+
+    n : int
+        LUT の段階数
+
+    registry : cure_registry instance
+        省略した場合はプロセス全体のレジストリ
+
+    Returns
+    ------
+    dict
+        形式 -> 書き出したファイルのパス
+
+    Raises
+    ------
+    ValueError
+        知らない形式が含まれている場合
+
+    '''
+    unknown = [f for f in formats if f not in EXPORT_FORMATS]
+    if unknown:
+        raise ValueError('unknown export format: ' + ', '.join(unknown))
+    if registry is None:
+        registry = precure_colormap.get_registry()
+
+    palettes = list(registry.entries)
+    names = [palette.name for palette in palettes]
+    luts = precure_colormap.palettes_to_luts(palettes, n)
+
+    os.makedirs(directory, exist_ok=True)
+    paths = dict((f, os.path.join(directory, _FILENAMES[f])) for f in formats)
+
+    if 'npy' in paths or 'png' in paths:
+        with open(os.path.join(directory, NAMES_FILENAME), 'w', encoding='utf-8') as f:
+            f.write(''.join(name + '\n' for name in names))
+
+    if 'npy' in paths:
+        np.save(paths['npy'], luts)
+
+    if 'npz' in paths:
+        np.savez_compressed(paths['npz'], luts=luts, names=np.array(names))
+
+    if 'csv' in paths:
+        with open(paths['csv'], 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['name', 'index', 'r', 'g', 'b', 'a'])
+            index = np.arange(n)
+            for name, lut in zip(names, luts):
+                writer.writerows(zip([name] * n, index.tolist(), *lut.T.tolist()))
+
+    if 'json' in paths:
+        catalog = {
+            'n': n,
+            'palettes': [{'name': palette.name, 'aliases': list(palette.aliases), 'title': palette.title,
+                          'kind': palette.kind, 'lut': lut.tolist()}
+                         for palette, lut in zip(palettes, luts)],
+        }
+        with open(paths['json'], 'w', encoding='utf-8') as f:
+            json.dump(catalog, f, ensure_ascii=False, separators=(',', ':'))
+
+    if 'css' in paths:
+        with open(paths['css'], 'w', encoding='utf-8') as f:
+            for palette in palettes:
+                f.write('.{} {{ background-image: {}; }}\n'.format(css_class(palette.name), _css_gradient(palette)))
+
+    if 'png' in paths:
+        from PIL import Image
+        Image.fromarray(luts, 'RGBA').save(paths['png'])
+
+    return paths
+
@@ -0,0 +1,276 @@
+#########################################################
+#                                                       #
+# precure_names.py                                      #
+#                                                       #
+# プリキュアの名称の正規化と                              #
+# あいまい検索のためのインデックス                         #
+#                                                       #
+#########################################################
+
+
+import unicodedata
+from collections import defaultdict
+
+import precure_colormap
+
+
+
+#########################################################
+#                                                       #
+# 名称の正規化                                           #
+#                                                       #
+#########################################################
+
+# カタカナ -> ローマ字 (訓令式寄り。ヘボン式の綴りは _ROMAJI_VARIANTS で寄せる)
+_KANA_TO_ROMAJI = {
+    'ア': 'a', 'イ': 'i', 'ウ': 'u', 'エ': 'e', 'オ': 'o',
+    'カ': 'ka', 'キ': 'ki', 'ク': 'ku', 'ケ': 'ke', 'コ': 'ko',
+    'サ': 'sa', 'シ': 'si', 'ス': 'su', 'セ': 'se', 'ソ': 'so',
+    'タ': 'ta', 'チ': 'ti', 'ツ': 'tu', 'テ': 'te', 'ト': 'to',
+    'ナ': 'na', 'ニ': 'ni', 'ヌ': 'nu', 'ネ': 'ne', 'ノ': 'no',
+    'ハ': 'ha', 'ヒ': 'hi', 'フ': 'hu', 'ヘ': 'he', 'ホ': 'ho',
+    'マ': 'ma', 'ミ': 'mi', 'ム': 'mu', 'メ': 'me', 'モ': 'mo',
+    'ヤ': 'ya', 'ユ': 'yu', 'ヨ': 'yo',
+    'ラ': 'ra', 'リ': 'ri', 'ル': 'ru', 'レ': 're', 'ロ': 'ro',
+    'ワ': 'wa', 'ヰ': 'i', 'ヱ': 'e', 'ヲ': 'o', 'ン': 'n',
+    'ガ': 'ga', 'ギ': 'gi', 'グ': 'gu', 'ゲ': 'ge', 'ゴ': 'go',
+    'ザ': 'za', 'ジ': 'zi', 'ズ': 'zu', 'ゼ': 'ze', 'ゾ': 'zo',
+    'ダ': 'da', 'ヂ': 'zi', 'ヅ': 'zu', 'デ': 'de', 'ド': 'do',
+    'バ': 'ba', 'ビ': 'bi', 'ブ': 'bu', 'ベ': 'be', 'ボ': 'bo',
+    'パ': 'pa', 'ピ': 'pi', 'プ': 'pu', 'ペ': 'pe', 'ポ': 'po',
+    'ヴ': 'vu',
+    'ァ': 'a', 'ィ': 'i', 'ゥ': 'u', 'ェ': 'e', 'ォ': 'o',
+    'ャ': 'ya', 'ュ': 'yu', 'ョ': 'yo', 'ヮ': 'wa',
+}
+
+# 小さい文字と組み合わせた音
+_KANA_DIGRAPHS = {
+    'ティ': 'ti', 'ディ': 'di', 'トゥ': 'tu', 'ドゥ': 'du',
+    'ファ': 'fa', 'フィ': 'fi', 'フェ': 'fe', 'フォ': 'fo',
+    'ウィ': 'wi', 'ウェ': 'we', 'ウォ': 'wo',
+    'ヴァ': 'va', 'ヴィ': 'vi', 'ヴェ': 've', 'ヴォ': 'vo',
+    'シェ': 'sye', 'ジェ': 'zye', 'チェ': 'tye',
+}
+
+# ヘボン式などの綴り -> 上の表の綴り。長いものから置き換える
+_ROMAJI_VARIANTS = [
+    ('tsu', 'tu'), ('shi', 'si'), ('chi', 'ti'),
+    ('sha', 'sya'), ('shu', 'syu'), ('sho', 'syo'), ('she', 'sye'),
+    ('cha', 'tya'), ('chu', 'tyu'), ('cho', 'tyo'), ('che', 'tye'),
+    ('ja', 'zya'), ('ju', 'zyu'), ('jo', 'zyo'), ('je', 'zye'), ('ji', 'zi'),
+    ('fu', 'hu'),
+]
+
+
+def _hiragana_to_katakana(text):
+    return ''.join(chr(ord(c) + 0x60) if 'ぁ' <= c <= 'ゖ' else c for c in text)
+
+
+def normalize_name(name):
+    '''
+    名称を比較用に正規化する
+
+    NFKC で全角・半角をそろえ、大文字・小文字を区別せず、
+    ひらがなはカタカナにし、空白や記号は取り除く
+
+    Parameters
+    ---------
+    name : str
+        プリキュアの名称
+
+    Returns
+    ------
+    str
+
+    '''
+    name = _hiragana_to_katakana(unicodedata.normalize('NFKC', name).casefold())
+    return ''.join(c for c in name if c.isalnum())
+
+
+def kana_to_romaji(text):
+    '''
+    カタカナをローマ字にする。カタカナ以外の文字はそのまま
+
+    Parameters
+    ---------
+    text : str
+        normalize_name で正規化した文字列
+
+    Returns
+    ------
+    str
+
+    '''
+    romaji = []
+    double = False
+    i = 0
+    while i < len(text):
+        pair = text[i:i + 2]
+        c = text[i]
+        if pair in _KANA_DIGRAPHS:
+            sound = _KANA_DIGRAPHS[pair]
+            i += 2
+        elif len(pair) == 2 and pair[1] in 'ャュョ' and c in _KANA_TO_ROMAJI and c not in 'ャュョ':
+            # キャ -> kya, シャ -> sya
+            sound = _KANA_TO_ROMAJI[c][:-1] + _KANA_TO_ROMAJI[pair[1]]
+            i += 2
+        elif c == 'ッ':
+            double = True
+            i += 1
+            continue
+        elif c == 'ー':
+            # 長音は読み飛ばす
+            i += 1
+            continue
+        else:
+            sound = _KANA_TO_ROMAJI.get(c, c)
+            i += 1
+
+        if double and sound[0].isalpha() and sound[0] not in 'aiueon':
+            sound = sound[0] + sound
+        double = False
+        romaji.append(sound)
+    return ''.join(romaji)
+
+
+def normalize_romaji(text):
+    '''
+    ローマ字の綴りの揺れ (shi/si, tsu/tu など) を、kana_to_romaji の綴りに寄せる
+    '''
+    for src, dst in _ROMAJI_VARIANTS:
+        text = text.replace(src, dst)
+    return text
+
+
+def name_keys(name):
+    '''
+    名称から、索引に使うキー (正規化した名称とローマ字読み) を作る
+
+    Returns
+    ------
+    list of str
+        重複のないキー
+
+    '''
+    key = normalize_name(name)
+    keys = [key]
+    for variant in (normalize_romaji(kana_to_romaji(key)), normalize_romaji(key)):
+        if variant not in keys:
+            keys.append(variant)
+    return keys
+
+
+
+#########################################################
+#                                                       #
+# 索引                                                  #
+#                                                       #
+#########################################################
+
+def _ngrams(key, n=2):
+    # 先頭と末尾に印を付けて、短い名前でも n-gram ができるようにする
+    key = '^' + key + '$'
+    return set(key[i:i + n] for i in range(len(key) - n + 1))
+
+
+class cure_name_index :
+    '''プリキュアの名称の索引
+
+    正規化したキーでの完全一致と、n-gram (2文字) によるあいまい検索ができる
+
+    Attributes
+    ----------
+    registry : cure_registry instance
+        索引を作ったレジストリ
+
+    '''
+    def __init__(self, registry):
+        self.registry = registry
+
+        # 正規化したキー -> cure_palette
+        self._exact = dict()
+        # キーの一覧と、そのキーの cure_palette・n-gram
+        self._keys = []
+        self._key_palettes = []
+        self._key_grams = []
+        # n-gram -> キーの番号
+        self._postings = defaultdict(list)
+
+        for name, palette in registry.palettes.items():
+            for key in name_keys(name):
+                self._exact[key] = palette
+                grams = _ngrams(key)
+                key_id = len(self._keys)
+                self._keys.append(key)
+                self._key_palettes.append(palette)
+                self._key_grams.append(len(grams))
+                for gram in grams:
+                    self._postings[gram].append(key_id)
+
+    def lookup(self, name):
+        '''
+        正規化した名称が一致する cure_palette を返す。なければ None
+        '''
+        for key in name_keys(name):
+            palette = self._exact.get(key)
+            if palette is not None:
+                return palette
+        return None
+
+    def search(self, query, k=5):
+        '''
+        名称をあいまい検索する
+
+        Parameters
+        ---------
+        query : str
+            検索する文字列
+
+        k : int
+            返す候補の数
+
+        Returns
+        ------
+        list of (str, float)
+            プリキュアの名称 (英語名) と類似度 (0-1) の組を、類似度の高い順に並べたもの
+
+        '''
+        best = dict()
+        for key in name_keys(query):
+            palette = self._exact.get(key)
+            if palette is not None:
+                best[palette] = 1.0
+
+            grams = _ngrams(key)
+            counts = defaultdict(int)
+            for gram in grams:
+                for key_id in self._postings.get(gram, ()):
+                    counts[key_id] += 1
+
+            # Dice 係数
+            for key_id, common in counts.items():
+                score = 2.0 * common / (len(grams) + self._key_grams[key_id])
+                palette = self._key_palettes[key_id]
+                if score > best.get(palette, 0.0):
+                    best[palette] = score
+
+        ranked = sorted(best.items(), key=lambda item: -item[1])[:k]
+        return [(palette.name, score) for palette, score in ranked]
+
+
+_index = precure_colormap.registry_cache(cure_name_index)
+
+def get_name_index(registry):
+    '''
+    レジストリの名称の索引を返す。レジストリが変わったときだけ作り直す
+
+    Parameters
+    ---------
+    registry : cure_registry instance
+
+    Returns
+    ------
+    cure_name_index instance
+
+    '''
+    return _index.get(registry)
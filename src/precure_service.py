@@ -0,0 +1,359 @@
+#########################################################
+#                                                       #
+# precure_service.py                                    #
+#                                                       #
+# 配色をほかのプロセスに配る、asyncio の                   #
+# 小さな HTTP サーバー (TCP か Unix ソケット)              #
+#                                                       #
+#########################################################
+
+
+import asyncio
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from urllib.parse import parse_qs
+from urllib.parse import unquote
+from urllib.parse import urlsplit
+
+import numpy as np
+
+import precure_colormap
+
+
+
+# 既定の待ち受けアドレス
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+# 起動時に全配色の分を作っておく LUT の段階数
+DEFAULT_LUT_SIZE = 256
+
+# /lut で返せる LUT の段階数の上限
+MAX_LUT_SIZE = 65536
+
+# キャッシュしておく応答の数
+RESPONSE_CACHE_SIZE = 1024
+
+# リクエストの1行・ヘッダーの大きさの上限 [byte]
+_MAX_LINE = 8192
+
+_REASONS = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed'}
+
+
+class _http_error(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _palette_record(palette, registry):
+    return {
+        'name': palette.name,
+        'aliases': list(palette.aliases),
+        'kind': palette.kind,
+        'title': palette.title,
+        'titles': list(registry.name_to_titles.get(palette.name, ())),
+        'attribute': palette.attribute,
+        'colors': list(palette.colors),
+    }
+
+
+class cure_service :
+    '''配色を HTTP で配るサービス
+
+    レジストリは一度だけ読み込み、全配色の LUT (DEFAULT_LUT_SIZE 段階) は起動時にまとめて作る。
+    応答には ETag を付け、If-None-Match が一致すれば 304 を返す。
+    段階数を省略した LUT や一覧などの応答は RESPONSE_CACHE_SIZE 個までキャッシュする
+    (lut_size 以外の段階数を指定した LUT と検索の結果はキャッシュしない)。
+    レジストリが変わったら、変わった配色の LUT と応答、一覧の応答だけを作り直す。
+    応答はイベントループの外 (スレッドプール) で作る
+
+    エンドポイント (すべて GET か HEAD)
+
+        /version                 {"version": レジストリの番号}
+        /palettes                全配色の名称・種類・作品・色
+        /palettes/<名称>          1人分の配色 (名称は get_by_name と同じく正規化して探す)
+        /lut/<名称>?n=256         uint8 の RGBA の LUT (n * 4 byte、n は MAX_LUT_SIZE まで。
+                                 省略した場合は get_lut と同じくカラーマップの段階数)
+        /titles                  作品タイトル -> 登場プリキュア
+        /titles/<作品タイトル>     登場プリキュア (日本語のタイトルも可)
+        /search?q=<文字列>&k=5    名称のあいまい検索
+
+    Attributes
+    ----------
+    cure_colors : cure_colormap instance
+        名称を引くインスタンス
+
+    '''
+    def __init__(self, cure_colors=None, lut_size=DEFAULT_LUT_SIZE):
+        if cure_colors is None:
+            cure_colors = precure_colormap.cure_colormap.default()
+        self.cure_colors = cure_colors
+        self.lut_size = lut_size
+        self._lock = threading.Lock()
+        self._registry = None
+        self._luts = None
+        self._lut_index = None
+        # パスとクエリ -> (content-type, 本文, ETag, 名前で引いた (名前, 配色))
+        self._responses = OrderedDict()
+        self._refresh()
+
+    def _refresh(self):
+        registry = precure_colormap.get_registry()
+        if registry is self._registry:
+            return registry
+        with self._lock:
+            if registry is not self._registry:
+                # 変わっていない配色の LUT と応答はそのまま使い、新しい配色の分だけ作る
+                old_index = self._lut_index or {}
+                new = [palette for palette in registry.entries if palette not in old_index]
+                new_luts = precure_colormap.palettes_to_luts(new, self.lut_size)
+                new_index = dict((palette, i) for i, palette in enumerate(new))
+                self._luts = np.stack([self._luts[old_index[palette]] if palette in old_index
+                                       else new_luts[new_index[palette]] for palette in registry.entries])
+                self._lut_index = dict((palette, i) for i, palette in enumerate(registry.entries))
+                self._responses = OrderedDict((key, response) for key, response in self._responses.items()
+                                              if response[3] is not None and self._still_found(response[3], registry))
+                self._registry = registry
+        return registry
+
+    def _still_found(self, found, registry):
+        # 名前で引いた配色が、新しいレジストリでも同じ配色か
+        name, palette = found
+        if registry.palettes.get(palette.name) is not palette:
+            return False
+        if registry.name_to_titles.get(palette.name) != self._registry.name_to_titles.get(palette.name):
+            return False
+        try:
+            return self._find(name, registry) is palette
+        except _http_error:
+            return False
+
+    def _find(self, name, registry):
+        palette = registry.attributes.get(name)
+        if palette is None:
+            palette = self.cure_colors.name_to_cmap.find(name)
+        if palette is None:
+            raise _http_error(404, 'unknown name: {}'.format(name))
+        return palette
+
+    def _render(self, path, query, registry):
+        # (content-type, 本文, 名前で引いた (名前, 配色), キャッシュするか) を返す。
+        # 配色によらない応答 (一覧など) の3つめは None
+        parts = [unquote(part) for part in path.strip('/').split('/')]
+
+        def as_json(value, found=None, cache=True):
+            body = json.dumps(value, ensure_ascii=False).encode('utf-8')
+            return 'application/json; charset=utf-8', body, found, cache
+
+        if parts == ['version']:
+            return as_json({'version': registry.version})
+        if parts == ['palettes']:
+            return as_json([_palette_record(palette, registry) for palette in registry.entries])
+        if len(parts) == 2 and parts[0] == 'palettes':
+            palette = self._find(parts[1], registry)
+            return as_json(_palette_record(palette, registry), (parts[1], palette))
+        if len(parts) == 2 and parts[0] == 'lut':
+            palette = self._find(parts[1], registry)
+            if 'n' in query:
+                try:
+                    n = int(query['n'][0])
+                except ValueError:
+                    raise _http_error(400, 'n must be an integer')
+                if n < 1 or n > MAX_LUT_SIZE:
+                    raise _http_error(400, 'n must be between 1 and {}'.format(MAX_LUT_SIZE))
+            else:
+                # get_lut と同じく、カラーマップの段階数 (qualitative なら色の数)
+                n = None
+            index = self._lut_index.get(palette)
+            if index is not None and (n or precure_colormap.native_lut_size(palette)) == self.lut_size:
+                lut = self._luts[index]
+            elif n is None:
+                lut = self.cure_colors.name_to_cmap.lut(palette)
+            else:
+                # cure_colors の LUT のキャッシュには入れない
+                lut = precure_colormap.colormap_to_lut(self.cure_colors.name_to_cmap.build(palette), n)
+                return 'application/octet-stream', lut.tobytes(), (parts[1], palette), False
+            return 'application/octet-stream', lut.tobytes(), (parts[1], palette), True
+        if parts == ['titles']:
+            return as_json(dict((title, list(names)) for title, names in registry.title_to_characters.items()))
+        if len(parts) == 2 and parts[0] == 'titles':
+            characters = self.cure_colors.characters_of(parts[1])
+            if characters is None:
+                raise _http_error(404, 'unknown title: {}'.format(parts[1]))
+            return as_json(list(characters))
+        if parts == ['search']:
+            try:
+                k = int(query.get('k', ['5'])[0])
+            except ValueError:
+                raise _http_error(400, 'k must be an integer')
+            if k < 1:
+                raise _http_error(400, 'k must be at least 1')
+            return as_json(self.cure_colors.search(query.get('q', [''])[0], k), cache=False)
+        raise _http_error(404, 'not found: {}'.format(path))
+
+    def handle(self, method, target, headers=None):
+        '''
+        1つのリクエストを処理する
+
+        Parameters
+        ---------
+        method : str
+            'GET' か 'HEAD'
+
+        target : str
+            パスとクエリ ('/lut/Cure%20Black?n=16' など)
+
+        headers : dict
+            リクエストのヘッダー (名前は小文字)
+
+        Returns
+        ------
+        (int, dict, bytes)
+            ステータス、ヘッダー、本文
+
+        '''
+        headers = headers or {}
+        if method not in ('GET', 'HEAD'):
+            return self._error(405, 'method not allowed')
+
+        registry = self._refresh()
+        url = urlsplit(target)
+        key = (url.path, url.query)
+        with self._lock:
+            response = self._responses.get(key)
+            if response is not None:
+                self._responses.move_to_end(key)
+        if response is None:
+            try:
+                content_type, body, found, cache = self._render(url.path, parse_qs(url.query), registry)
+            except _http_error as e:
+                return self._error(e.status, str(e))
+            # 本文が同じなら、レジストリが変わっても同じ ETag になる
+            etag = '"{}"'.format(hashlib.sha1(body).hexdigest()[:20])
+            response = (content_type, body, etag, found)
+            with self._lock:
+                if cache and registry is self._registry:
+                    self._responses[key] = response
+                    while len(self._responses) > RESPONSE_CACHE_SIZE:
+                        self._responses.popitem(last=False)
+
+        content_type, body, etag, _ = response
+        response_headers = {'Content-Type': content_type, 'ETag': etag, 'Cache-Control': 'no-cache'}
+        if headers.get('if-none-match') == etag:
+            return 304, response_headers, b''
+        response_headers['Content-Length'] = str(len(body))
+        return 200, response_headers, body if method == 'GET' else b''
+
+    def _error(self, status, message):
+        body = json.dumps({'error': message}, ensure_ascii=False).encode('utf-8')
+        return status, {'Content-Type': 'application/json; charset=utf-8', 'Content-Length': str(len(body))}, body
+
+    async def _serve_connection(self, reader, writer):
+        # HTTP/1.1 の keep-alive に対応する。本文のあるリクエストは受け付けない
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except _http_error as e:
+                    await self._write(writer, 'HTTP/1.1', *self._error(e.status, str(e)), close=True)
+                    break
+                if request is None:
+                    break
+                method, target, version, headers = request
+
+                close = headers.get('connection', '').lower() == 'close' or version == 'HTTP/1.0'
+                # LUT や検索の計算でイベントループを止めない
+                response = await asyncio.get_running_loop().run_in_executor(None, self.handle, method, target, headers)
+                await self._write(writer, version, *response, close=close)
+                if close:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader):
+        # (メソッド, パス, バージョン, ヘッダー) を返す。接続が閉じられたら None
+        async def readline():
+            try:
+                line = await reader.readline()
+            except (ValueError, asyncio.LimitOverrunError):
+                # StreamReader の limit を超える行
+                raise _http_error(400, 'line too long')
+            if len(line) > _MAX_LINE:
+                raise _http_error(400, 'line too long')
+            return line
+
+        request_line = await readline()
+        if not request_line:
+            return None
+        try:
+            method, target, version = request_line.decode('latin-1').split()
+        except ValueError:
+            raise _http_error(400, 'bad request line')
+
+        headers = dict()
+        while True:
+            line = await readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        return method, target, version, headers
+
+    async def _write(self, writer, version, status, headers, body, close=False):
+        lines = ['{} {} {}'.format('HTTP/1.1' if version != 'HTTP/1.0' else version, status, _REASONS.get(status, ''))]
+        lines.extend('{}: {}'.format(name, value) for name, value in headers.items())
+        if close:
+            lines.append('Connection: close')
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+        await writer.drain()
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT, path=None):
+        '''
+        待ち受けを始める。path を指定した場合は Unix ソケットで待ち受ける
+
+        Returns
+        ------
+        asyncio.Server instance
+
+        '''
+        # _MAX_LINE より長い行は readline が ValueError を送出する
+        if path is not None:
+            return await asyncio.start_unix_server(self._serve_connection, path=path, limit=_MAX_LINE)
+        return await asyncio.start_server(self._serve_connection, host, port, limit=_MAX_LINE)
+
+
+#########################################################
+#                                                       #
+# 起動                                                  #
+#                                                       #
+#########################################################
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, path=None, lut_size=DEFAULT_LUT_SIZE):
+    '''
+    サービスを起動して、止められるまで待ち受ける
+
+    Parameters
+    ---------
+    host, port : str, int
+        待ち受ける TCP のアドレス
+
+    path : str
+        待ち受ける Unix ソケットのパス。指定した場合は host と port は使わない
+
+    lut_size : int
+        起動時に作っておく LUT の段階数
+
+    '''
+    service = cure_service(lut_size=lut_size)
+
+    async def run():
+        server = await service.start(host, port, path)
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(run())
@@ -0,0 +1,210 @@
+#########################################################
+#                                                       #
+# precure_stats.py                                      #
+#                                                       #
+# カラーマップの生成・利用の回数と時間を                    #
+# 記録する計測機能 (使うときだけ有効にする)                 #
+#                                                       #
+#########################################################
+
+
+import threading
+import time
+
+
+
+class cure_stats :
+    '''イベントごとの回数と時間を集計する
+
+    イベント名は 'get_by_name.hit' や 'plot_color_maps.swatch' のように
+    「関数名.段階」の形にする
+
+    Attributes
+    ----------
+    callbacks : list of function
+        イベントのたびに callback(event, seconds) の形で呼ぶ関数。
+        回数だけのイベントでは seconds は None
+
+    '''
+    def __init__(self):
+        self.callbacks = []
+        self._lock = threading.Lock()
+        self._counts = dict()
+        # イベント名 -> [回数, 合計, 最小, 最大]
+        self._timings = dict()
+
+    def count(self, event, n=1):
+        '''
+        イベントの回数を数える
+        '''
+        with self._lock:
+            self._counts[event] = self._counts.get(event, 0) + n
+        for callback in self.callbacks:
+            callback(event, None)
+
+    def record(self, event, seconds):
+        '''
+        イベントにかかった時間 [秒] を記録する
+        '''
+        with self._lock:
+            timing = self._timings.get(event)
+            if timing is None:
+                self._timings[event] = [1, seconds, seconds, seconds]
+            else:
+                timing[0] += 1
+                timing[1] += seconds
+                timing[2] = min(timing[2], seconds)
+                timing[3] = max(timing[3], seconds)
+        for callback in self.callbacks:
+            callback(event, seconds)
+
+    def timer(self, event):
+        '''
+        with ブロックにかかった時間を記録するコンテキストマネージャを返す
+        '''
+        return _timer(self, event)
+
+    def snapshot(self):
+        '''
+        集計結果を返す
+
+        Returns
+        ------
+        dict
+            {'counts': {イベント: 回数},
+             'timings': {イベント: {'count', 'total', 'mean', 'min', 'max'}}}。
+            時間の単位は秒
+
+        '''
+        with self._lock:
+            counts = dict(self._counts)
+            timings = dict((event, {'count': n, 'total': total, 'mean': total / n, 'min': low, 'max': high})
+                           for event, (n, total, low, high) in self._timings.items())
+        return {'counts': counts, 'timings': timings}
+
+    def reset(self):
+        '''
+        集計結果を消す
+        '''
+        with self._lock:
+            self._counts.clear()
+            self._timings.clear()
+
+
+class _timer :
+    __slots__ = ('stats', 'event', 'start')
+
+    def __init__(self, stats, event):
+        self.stats = stats
+        self.event = event
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stats.record(self.event, time.perf_counter() - self.start)
+        return False
+
+
+class _null_timer :
+    # 計測しないときの timer。何もしない
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+_NULL_TIMER = _null_timer()
+
+
+
+#########################################################
+#                                                       #
+# 有効・無効の切り替え                                    #
+#                                                       #
+#########################################################
+
+# 有効なときの cure_stats。無効なときは None。
+# 計測する側は `if precure_stats.active is not None` だけで判定する
+active = None
+
+clock = time.perf_counter
+
+
+def enable(callback=None):
+    '''
+    計測を有効にする。すでに有効なら、それまでの集計結果を引き継ぐ
+
+    Parameters
+    ---------
+    callback : function
+        イベントのたびに callback(event, seconds) の形で呼ぶ関数
+
+    Returns
+    ------
+    cure_stats instance
+
+    '''
+    global active
+    stats = active
+    if stats is None:
+        stats = cure_stats()
+    if callback is not None and callback not in stats.callbacks:
+        stats.callbacks.append(callback)
+    active = stats
+    return stats
+
+
+def disable():
+    '''
+    計測を無効にする
+
+    Returns
+    ------
+    dict
+        それまでの集計結果 (cure_stats.snapshot)。有効でなければ None
+
+    '''
+    global active
+    stats = active
+    active = None
+    return stats.snapshot() if stats is not None else None
+
+
+def get_stats():
+    '''
+    集計結果 (cure_stats.snapshot) を返す。計測が無効なら None
+    '''
+    stats = active
+    return stats.snapshot() if stats is not None else None
+
+
+def reset():
+    '''
+    集計結果を消す
+    '''
+    stats = active
+    if stats is not None:
+        stats.reset()
+
+
+def timer(event):
+    '''
+    計測が有効なら with ブロックの時間を記録する。無効なら何もしない
+    '''
+    stats = active
+    if stats is None:
+        return _NULL_TIMER
+    return stats.timer(event)
+
+
+def count(event, n=1):
+    '''
+    計測が有効ならイベントの回数を数える
+    '''
+    stats = active
+    if stats is not None:
+        stats.count(event, n)
@@ -0,0 +1,227 @@
+#########################################################
+#                                                       #
+# precure_watch.py                                      #
+#                                                       #
+# ユーザーの配色ディレクトリを監視して、                     #
+# 変わった配色だけをレジストリに登録し直す                   #
+#                                                       #
+#########################################################
+
+
+import os
+import threading
+
+import precure_colormap
+import precure_stats
+
+
+
+def _same_palette(a, b):
+    return (a.aliases == b.aliases and a.kind == b.kind and a.attribute == b.attribute and a.title == b.title
+            and a.colors == b.colors)
+
+
+class palette_watcher :
+    '''ディレクトリの配色カタログ (*.json) を監視し、変わった配色だけを登録し直す
+
+    カタログは precure_palettes.json と同じ形式 ('titles' は省略できる)。
+    ファイルの追加・変更・削除を更新時刻と大きさで見つけ、
+    中身が変わった配色だけを置き換える (update_palette と同じく、
+    ほかの配色のカラーマップやキャッシュはそのまま使える)。
+    ファイルを消すと、その配色も削除する。組み込みの配色を上書きしていた場合は元に戻す。
+    作品の一覧は変えない (作品を追加するときは load_catalog を使う)
+
+    同じ名前の配色が複数のファイルにある場合は、ファイル名の順で後のものを使う。
+    読めないファイル (書きかけなど) や、名称・属性名がほかの配色と重なる配色のあるファイルは
+    前の内容のままにして、次の確認で読み直す
+
+    Attributes
+    ----------
+    directory : str
+        監視するディレクトリ
+
+    interval : float
+        確認の間隔 [秒]
+
+    callback : function
+        配色が変わるたびに callback(changed, removed) の形で呼ぶ関数。
+        changed は追加・変更した配色の名前 (英語名)、removed は削除した配色の名前の list
+
+    errors : dict
+        読めなかったファイル (名称が重なったファイルを含む) のパスと例外
+
+    last_error : Exception
+        別スレッドでの確認で最後に起きた例外 (callback の例外など)。なければ None
+
+    Examples
+    --------
+    >>> with palette_watcher('~/.precure/palettes') as watcher:
+    ...     render_forever()
+
+    '''
+    def __init__(self, directory, interval=1.0, callback=None):
+        self.directory = os.path.expanduser(directory)
+        self.interval = interval
+        self.callback = callback
+        self.errors = dict()
+        self.last_error = None
+        self._lock = threading.Lock()
+        # パス -> (更新時刻, 大きさ)
+        self._stats = dict()
+        # パス -> そのファイルの cure_palette の list
+        self._files = dict()
+        # 登録した配色。名前 -> cure_palette
+        self._applied = dict()
+        # 上書きした組み込みの配色。名前 -> cure_palette
+        self._shadowed = dict()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _scan(self):
+        stats = dict()
+        try:
+            entries = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return stats
+        for entry in entries:
+            if not entry.name.endswith('.json'):
+                continue
+            # 一覧を作った後に消えたファイルは飛ばす
+            try:
+                if entry.is_file():
+                    stat = entry.stat()
+                    stats[entry.path] = (stat.st_mtime_ns, stat.st_size)
+            except FileNotFoundError:
+                pass
+        return stats
+
+    def _plan(self, previous):
+        # 変わった配色、削除する配色、元に戻す組み込みの配色を決める。
+        # 登録できない配色 (色が正しくない、名称・属性名がほかの配色と重なる) のあるファイルは、
+        # 前の内容に戻してから決め直す
+        while True:
+            wanted = dict()
+            sources = dict()
+            for path in sorted(self._files):
+                for palette in self._files[path]:
+                    wanted[palette.name] = palette
+                    sources[palette.name] = path
+
+            changed = [palette for name, palette in wanted.items()
+                       if name not in self._applied or not _same_palette(self._applied[name], palette)]
+            removed = [name for name in self._applied if name not in wanted]
+            # 上書きしていた組み込みの配色は、削除せずに元に戻す
+            restored = [self._shadowed[name] for name in removed if name in self._shadowed]
+
+            errors = precure_colormap.check_palettes(changed + restored, removed)
+            rejected = dict((sources[name], e) for name, e in errors.items() if name in sources)
+            if len(rejected) == 0:
+                return changed, removed, restored
+            for path, e in rejected.items():
+                self.errors[path] = e
+                precure_stats.count('palette_watcher.error')
+                self._stats.pop(path, None)
+                old = previous.get(path)
+                if old is not None and old is not self._files[path]:
+                    self._files[path] = old
+                else:
+                    del self._files[path]
+
+    def poll(self):
+        '''
+        ディレクトリを1回確認し、変わった配色を登録し直す
+
+        Returns
+        ------
+        (list of str, list of str)
+            追加・変更した配色の名前と、削除した配色の名前 (英語名)
+
+        '''
+        with self._lock:
+            previous = dict(self._files)
+            stats = self._scan()
+            for path in set(self._stats).difference(stats):
+                del self._stats[path]
+                self._files.pop(path, None)
+                self.errors.pop(path, None)
+            for path, stat in stats.items():
+                if self._stats.get(path) == stat:
+                    continue
+                try:
+                    self._files[path] = list(precure_colormap.read_catalog(path).entries)
+                except (OSError, ValueError, KeyError) as e:
+                    self.errors[path] = e
+                    precure_stats.count('palette_watcher.error')
+                    continue
+                self.errors.pop(path, None)
+                self._stats[path] = stat
+
+            changed, removed, restored = self._plan(previous)
+            if len(changed) == 0 and len(removed) == 0:
+                return [], []
+
+            replaced = precure_colormap.replace_palettes(changed + restored, removed)
+            for palette in changed:
+                if palette.name in replaced and palette.name not in self._applied:
+                    self._shadowed[palette.name] = replaced[palette.name]
+            for name in removed:
+                self._shadowed.pop(name, None)
+            for palette in changed:
+                self._applied[palette.name] = palette
+            for name in removed:
+                del self._applied[name]
+
+        changed = [palette.name for palette in changed]
+        precure_stats.count('palette_watcher.reload')
+        if self.callback is not None:
+            self.callback(changed, removed)
+        return changed, removed
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            # 1回の確認で例外が起きても、監視は続ける
+            try:
+                self.poll()
+            except Exception as e:
+                self.last_error = e
+                precure_stats.count('palette_watcher.error')
+
+    def start(self):
+        '''
+        すぐに1回確認してから、別スレッドで interval ごとに確認する
+        '''
+        if self._thread is None:
+            self.poll()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='palette_watcher', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        '''
+        監視を止める。登録した配色はそのまま残す
+        '''
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+        return False
+
+
+def watch_palettes(directory, interval=1.0, callback=None):
+    '''
+    ユーザーの配色ディレクトリの監視を始める (palette_watcher を参照)
+
+    Returns
+    ------
+    palette_watcher instance
+        監視を止めるときは stop() を呼ぶ
+
+    '''
+    return palette_watcher(directory, interval, callback).start()
@@ -37,6 +37,13 @@ ax = df.plot.scatter(x='sepal length (cm)', y='petal width (cm)', label='petal w
 plt.legend()
 plt.show()
 
+# 品種 (カテゴリ) ごとに色分けした散布図
+# 行ごとに色を選ばなくても、まとめて色の配列を作れる
+species = pd.Series(iris.target_names[iris.target])
+rgba, categories = cure_colors.colors_for_categories(species, 'キュアコスモ', return_categories=True)
+ax = df.plot.scatter(x='sepal length (cm)', y='petal length (cm)', c=rgba)
+plt.show()
+
 # 相関係数でヒートマップ
 sns.heatmap(df.corr(),linewidths=0.1, square=True, linecolor='white', annot=True, cmap=cure_colors.get_by_name('キュアフローラ'))
 plt.show()
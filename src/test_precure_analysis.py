@@ -0,0 +1,206 @@
+#########################################################
+#                                                       #
+# test_precure_analysis.py                              #
+#                                                       #
+# precure_analysis のテスト                              #
+#                                                       #
+#########################################################
+
+
+import time
+import unittest
+
+import numpy as np
+
+import precure_analysis
+import precure_colormap
+from precure_colormap import cure_colormap
+
+
+
+class test_color_space(unittest.TestCase) :
+    def test_rgb_to_lab(self):
+        lab = precure_analysis.rgb_to_lab(np.array([[255, 255, 255], [0, 0, 0], [255, 0, 0]], dtype=np.uint8))
+        np.testing.assert_allclose(lab[0], [100, 0, 0], atol=1e-3)
+        np.testing.assert_allclose(lab[1], [0, 0, 0], atol=1e-3)
+        np.testing.assert_allclose(lab[2], [53.24, 80.09, 67.20], atol=1e-2)
+
+    def test_sample_palettes(self):
+        # 'linear' は cmap と同じグラデーション、'qualitative' は帯
+        cure_colors = cure_colormap()
+        palettes = [precure_colormap.get_registry().palettes[name] for name in ['Cure Twinkle', 'Cure Cosmo']]
+        rgb, offsets = precure_analysis.pack_palettes(palettes)
+        samples = precure_analysis.sample_palettes(rgb, offsets, [p.kind for p in palettes], 16)
+        x = np.linspace(0, 1, 16)
+        np.testing.assert_allclose(samples[0], cure_colors.get_by_name('Cure Twinkle')(x)[:, :3], atol=1 / 64)
+        np.testing.assert_allclose(samples[1], cure_colors.get_by_name('Cure Cosmo')(x)[:, :3])
+
+
+
+class test_nearest(unittest.TestCase) :
+    def setUp(self):
+        self.cure_colors = cure_colormap()
+
+    def test_nearest_color(self):
+        # 配色に含まれている色そのもの
+        result = self.cure_colors.nearest('#F15312', k=3)
+        self.assertEqual(len(result), 3)
+        self.assertEqual(result[0], ('Cure Twinkle', 0.0))
+        self.assertTrue(result[1][1] <= result[2][1])
+        self.assertEqual(self.cure_colors.nearest((0x00 / 255, 0x07 / 255, 0x2A / 255), k=1)[0][0], 'Cure Black')
+        # 整数の tuple は 0-255
+        self.assertEqual(self.cure_colors.nearest((0x00, 0x07, 0x2A), k=1), [('Cure Black', 0.0)])
+        self.assertEqual(self.cure_colors.nearest(np.array([0xF1, 0x53, 0x12], dtype=np.uint8), k=1),
+                         [('Cure Twinkle', 0.0)])
+        with self.assertRaises(ValueError):
+            self.cure_colors.nearest((255.0, 0.0, 0.0))
+
+    def test_nearest_palette(self):
+        colors = list(precure_colormap.get_registry().palettes['Cure Flora'].colors)
+        self.assertEqual(self.cure_colors.nearest(colors, k=1), [('Cure Flora', 0.0)])
+
+    def test_many_palettes(self):
+        # ユーザーが登録した数千の配色でも、索引を作れば一瞬で引ける
+        rng = np.random.default_rng(0)
+        entries = [precure_colormap.cure_palette('user {}'.format(i), ['user {}'.format(i)],
+                                                 rgb=rng.integers(0, 256, size=(rng.integers(2, 9), 3), dtype=np.uint8))
+                   for i in range(3000)]
+        index = precure_analysis.cure_color_index(precure_colormap.cure_registry(entries, []))
+        start = time.perf_counter()
+        result = index.nearest(['red', 'white', 'blue'], k=10)
+        index.nearest('red', k=10)
+        self.assertLess(time.perf_counter() - start, 0.5)
+        self.assertEqual(len(result), 10)
+
+
+
+class test_uniformity(unittest.TestCase) :
+    def setUp(self):
+        self.cure_colors = cure_colormap()
+
+    def step_cv(self, cmap):
+        lab = precure_analysis.rgb_to_lab(cmap(np.linspace(0, 1, 256))[:, :3])
+        steps = precure_analysis.delta_e(lab[1:], lab[:-1])
+        return steps.std() / steps.mean()
+
+    def test_stop_positions(self):
+        # 白黒の間に灰色を置くと、灰色は明度の真ん中に来る
+        positions = precure_analysis.uniform_positions(['black', '#777777', 'white'])
+        self.assertEqual(positions[0], 0.0)
+        self.assertEqual(positions[-1], 1.0)
+        self.assertAlmostEqual(positions[1], 0.5, delta=0.02)
+        # 同じ色が続くところは重なる。全部同じ色なら等間隔のまま
+        positions = precure_analysis.uniform_positions(['black', 'white', 'white'])
+        np.testing.assert_allclose(positions, [0, 1, 1])
+        np.testing.assert_allclose(precure_analysis.uniform_positions(['red', 'red', 'red']), [0, 0.5, 1])
+
+    def test_stop_positions_packed(self):
+        # まとめて計算しても、1つずつ計算したものと同じ
+        palettes = [precure_colormap.get_registry().palettes[name] for name in ['Cure Dream', 'Cure Black', 'Cure Rouge']]
+        rgb, offsets = precure_analysis.pack_palettes(palettes)
+        packed = precure_analysis.stop_positions(rgb, offsets)
+        for i, palette in enumerate(palettes):
+            np.testing.assert_allclose(packed[offsets[i]:offsets[i + 1]],
+                                       precure_analysis.uniform_positions(list(palette.colors)))
+
+    def test_generate_cmap_uniform(self):
+        colors = list(precure_colormap.get_registry().palettes['Cure Dream'].colors)
+        cmap = self.cure_colors.generate_cmap(colors, uniform=True)
+        # 両端の色は変わらず、色差のむらは小さくなる
+        np.testing.assert_allclose(cmap([0.0, 1.0]), self.cure_colors.generate_cmap(colors)([0.0, 1.0]))
+        self.assertLess(self.step_cv(cmap), self.step_cv(self.cure_colors.generate_cmap(colors)) / 2)
+
+    def test_perceptual_profile(self):
+        lightness, steps = self.cure_colors.perceptual_profile('キュアブラック')
+        self.assertEqual(lightness.shape, (256,))
+        self.assertEqual(steps.shape, (255,))
+        lab = precure_analysis.rgb_to_lab(self.cure_colors.get_by_name('Cure Black')(np.linspace(0, 1, 256))[:, :3])
+        np.testing.assert_allclose(lightness, lab[:, 0], atol=0.5)
+        self.assertIsNone(self.cure_colors.perceptual_profile('キュアゴリラ'))
+
+    def test_get_uniformity(self):
+        # 全配色の分をまとめて計算し、使い回す
+        uniformity = precure_analysis.get_uniformity()
+        self.assertIs(uniformity, precure_analysis.get_uniformity())
+        self.assertEqual(uniformity.lightness.shape, (len(uniformity.names), 256))
+        # 同じ色が続く Cure Dream は、位置が重なる
+        positions = uniformity.positions_of('Cure Dream')
+        self.assertAlmostEqual(positions[3], positions[4])
+        self.assertTrue(np.all(np.diff(positions) >= 0))
+        for name, _ in uniformity.least_uniform(5):
+            self.assertEqual(precure_colormap.get_registry().palettes[name].kind, 'linear')
+
+
+
+class test_colorblind(unittest.TestCase) :
+    def setUp(self):
+        self.cure_colors = cure_colormap()
+
+    def test_simulate_cvd(self):
+        # 灰色はどの見え方でも (ほぼ) 変わらない
+        gray = np.array([[0.0, 0.0, 0.0], [0.5, 0.5, 0.5], [1.0, 1.0, 1.0]])
+        for vision in precure_analysis.VISIONS:
+            np.testing.assert_allclose(precure_analysis.simulate_cvd(gray, vision), gray, atol=1e-3)
+        # 1型では赤と緑が近づく
+        red_green = np.array([[1.0, 0.0, 0.0], [0.0, 0.5, 0.0]])
+        normal = precure_analysis.rgb_to_lab(red_green)
+        protan = precure_analysis.rgb_to_lab(precure_analysis.simulate_cvd(red_green, 'protan'))
+        self.assertLess(precure_analysis.delta_e(*protan), precure_analysis.delta_e(*normal) / 2)
+        with self.assertRaises(ValueError):
+            precure_analysis.simulate_cvd(red_green, 'gorilla')
+
+    def test_contrast_ratio(self):
+        self.assertAlmostEqual(float(precure_analysis.contrast_ratio([0, 0, 0], [1, 1, 1])), 21.0)
+        self.assertAlmostEqual(float(precure_analysis.contrast_ratio([1, 1, 1], [1, 1, 1])), 1.0)
+
+    def test_cvd_report(self):
+        report = precure_analysis.get_cvd_report()
+        self.assertIs(report, precure_analysis.get_cvd_report())
+        # まとめて計算しても、1色ずつ計算したものと同じ
+        for name in ['Cure Cosmo', 'Cure Black']:
+            rgb = precure_colormap.get_registry().palettes[name].rgb / 255.0
+            colors = [tuple(c) for c in np.unique(rgb, axis=0)]
+            result = self.cure_colors.colorblind_report(name)
+            for vision in precure_analysis.VISIONS:
+                lab = precure_analysis.rgb_to_lab(precure_analysis.simulate_cvd(np.array(colors), vision))
+                expected = min(precure_analysis.delta_e(lab[i], lab[j])
+                               for i in range(len(lab)) for j in range(i + 1, len(lab)))
+                self.assertAlmostEqual(result['min_delta_e'][vision], expected, msg=(name, vision))
+            for background, color in precure_analysis.BACKGROUNDS.items():
+                expected = precure_analysis.contrast_ratio(rgb, precure_colormap._decode_colors([color])[0, :3]).min()
+                self.assertAlmostEqual(result['contrast'][background], expected)
+        self.assertIsNone(self.cure_colors.colorblind_report('キュアゴリラ'))
+
+    def test_unsafe(self):
+        report = precure_analysis.get_cvd_report()
+        unsafe = report.unsafe()
+        for name, vision, value in unsafe:
+            self.assertEqual(precure_colormap.get_registry().palettes[name].kind, 'qualitative')
+            self.assertLess(value, report.threshold)
+            self.assertFalse(report.is_safe(name))
+        # 1型で見分けにくい色がある
+        self.assertIn('Cure Cosmo', [name for name, _, _ in unsafe])
+
+    def test_cvd_report_registry(self):
+        # レジストリが変わったら検査し直す
+        entries = [precure_colormap.cure_palette('Cure Traffic', ['Cure Traffic'], ['#CC0000', '#669900', '#0000FF'],
+                                                 kind='qualitative'),
+                   # Okabe-Ito の配色
+                   precure_colormap.cure_palette('Cure Okabe', ['Cure Okabe'], ['#D55E00', '#009E73', '#0072B2'],
+                                                 kind='qualitative')]
+        registry = precure_colormap.cure_registry(entries, [])
+        report = precure_analysis.get_cvd_report(registry)
+        self.assertIsNot(report, precure_analysis.get_cvd_report())
+        self.assertEqual(report.unsafe()[0][:2], ('Cure Traffic', 'deutan'))
+        self.assertEqual(len(report.unsafe()), 1)
+
+
+
+#########################################################
+#                                                       #
+# main                                                  #
+#                                                       #
+#########################################################
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,109 @@
+#########################################################
+#                                                       #
+# test_precure_cli.py                                   #
+#                                                       #
+# precure_cli のテスト                                   #
+#                                                       #
+#########################################################
+
+
+import contextlib
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+import precure_cli
+from precure_colormap import cure_colormap
+
+
+
+class test_cli(unittest.TestCase) :
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.data = np.random.default_rng(0).normal(size=(20, 30))
+        self.data_path = self.path('data.npy')
+        np.save(self.data_path, self.data)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.tmpdir.name, name)
+
+    def run_cli(self, *argv):
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            self.assertEqual(precure_cli.main(list(argv)), 0)
+        return stdout.getvalue().splitlines()
+
+    def test_sheet(self):
+        self.assertEqual(self.run_cli('sheet', '-o', self.path('all.png')), [self.path('all.png')])
+        self.run_cli('sheet', '-o', self.path('futari.png'), '-t', 'ふたりはプリキュア', '--width', '32')
+        self.assertTrue(os.path.getsize(self.path('all.png')) > os.path.getsize(self.path('futari.png')) > 0)
+        with self.assertRaises(SystemExit):
+            self.run_cli('sheet', '-o', self.path('none.png'), '-t', '*** PreCure')
+
+    def test_colorize(self):
+        from PIL import Image
+        expected = cure_colormap().colorize('キュアブラック', self.data, -1, 1)
+        self.run_cli('colorize', 'キュアブラック', self.data_path, '-o', self.path('data.png'), '--vmin', '-1', '--vmax', '1')
+        with Image.open(self.path('data.png')) as image:
+            self.assertTrue(np.array_equal(np.asarray(image), expected))
+        # .npy なら RGBA の配列のまま書く
+        self.run_cli('colorize', 'cure black', self.data_path, '-o', self.path('rgba.npy'), '--vmin', '-1', '--vmax', '1')
+        self.assertTrue(np.array_equal(np.load(self.path('rgba.npy')), expected))
+        with self.assertRaises(SystemExit):
+            self.run_cli('colorize', 'キュアゴリラ', self.data_path, '-o', self.path('gorilla.png'))
+
+    def test_export(self):
+        paths = self.run_cli('export', '-o', self.tmpdir.name, '-f', 'npy,css', '-n', '16')
+        self.assertEqual(sorted(os.path.basename(path) for path in paths), ['precure_gradients.css', 'precure_luts.npy'])
+        self.assertEqual(np.load(self.path('precure_luts.npy')).shape[1:], (16, 4))
+        with self.assertRaises(SystemExit):
+            self.run_cli('export', '-o', self.tmpdir.name, '-f', 'gif')
+
+    def test_jobs(self):
+        jobs = self.path('jobs.txt')
+        with open(jobs, 'w', encoding='utf-8') as f:
+            f.write('# プレビュー\n'
+                    'sheet -o {0}/all.png\n'
+                    '\n'
+                    'sheet -o {0}/star.svg --title "Star Twinkle PreCure"\n'
+                    'colorize "Cure Cosmo" {0}/data.npy -o {0}/cosmo.png\n'.format(self.tmpdir.name))
+        self.assertEqual(len(precure_cli.read_jobs(jobs)), 3)
+        paths = self.run_cli('jobs', jobs, '-j', '2')
+        self.assertEqual(paths, [self.path('all.png'), self.path('star.svg'), self.path('cosmo.png')])
+        for path in paths:
+            self.assertTrue(os.path.getsize(path) > 0)
+
+    def test_no_gui(self):
+        # python -m precure_colormap で実行でき、pyplot も GUI も読み込まない
+        cwd = os.path.dirname(os.path.abspath(__file__))
+        script = ('import sys, precure_cli; precure_cli.main(sys.argv[1:]); '
+                  'print(",".join(m for m in ["matplotlib.pyplot", "tkinter", "seaborn"] if m in sys.modules))')
+        result = subprocess.run([sys.executable, '-c', script, 'sheet', '-o', self.path('all.png')], cwd=cwd,
+                                check=True, capture_output=True, text=True)
+        self.assertEqual(result.stdout.splitlines()[-1], '')
+        subprocess.run([sys.executable, '-m', 'precure_colormap', 'sheet', '-o', self.path('main.png')], cwd=cwd,
+                       check=True, capture_output=True)
+        self.assertTrue(os.path.exists(self.path('main.png')))
+        # 読み込んだだけでは NumPy も読み込まない
+        result = subprocess.run([sys.executable, '-c', 'import sys, precure_cli; print("numpy" in sys.modules)'],
+                                cwd=cwd, check=True, capture_output=True, text=True)
+        self.assertEqual(result.stdout.strip(), 'False')
+
+
+
+#########################################################
+#                                                       #
+# main                                                  #
+#                                                       #
+#########################################################
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,114 @@
+#########################################################
+#                                                       #
+# test_precure_colorize.py                              #
+#                                                       #
+# precure_colorize のテスト                              #
+#                                                       #
+#########################################################
+
+
+import os
+import tempfile
+import tracemalloc
+import unittest
+
+import numpy as np
+
+import precure_colorize
+from precure_colormap import cure_colormap
+
+
+
+class test_colorize_stream(unittest.TestCase) :
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cure_colors = cure_colormap()
+
+        # 入力は memory-map した配列
+        path = os.path.join(self.tmpdir.name, 'data.npy')
+        self.data = np.lib.format.open_memmap(path, mode='w+', dtype=np.float64, shape=(400, 300))
+        self.data[:] = np.random.default_rng(0).normal(size=self.data.shape)
+        self.data[1, 2] = np.nan
+        self.data.flush()
+
+    def tearDown(self):
+        del self.data
+        self.tmpdir.cleanup()
+
+    def test_iter_tiles(self):
+        # 1行に収まる場合は行単位、収まらない場合は次の軸でも分ける
+        self.assertEqual(list(precure_colorize.iter_tiles((5, 2), 4)),
+                         [(slice(0, 2),), (slice(2, 4),), (slice(4, 5),)])
+        self.assertEqual(list(precure_colorize.iter_tiles((2, 5), 3)),
+                         [(slice(0, 1), slice(0, 3)), (slice(0, 1), slice(3, 5)),
+                          (slice(1, 2), slice(0, 3)), (slice(1, 2), slice(3, 5))])
+
+    def test_colorize_stream(self):
+        path = os.path.join(self.tmpdir.name, 'rgba.npy')
+        out = precure_colorize.colorize_stream(self.data, 'キュアトゥインクル', path, max_memory=32 * 1024)
+        expected = self.cure_colors.colorize('キュアトゥインクル', np.asarray(self.data))
+        self.assertTrue(np.array_equal(out, expected))
+        del out
+        # 出力は .npy として読める
+        self.assertTrue(np.array_equal(np.load(path, mmap_mode='r'), expected))
+
+    def test_colorize_stream_range(self):
+        out = np.zeros(self.data.shape + (4,), dtype=np.uint8)
+        result = precure_colorize.colorize_stream(self.data, 'Cure Cosmo', out, vmin=-1, vmax=1,
+                                                  max_memory=1000, cure_colors=self.cure_colors)
+        self.assertIs(result, out)
+        self.assertTrue(np.array_equal(out, self.cure_colors.colorize('Cure Cosmo', np.asarray(self.data), -1, 1)))
+
+    def test_colorize_stream_memory(self):
+        # 作業領域は max_memory 程度に収まる
+        max_memory = 256 * 1024
+        path = os.path.join(self.tmpdir.name, 'rgba.npy')
+        tracemalloc.start()
+        try:
+            precure_colorize.colorize_stream(self.data, 'Cure Black', path, max_memory=max_memory)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertLess(peak, 2 * max_memory)
+
+    def test_colorize_parallel(self):
+        expected = self.cure_colors.colorize('キュアトゥインクル', np.asarray(self.data), -2, 2)
+        for workers in [1, 2, 4]:
+            out = precure_colorize.colorize_parallel(self.data, 'キュアトゥインクル', vmin=-2, vmax=2, workers=workers,
+                                                     max_memory=64 * 1024)
+            self.assertTrue(np.array_equal(out, expected), msg='workers={}'.format(workers))
+
+    def test_colorize_parallel_out(self):
+        # 結果は渡した配列に直接書き込む
+        out = np.zeros(self.data.shape + (4,), dtype=np.uint8)
+        result = precure_colorize.colorize_parallel(self.data, 'Cure Cosmo', out, workers=3)
+        self.assertIs(result, out)
+        self.assertTrue(np.array_equal(out, self.cure_colors.colorize('Cure Cosmo', np.asarray(self.data))))
+
+    def test_colorize_masked(self):
+        # マスクした値は透明にし、範囲にも含めない
+        data = np.ma.masked_greater(np.asarray(self.data), 1.5)
+        vmin, vmax = np.nanmin(data.compressed()), np.nanmax(data.compressed())
+        self.assertEqual(precure_colorize.data_range(data, max_memory=32 * 1024), (vmin, vmax))
+        expected = self.cure_colors.colorize('Cure Black', data, vmin, vmax)
+        for workers in [1, 3]:
+            out = precure_colorize.colorize_parallel(data, 'Cure Black', workers=workers, max_memory=32 * 1024)
+            self.assertTrue(np.array_equal(out, expected), msg='workers={}'.format(workers))
+        self.assertTrue(np.all(out[data.mask] == 0))
+
+    def test_colorize_stream_invalid(self):
+        with self.assertRaises(KeyError):
+            precure_colorize.colorize_stream(self.data, 'キュアゴリラ', os.path.join(self.tmpdir.name, 'rgba.npy'))
+        with self.assertRaises(ValueError):
+            precure_colorize.colorize_stream(self.data, 'Cure Black', np.zeros((1, 4), dtype=np.uint8))
+
+
+
+#########################################################
+#                                                       #
+# main                                                  #
+#                                                       #
+#########################################################
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,817 @@
+#########################################################
+#                                                       #
+# test_precure_colormap.py                              #
+#                                                       #
+# precure_colormap のテスト                              #
+#                                                       #
+#########################################################
+
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from matplotlib.colors import LinearSegmentedColormap
+from matplotlib.colors import ListedColormap
+from matplotlib.colors import Normalize
+
+import precure_colormap
+from precure_colormap import cure_colormap
+from precure_colormap import cure_palette
+
+
+
+class test_cure_colormap(unittest.TestCase) :
+    def setUp(self):
+        self.cure_colors = cure_colormap()
+    
+    def tearDown(self):
+        # 終了処理
+        del self.cure_colors
+    
+    def test_generate_cure_cmap_no_color(self):
+        # 色指定がないので生成しない
+        cmap = self.cure_colors.generate_cure_cmap([], [], method=self.cure_colors.generate_cmap)
+        self.assertIsNone(cmap, msg='generate_cure_cmap([], [], method=self.cure_colors.generate_cmap)')
+
+    def test_generate_cure_cmap_no_color_q(self):
+        cmap = self.cure_colors.generate_cure_cmap([], [], method=self.cure_colors.generate_cmap_q)
+        self.assertIsNone(cmap, msg='generate_cure_cmap([], [], method=self.cure_colors.generate_cmap_q)')
+
+    def test_generate_cure_cmap_single_color(self):
+        # 1色で生成しない。グラデーションだからできない
+        cmap = self.cure_colors.generate_cure_cmap( ['black'], [], method=self.cure_colors.generate_cmap)
+        self.assertIsNone(cmap, msg="generate_cure_cmap(['black'], [], method=self.cure_colors.generate_cmap)")
+
+    def test_generate_cure_cmap_single_color_q(self):
+        # 質的なものは1色で生成できる
+        cmap = self.cure_colors.generate_cure_cmap( ['black'], [], method=self.cure_colors.generate_cmap_q)
+        self.assertIsNotNone(cmap, msg="generate_cure_cmap(['black'], [], method=self.cure_colors.generate_cmap_q)")
+
+    def test_generate_cure_cmap(self):
+        # 生成する
+        cmap = self.cure_colors.generate_cure_cmap( ['black', 'white'], ['cure_tmp'], method=self.cure_colors.generate_cmap)
+        self.assertIsInstance(cmap, LinearSegmentedColormap, msg="generate_cure_cmap(['black', 'white'], [])")
+
+    def test_generate_cure_cmap_q(self):
+        cmap = self.cure_colors.generate_cure_cmap( ['black', 'white'], ['cure_tmp'], method=self.cure_colors.generate_cmap_q)
+        self.assertIsInstance(cmap, ListedColormap, msg="generate_cure_cmap(['black', 'white'], [])")
+
+    def test_generate_cmap_q_colors(self):
+        # seaborn.color_palette(colors).as_hex() を通していたときと同じ色
+        try:
+            import seaborn as sns
+        except ImportError:
+            self.skipTest('seaborn is not installed')
+        x = np.linspace(0, 1, 256)
+        for colors in [list(self.cure_colors.name_to_cmap.palette('Cure Cosmo').colors),
+                       ['red', '#abc', 'C1', (0.1, 0.2, 0.3), '#FFA50080']]:
+            expected = ListedColormap(sns.color_palette(colors).as_hex())
+            cmap = self.cure_colors.generate_cmap_q(colors)
+            self.assertEqual(cmap.N, expected.N)
+            self.assertTrue(np.array_equal(cmap(x), expected(x)), msg=colors)
+
+    def test_generate_cmap_q_cycle(self):
+        # カテゴリの数に合わせて色を繰り返す
+        cmap = self.cure_colors.generate_cmap_q(['red', 'blue', 'lime'], n=7)
+        self.assertEqual(cmap.N, 7)
+        self.assertTrue(np.array_equal(cmap(np.arange(7), bytes=True)[:, :3],
+                                       [[255, 0, 0], [0, 0, 255], [0, 255, 0]] * 2 + [[255, 0, 0]]))
+        self.assertEqual(self.cure_colors.generate_cmap_q(['red', 'blue', 'lime'], n=2).N, 2)
+        self.assertIsNone(self.cure_colors.generate_cmap_q([]))
+
+    def test_generate_cmaps_batch(self):
+        palette = self.cure_colors.name_to_cmap.palette('Cure Cosmo')
+        cmaps = self.cure_colors.generate_cmaps_batch([['black', '#FFFFFF'], palette, ['black'], []])
+        self.assertIsInstance(cmaps[0], LinearSegmentedColormap)
+        self.assertIsInstance(cmaps[1], ListedColormap)
+        # 1色以下はグラデーションにできない
+        self.assertEqual(cmaps[2:], [None, None])
+        # 1人ずつ生成した場合と同じ色になる
+        x = np.linspace(0, 1, 256)
+        self.assertTrue(np.array_equal(cmaps[0](x), self.cure_colors.generate_cmap(['black', 'white'])(x)))
+        self.assertTrue(np.array_equal(cmaps[1](x), self.cure_colors.generate_cmap_q(list(palette.colors))(x)))
+
+    def test_generate_cmaps_batch_q(self):
+        cmaps = self.cure_colors.generate_cmaps_batch([['black'], ['#FF0000', 'blue']], kind='qualitative')
+        self.assertEqual(cmaps[0].N, 1)
+        self.assertTrue(np.array_equal(cmaps[1].colors, [[1, 0, 0, 1], [0, 0, 1, 1]]))
+        with self.assertRaises(ValueError):
+            self.cure_colors.generate_cmaps_batch([], kind='gorilla')
+
+    def test_get_by_name(self):
+        # 名前で呼ぶ
+        self.assertIsNotNone(self.cure_colors.get_by_name('キュアトゥインクル'), msg="cure_colors.get_by_name('キュアトゥインクル')")
+        # 存在しない場合はNone
+        self.assertIsNone(self.cure_colors.get_by_name('キュアゴリラ'), msg="cure_colors.get_by_name('キュアゴリラ')")
+
+    def test_get_by_name_normalized(self):
+        # 大文字・小文字、空白、全角・半角、ひらがな、ローマ字の違いは無視する
+        cmap = self.cure_colors.get_by_name('キュアトゥインクル')
+        for name in ['cure twinkle', 'CureTwinkle', 'ＣＵＲＥ　ＴＷＩＮＫＬＥ', 'ｷｭｱﾄｩｲﾝｸﾙ', 'きゅあとぅいんくる', 'kyua tsuinkuru']:
+            self.assertIs(self.cure_colors.get_by_name(name), cmap, msg=name)
+        self.assertIs(self.cure_colors.get_lut('cure twinkle'), self.cure_colors.get_lut('Cure Twinkle'))
+        # generate_cure_cmap で追加した配色も同じ
+        cmap = self.cure_colors.generate_cure_cmap(['red', 'blue'], ['マイレッド', 'My Red'])
+        for name in ['my red', 'MyRed', 'まいれっど']:
+            self.assertIs(self.cure_colors.get_by_name(name), cmap, msg=name)
+        self.assertIsNone(cure_colormap().get_by_name('my red'))
+
+    def test_search(self):
+        results = self.cure_colors.search('twinkle', k=3)
+        self.assertEqual(len(results), 3)
+        self.assertEqual(results[0][0], 'Cure Twinkle')
+        self.assertEqual(self.cure_colors.search('きゅあぶらっく', k=1), [('Cure Black', 1.0)])
+        # 似ていても別のプリキュアは get_by_name では返さない
+        self.assertIsNone(self.cure_colors.get_by_name('twinkle'))
+
+    def test_get_by_name_lazy(self):
+        # 呼ばれるまでカラーマップは生成しない
+        self.assertEqual(len(self.cure_colors.name_to_cmap._cmaps), 0)
+        # 一度生成したら使い回す。日本語名・英語名・属性で同じものを返す
+        cmap = self.cure_colors.get_by_name('キュアブラック')
+        self.assertIsInstance(cmap, LinearSegmentedColormap)
+        self.assertIs(cmap, self.cure_colors.get_by_name('Cure Black'))
+        self.assertIs(cmap, self.cure_colors.cure_black)
+        self.assertIsInstance(self.cure_colors.cure_cosmo, ListedColormap)
+        with self.assertRaises(AttributeError):
+            self.cure_colors.cure_gorilla
+
+    def test_get_by_name_variant(self):
+        # 組み合わせごとに一度だけ作る
+        banded = self.cure_colors.get_by_name('キュアブラック', n=7, reversed=True, kind='banded')
+        self.assertIsInstance(banded, ListedColormap)
+        self.assertEqual(banded.N, 7)
+        self.assertIs(banded, self.cure_colors.get_by_name('Cure Black', n=7, reversed=True, kind='banded'))
+        # グラデーションから両端を含めて等間隔に取り出し、逆に並べる
+        cmap = self.cure_colors.get_by_name('Cure Black')
+        self.assertTrue(np.array_equal(banded(np.arange(7)), cmap(np.linspace(1, 0, 7))))
+        # 段階数だけ変える
+        resampled = self.cure_colors.get_by_name('Cure Black', n=5)
+        self.assertIsInstance(resampled, LinearSegmentedColormap)
+        self.assertEqual(resampled.N, 5)
+        self.assertTrue(np.array_equal(self.cure_colors.get_by_name('Cure Black', reversed=True)(0.0), cmap(1.0)))
+        self.assertIsNone(self.cure_colors.get_by_name('キュアゴリラ', n=5))
+        with self.assertRaises(ValueError):
+            self.cure_colors.get_by_name('Cure Black', kind='gorilla')
+        # 段階数は1以上の整数
+        for n, kind in [(0, None), (-1, None), (-1, 'banded'), (2.5, None), (True, None), ('7', 'qualitative')]:
+            with self.assertRaises(ValueError):
+                self.cure_colors.get_by_name('Cure Black', n=n, kind=kind)
+        self.assertEqual(len(self.cure_colors.name_to_cmap._variants), 3)
+        self.assertEqual(self.cure_colors.get_by_name('Cure Black', n=np.int64(7), kind='banded').N, 7)
+
+    def test_get_by_name_variant_q(self):
+        # Qualitative は色を繰り返す。グラデーションにもできる
+        cosmo = self.cure_colors.get_by_name('Cure Cosmo')
+        cmap = self.cure_colors.get_by_name('Cure Cosmo', n=12)
+        self.assertEqual(cmap.N, 12)
+        self.assertTrue(np.array_equal(cmap.colors[cosmo.N:], cosmo.colors[:12 - cosmo.N]))
+        self.assertIsInstance(self.cure_colors.get_by_name('Cure Cosmo', kind='linear'), LinearSegmentedColormap)
+        # generate_cure_cmap で追加した配色も使える
+        self.cure_colors.generate_cure_cmap(['red', 'blue'], ['cure_tmp'], method=self.cure_colors.generate_cmap_q)
+        self.assertEqual(self.cure_colors.get_by_name('cure_tmp', n=3, kind='banded').N, 3)
+
+    def test_get_by_name_variant_lru(self):
+        self.cure_colors.name_to_cmap.max_variants = 2
+        first = self.cure_colors.get_by_name('Cure Black', n=3)
+        self.cure_colors.get_by_name('Cure Black', n=4)
+        self.cure_colors.get_by_name('Cure Black', n=3)
+        self.cure_colors.get_by_name('Cure Black', n=5)
+        # 最近使っていない n=4 が消える
+        self.assertEqual(len(self.cure_colors.name_to_cmap._variants), 2)
+        self.assertIs(self.cure_colors.get_by_name('Cure Black', n=3), first)
+        self.assertNotIn((self.cure_colors.name_to_cmap.palette('Cure Black'), 4, None, False),
+                         self.cure_colors.name_to_cmap._variants)
+
+    def test_shared_registry(self):
+        # 配色はインスタンス間で共有する
+        other = cure_colormap()
+        self.assertIs(other.title_to_characters, self.cure_colors.title_to_characters)
+        self.assertIs(other.name_to_cmap.palette('Cure Black'), self.cure_colors.name_to_cmap.palette('キュアブラック'))
+        self.assertIs(cure_colormap.default(), cure_colormap.default())
+        # generate_cure_cmap で追加した配色はそのインスタンスだけ
+        self.cure_colors.generate_cure_cmap(['black', 'white'], ['cure_tmp'])
+        self.assertIsNotNone(self.cure_colors.get_by_name('cure_tmp'))
+        self.assertIsNone(other.get_by_name('cure_tmp'))
+
+    def test_palette_record(self):
+        palette = self.cure_colors.name_to_cmap.palette('キュアコスモ')
+        self.assertEqual(palette.name, 'Cure Cosmo')
+        self.assertEqual(palette.title, 'Star Twinkle PreCure')
+        self.assertEqual(palette.kind, 'qualitative')
+        with self.assertRaises(AttributeError):
+            palette.extra = 1
+
+    def test_characters_of(self):
+        # 英語・日本語のタイトルどちらでも引ける
+        characters = ('Cure Black', 'Cure White')
+        self.assertEqual(self.cure_colors.characters_of('Futari wa Pretty Cure'), characters)
+        self.assertEqual(self.cure_colors.characters_of('ふたりはプリキュア'), characters)
+        self.assertIsNone(self.cure_colors.characters_of('*** PreCure'))
+
+    def test_title_of(self):
+        # 初めて登場した作品を返す。どの名称でも引ける
+        self.assertEqual(self.cure_colors.title_of('キュアブラック'), 'Futari wa Pretty Cure')
+        self.assertEqual(self.cure_colors.title_of('cure black'), 'Futari wa Pretty Cure')
+        self.assertEqual(self.cure_colors.titles_of('Cure Black'),
+                         ('Futari wa Pretty Cure', 'Futari wa Pretty Cure Max Heart'))
+        self.assertEqual(self.cure_colors.title_of('キュアエース'), 'DokiDoki! PreCure')
+        self.assertIsNone(self.cure_colors.title_of('キュアゴリラ'))
+
+    def test_title_index_consistent(self):
+        # 作品の登場プリキュアは、すべて名称から引ける
+        for title, names in self.cure_colors.title_to_characters.items():
+            for name in names:
+                self.assertIsNotNone(self.cure_colors.get_by_name(name), msg=name)
+                self.assertIn(title, self.cure_colors.titles_of(name))
+        # 日本語名と英語名は同じプリキュア
+        registry = precure_colormap.get_registry()
+        for palette in registry.entries:
+            self.assertEqual(len(set(registry.palettes[alias].name for alias in palette.aliases)), 1)
+
+    def test_cmaps_for_titles(self):
+        cmaps = self.cure_colors.cmaps_for_titles(['ふたりはプリキュア', 'Star Twinkle PreCure'])
+        self.assertEqual(list(cmaps), ['Futari wa Pretty Cure', 'Star Twinkle PreCure'])
+        self.assertEqual(list(cmaps['Futari wa Pretty Cure']), ['Cure Black', 'Cure White'])
+        self.assertIs(cmaps['Futari wa Pretty Cure']['Cure Black'], self.cure_colors.get_by_name('キュアブラック'))
+        self.assertIsInstance(cmaps['Star Twinkle PreCure']['Cure Cosmo'], ListedColormap)
+        # 省略した場合は全作品
+        self.assertEqual(list(self.cure_colors.cmaps_for_titles()), list(self.cure_colors.title_to_characters))
+        with self.assertRaises(KeyError):
+            self.cure_colors.cmaps_for_titles(['*** PreCure'])
+
+    def test_cmaps_for_titles_compact(self):
+        # まとめて生成したカラーマップを、弱参照のテーブルでも作り直さずに返す
+        compact = cure_colormap(compact=True)
+        with mock.patch.object(compact.name_to_cmap, '_build', side_effect=AssertionError('built one by one')):
+            cmaps = compact.cmaps_for_titles(['ふたりはプリキュア'])
+        black = cmaps['Futari wa Pretty Cure']['Cure Black']
+        self.assertIs(compact.name_to_cmap.cached(compact.name_to_cmap.palette('Cure Black')), black)
+        self.assertIs(compact.get_by_name('キュアブラック'), black)
+
+    def test_sample_colormap_all(self):
+        self.cure_colors.sample_colormap_all()
+
+    def test_sample_colormap_all_headless(self):
+        # 画像ファイルに保存する
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'all.png')
+            self.cure_colors.sample_colormap_all(path=path)
+            self.assertTrue(os.path.getsize(path) > 0)
+
+    def test_plot_palette_sheet(self):
+        titles = ['Futari wa Pretty Cure', '*** PreCure', 'Star Twinkle PreCure']
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fig = self.cure_colors.plot_palette_sheet(titles, path=os.path.join(tmpdir, 'sheet.png'), width=64)
+        # 軸は1つ、画像も1枚
+        self.assertEqual(len(fig.axes), 1)
+        self.assertEqual(len(fig.axes[0].images), 1)
+        # 作品名とプリキュアの行。知らない作品はスルー
+        labels = [label.get_text() for label in fig.axes[0].get_yticklabels()]
+        self.assertEqual(labels, ['Futari wa Pretty Cure', 'Cure Black', 'Cure White',
+                                  'Star Twinkle PreCure', 'Cure Star', 'Cure Milky', 'Cure Soleil', 'Cure Selene', 'Cure Cosmo'])
+        self.assertEqual(fig.axes[0].images[0].get_array().shape, (9, 64, 4))
+
+    def test_sample_colormap_by_title_empty(self):
+        # 表示なし
+        self.cure_colors.sample_colormap_by_title([])
+
+    def test_sample_colormap_by_title_invalid(self):
+        # 知らない作品はスルー
+        self.cure_colors.sample_colormap_by_title(['*** PreCure'])
+
+    def test_sample_colormap_by_title(self):
+        # 指定した作品のカラーマップを表示
+        self.cure_colors.sample_colormap_by_title(['Futari wa Pretty Cure', 'Futari wa Pretty Cure Max Heart'])
+
+
+class test_lut(unittest.TestCase) :
+    def setUp(self):
+        self.cure_colors = cure_colormap()
+        rng = np.random.default_rng(0)
+        self.data = rng.normal(size=(64, 48))
+        self.data[0, 0] = np.nan
+
+    def assert_same_as_cmap(self, name, data, vmin, vmax):
+
+        cmap = self.cure_colors.get_by_name(name)
+        expected = cmap(Normalize(vmin, vmax)(data), bytes=True)
+        self.assertTrue(np.array_equal(self.cure_colors.colorize(name, data, vmin, vmax), expected), msg=name)
+
+    def test_get_lut(self):
+        lut = self.cure_colors.get_lut('キュアブラック')
+        self.assertEqual(lut.shape, (256, 4))
+        self.assertEqual(lut.dtype, np.uint8)
+        self.assertIs(lut, self.cure_colors.get_lut('Cure Black'))
+        self.assertEqual(self.cure_colors.get_lut('Cure Black', 16).shape, (16, 4))
+        # Listed なカラーマップは色数ぶん
+        self.assertEqual(self.cure_colors.get_lut('キュアコスモ').shape, (8, 4))
+        self.assertIsNone(self.cure_colors.get_lut('キュアゴリラ'))
+
+    def test_colorize_linear(self):
+        self.assert_same_as_cmap('キュアトゥインクル', self.data, -2, 2)
+        self.assert_same_as_cmap('キュアトゥインクル', self.data.astype(np.float32), -1, 3)
+
+    def test_colorize_qualitative(self):
+        self.assert_same_as_cmap('キュアコスモ', self.data, -2, 2)
+
+    def test_apply_lut_out(self):
+        lut = self.cure_colors.get_lut('Cure Twinkle')
+        out = np.zeros(self.data.shape + (4,), dtype=np.uint8)
+        result = precure_colormap.apply_lut(lut, self.data, -2, 2, out=out)
+        self.assertIs(result, out)
+        # NaN は透明、範囲外は両端の色
+        self.assertTrue(np.array_equal(out[0, 0], [0, 0, 0, 0]))
+        edges = precure_colormap.apply_lut(lut, np.array([-100.0, 100.0]), -2, 2)
+        self.assertTrue(np.array_equal(edges, lut[[0, -1]]))
+        with self.assertRaises(ValueError):
+            precure_colormap.apply_lut(lut, self.data, out=np.zeros((2, 2, 4), dtype=np.uint8))
+
+    def test_apply_lut_masked(self):
+        lut = self.cure_colors.get_lut('Cure Twinkle')
+        data = np.ma.masked_less(np.arange(4.0), 1)
+        rgba = precure_colormap.apply_lut(lut, data, 0, 3)
+        self.assertTrue(np.array_equal(rgba[0], [0, 0, 0, 0]))
+        self.assertTrue(np.array_equal(rgba[-1], lut[-1]))
+        # 範囲を省略したときは、マスクした値 (欠測の印など) を範囲に含めない
+        from matplotlib.colors import Normalize
+        data = np.ma.masked_equal([-9999.0, 0.0, 1.0, 2.0], -9999)
+        cmap = self.cure_colors.get_by_name('Cure Twinkle')
+        expected = cmap(Normalize()(data), bytes=True)
+        expected[0] = 0
+        self.assertTrue(np.array_equal(precure_colormap.apply_lut(lut, data), expected))
+        self.assertTrue(np.array_equal(self.cure_colors.colorize('Cure Twinkle', data), expected))
+
+    def test_colors_for_categories(self):
+        cosmo = np.asarray(self.cure_colors.get_by_name('キュアコスモ', kind='qualitative').colors)
+        labels = np.array(['b', 'a', 'c', 'a'])
+        rgba, categories = self.cure_colors.colors_for_categories(labels, 'キュアコスモ', return_categories=True)
+        self.assertEqual(list(categories), ['a', 'b', 'c'])
+        self.assertTrue(np.array_equal(rgba, cosmo[[1, 0, 2, 0]]))
+        # 色より多いカテゴリは色を繰り返す。欠損値は透明
+        labels = np.array([0.0, 9.0, np.nan, 17.0])
+        rgba = self.cure_colors.colors_for_categories(labels, 'Cure Cosmo', bytes=True)
+        self.assertEqual(rgba.dtype, np.uint8)
+        self.assertTrue(np.array_equal(rgba[[0, 1, 3]], np.round(cosmo[[0, 1, 2]] * 255)))
+        self.assertTrue(np.array_equal(rgba[2], [0, 0, 0, 0]))
+        codes, categories = precure_colormap.factorize(np.arange(20) % 11)
+        self.assertTrue(np.array_equal(self.cure_colors.colors_for_categories(np.arange(20) % 11, 'キュアコスモ'),
+                                       cosmo[codes % len(cosmo)]))
+        with self.assertRaises(KeyError):
+            self.cure_colors.colors_for_categories(labels, 'キュアゴリラ')
+
+    def test_factorize_without_pandas(self):
+        with mock.patch.dict(sys.modules, {'pandas': None}):
+            codes, categories = precure_colormap.factorize(np.array(['b', 'a', 'c', 'a']))
+            self.assertEqual(list(codes), [1, 0, 2, 0])
+            self.assertEqual(list(categories), ['a', 'b', 'c'])
+            # None と NaN は -1。並べ替えられない値は出てきた順
+            codes, categories = precure_colormap.factorize(['setosa', None, 'virginica', float('nan'), 'setosa'])
+            self.assertEqual(list(codes), [0, -1, 1, -1, 0])
+            self.assertEqual(list(categories), ['setosa', 'virginica'])
+            codes, categories = precure_colormap.factorize(np.array(['b', 1, None, 'b', 0.5], dtype=object))
+            self.assertEqual(list(codes), [0, 1, -1, 0, 2])
+            self.assertEqual(list(categories), ['b', 1, 0.5])
+            rgba = self.cure_colors.colors_for_categories(np.array(['x', None, 'y'], dtype=object), 'キュアコスモ')
+            self.assertTrue(np.array_equal(rgba[1], [0, 0, 0, 0]))
+
+    def test_colors_for_categories_pandas(self):
+        try:
+            import pandas as pd
+        except ImportError:
+            self.skipTest('pandas is not installed')
+        species = pd.Series(['setosa', 'virginica', None, 'versicolor', 'setosa'])
+        expected = self.cure_colors.colors_for_categories(np.array(['setosa', 'virginica', 'x', 'versicolor', 'setosa']),
+                                                          'キュアコスモ')
+        rgba = self.cure_colors.colors_for_categories(species, 'キュアコスモ')
+        self.assertTrue(np.array_equal(rgba[[0, 1, 3, 4]], expected[[0, 1, 3, 4]]))
+        self.assertTrue(np.array_equal(rgba[2], [0, 0, 0, 0]))
+        # Categorical はカテゴリの順番で色を割り当てる (使われていないカテゴリも数える)
+        categorical = species.astype(pd.CategoricalDtype(['virginica', 'unused', 'setosa', 'versicolor']))
+        rgba, categories = self.cure_colors.colors_for_categories(categorical, 'キュアコスモ', return_categories=True)
+        cosmo = np.asarray(self.cure_colors.get_by_name('キュアコスモ', kind='qualitative').colors)
+        self.assertEqual(list(categories), ['virginica', 'unused', 'setosa', 'versicolor'])
+        self.assertTrue(np.array_equal(rgba[[0, 1, 3]], cosmo[[2, 0, 3]]))
+
+    def test_colors_for_categories_scatter(self):
+        import matplotlib.pyplot as plt
+        labels = np.arange(30) % 4
+        rgba = self.cure_colors.colors_for_categories(labels, 'キュアコスモ')
+        fig, ax = plt.subplots()
+        try:
+            collection = ax.scatter(np.arange(30), np.arange(30), c=rgba)
+            self.assertTrue(np.array_equal(collection.get_facecolors(), rgba))
+        finally:
+            plt.close(fig)
+
+    def test_palette_store(self):
+        registry = precure_colormap.get_registry()
+        store = precure_colormap.get_palette_store()
+        self.assertIs(store, precure_colormap.get_palette_store(registry))
+        self.assertEqual(store.rgb.shape, (sum(len(palette.rgb) for palette in registry.entries), 3))
+        for palette in registry.entries:
+            self.assertTrue(np.array_equal(store.colors(palette), palette.rgb), msg=palette.name)
+            self.assertTrue(np.array_equal(store.lut(palette), self.cure_colors.get_lut(palette.name)), msg=palette.name)
+            # 詰めた配列のビューを返す
+            self.assertIs(store.lut(palette).base, store.luts)
+
+    def test_compact(self):
+        import gc
+        compact = cure_colormap(compact=True)
+        for name in ['キュアブラック', 'キュアコスモ']:
+            self.assertTrue(np.array_equal(compact.get_lut(name), self.cure_colors.get_lut(name)))
+            self.assertTrue(np.array_equal(compact.get_lut(name, 9), self.cure_colors.get_lut(name, 9)))
+            for n in [0, -1]:
+                for cure_colors in [compact, self.cure_colors]:
+                    with self.assertRaises(ValueError):
+                        cure_colors.get_lut(name, n)
+            self.assertTrue(np.array_equal(compact.colorize(name, self.data, -2, 2),
+                                           self.cure_colors.colorize(name, self.data, -2, 2)))
+        # Colormap は使われている間だけ持つ
+        cmap = compact.get_by_name('キュアブラック')
+        self.assertIs(compact.cure_black, cmap)
+        self.assertTrue(np.array_equal(cmap(0.5, bytes=True), self.cure_colors.cure_black(0.5, bytes=True)))
+        del cmap
+        gc.collect()
+        self.assertEqual(len(compact.name_to_cmap._cmaps), 0)
+        # generate_cure_cmap で追加したカラーマップは持っておく
+        cmap = compact.generate_cure_cmap(['red', 'blue'], ['Cure Gorilla'])
+        del cmap
+        gc.collect()
+        self.assertIsNotNone(compact.get_lut('Cure Gorilla'))
+        self.assertIsInstance(compact.get_by_name('Cure Gorilla'), LinearSegmentedColormap)
+        # 変えたカラーマップも、少しだけ取っておく
+        self.assertIs(compact.get_by_name('Cure Black', n=7), compact.get_by_name('Cure Black', n=7))
+        for n in range(2, precure_colormap.COMPACT_VARIANT_CACHE_SIZE + 10):
+            compact.get_by_name('Cure Black', n=n)
+        self.assertEqual(len(compact.name_to_cmap._variants), precure_colormap.COMPACT_VARIANT_CACHE_SIZE)
+
+    def test_memory_report(self):
+        for name in ['キュアブラック', 'キュアホワイト']:
+            self.cure_colors.get_by_name(name)(0.5)
+            self.cure_colors.get_lut(name)
+        report = self.cure_colors.memory_report()
+        self.assertEqual(set(report), {'palettes', 'palette_store', 'colormaps', 'colormap_luts', 'luts', 'variants',
+                                       'total'})
+        self.assertEqual(report['total'], sum(value for key, value in report.items() if key != 'total'))
+        self.assertEqual(report['colormap_luts'], 2 * 259 * 4 * 8)
+        self.assertEqual(report['luts'], 2 * 256 * 4)
+
+        compact = cure_colormap(compact=True)
+        for name in ['キュアブラック', 'キュアホワイト']:
+            compact.get_lut(name)
+        report = compact.memory_report()
+        self.assertEqual((report['colormaps'], report['colormap_luts'], report['luts']), (0, 0, 0))
+        self.assertEqual(report['palette_store'], precure_colormap.get_palette_store().nbytes)
+
+
+
+class test_swatch_cache(unittest.TestCase) :
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache = precure_colormap.set_swatch_cache(os.path.join(self.tmpdir.name, 'swatches'))
+        self.cure_colors = cure_colormap()
+
+    def tearDown(self):
+        precure_colormap.set_swatch_cache(None)
+        self.tmpdir.cleanup()
+
+    def count_files(self):
+        return len(os.listdir(self.cache.directory))
+
+    def test_get_swatch(self):
+        swatch = self.cure_colors.get_swatch('キュアトゥインクル', 128, 4)
+        self.assertEqual(swatch.shape, (4, 128, 4))
+        self.assertTrue(np.array_equal(swatch[0], self.cure_colors.get_lut('Cure Twinkle', 128)))
+        self.assertEqual(self.count_files(), 1)
+        # 2回目はキャッシュから読む。別名でも同じキー
+        self.assertTrue(np.array_equal(self.cure_colors.get_swatch('Cure Twinkle', 128, 4), swatch))
+        self.assertEqual(self.count_files(), 1)
+        # 大きさが違えば別のキー
+        self.cure_colors.get_swatch('Cure Twinkle', 64, 4)
+        self.assertEqual(self.count_files(), 2)
+        self.assertIsNone(self.cure_colors.get_swatch('キュアゴリラ'))
+
+    def test_key(self):
+        # 透明度だけが違う配色も別のキー
+        opaque = cure_palette('Cure Red', ('Cure Red',), ('#FF0000', '#0000FF'))
+        translucent = cure_palette('Cure Red', ('Cure Red',), ('#FF000080', '#0000FF'))
+        self.assertNotEqual(self.cache.key(opaque, 256, 1), self.cache.key(translucent, 256, 1))
+        self.assertEqual(self.cache.key(opaque, 256, 1), self.cache.key(cure_palette('Red', (), ('red', 'blue')), 256, 1))
+        self.assertNotEqual(self.cache.key(opaque, 256, 1),
+                            self.cache.key(cure_palette('Cure Red', (), ('#FF0000', '#0000FF'), kind='qualitative'), 256, 1))
+
+    def test_eviction(self):
+        # 上限を超えたら、最後に使ってから時間が経ったものから消す
+        self.cache.max_bytes = 1
+        self.cure_colors.get_swatch('Cure Black')
+        self.cure_colors.get_swatch('Cure White')
+        self.assertEqual(self.count_files(), 0)
+
+        self.cache.max_bytes = 10 ** 9
+        for i, name in enumerate(['Cure Black', 'Cure White', 'Cure Bloom']):
+            self.cure_colors.get_swatch(name)
+            path = self.cache.path(self.cache.key(self.cure_colors.name_to_cmap.palette(name), 256, 1))
+            os.utime(path, (i, i))
+        # Cure Black を使うと、一番古いのは Cure White になる
+        self.cure_colors.get_swatch('Cure Black')
+        sizes = sorted(os.path.getsize(e.path) for e in os.scandir(self.cache.directory))
+        self.cache.max_bytes = sum(sizes) - 1
+        self.cache.evict()
+        self.assertIsNone(self.cache.get(self.cache.key(self.cure_colors.name_to_cmap.palette('Cure White'), 256, 1)))
+        self.assertIsNotNone(self.cache.get(self.cache.key(self.cure_colors.name_to_cmap.palette('Cure Black'), 256, 1)))
+
+    def test_eviction_scan(self):
+        # 合計が上限以下のあいだは、最初の1回しかディレクトリを調べない
+        with mock.patch('precure_colormap.os.scandir', wraps=os.scandir) as scandir:
+            for name in ['Cure Black', 'Cure White', 'Cure Bloom']:
+                self.cure_colors.get_swatch(name)
+            self.assertEqual(scandir.call_count, 1)
+            # 同じキーを書き直しても合計は増えない
+            swatch = self.cure_colors.get_swatch('Cure Black')
+            self.cache.put(self.cache.key(self.cure_colors.name_to_cmap.palette('Cure Black'), 256, 1), swatch)
+            self.assertEqual(scandir.call_count, 1)
+        self.assertEqual(self.cache._total, sum(os.path.getsize(e.path) for e in os.scandir(self.cache.directory)))
+
+        # 上限を超えたら調べ直して消す
+        self.cache.max_bytes = self.cache._total
+        with mock.patch('precure_colormap.os.scandir', wraps=os.scandir) as scandir:
+            self.cure_colors.get_swatch('Cure Egret')
+            self.assertEqual(scandir.call_count, 1)
+        self.assertLess(self.count_files(), 4)
+        self.assertLessEqual(self.cache._total, self.cache.max_bytes)
+        self.assertEqual(self.cache._total, sum(os.path.getsize(e.path) for e in os.scandir(self.cache.directory)))
+
+    def test_save_swatch(self):
+        path = os.path.join(self.tmpdir.name, 'twinkle.png')
+        self.cure_colors.save_swatch('キュアトゥインクル', path, 32, 8)
+        from PIL import Image
+        with Image.open(path) as image:
+            self.assertEqual(image.size, (32, 8))
+
+        # キャッシュのファイルが消えていても保存できる
+        self.cache.max_bytes = 1
+        os.remove(path)
+        self.cure_colors.save_swatch('Cure Black', path, 32, 8)
+        self.assertEqual(self.count_files(), 0)
+        with Image.open(path) as image:
+            self.assertTrue(np.array_equal(np.asarray(image.convert('RGBA'))[0], self.cure_colors.get_lut('Cure Black', 32)))
+
+    def test_sample_colormap_by_title_cached(self):
+        self.cure_colors.sample_colormap_by_title(['Futari wa Pretty Cure'])
+        self.assertEqual(self.count_files(), 2)
+
+
+
+class test_catalog(unittest.TestCase) :
+    def setUp(self):
+        self.registry = precure_colormap.get_registry()
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        # 追加したカタログを元に戻す
+        precure_colormap._registry = self.registry
+        self.tmpdir.cleanup()
+
+    def write_catalog(self, catalog):
+        path = os.path.join(self.tmpdir.name, 'user_palettes.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(catalog, f, ensure_ascii=False)
+        return path
+
+    def test_compiled_catalog_is_up_to_date(self):
+        # コンパイル済みのバイナリが JSON と一致していること
+        from_json = precure_colormap.read_catalog(precure_colormap.CATALOG_JSON)
+        from_bin = precure_colormap.read_catalog(precure_colormap.CATALOG_BIN)
+        self.assertEqual([e.aliases for e in from_json.entries], [e.aliases for e in from_bin.entries])
+        for a, b in zip(from_json.entries, from_bin.entries):
+            self.assertTrue(np.array_equal(a.rgb, b.rgb), msg=a.name)
+            self.assertEqual((a.kind, a.title, a.attribute), (b.kind, b.title, b.attribute))
+        self.assertEqual(dict(from_json.title_to_characters), dict(from_bin.title_to_characters))
+
+    def test_read_catalog_mmap(self):
+        registry = precure_colormap.read_catalog(precure_colormap.CATALOG_BIN)
+        self.assertIsInstance(registry.palettes['Cure Black'].rgb, np.memmap)
+        self.assertEqual(registry.palettes['Cure Black'].colors[0], '#00072a')
+
+    def test_load_catalog(self):
+        path = self.write_catalog({
+            'titles': [{'title': 'Delicious Party PreCure', 'characters': ['Cure Precious']}],
+            'palettes': [{'attribute': 'cure_precious', 'names': ['キュアプレシャス', 'Cure Precious'],
+                          'kind': 'linear', 'colors': ['#E4007F', 'white', '#FFE600']}],
+        })
+        # バイナリにコンパイルしても読める
+        for catalog in [path, precure_colormap.compile_catalog(path)]:
+            precure_colormap.load_catalog(catalog)
+            cure_colors = cure_colormap()
+            self.assertIsInstance(cure_colors.get_by_name('キュアプレシャス'), LinearSegmentedColormap)
+            self.assertIs(cure_colors.cure_precious, cure_colors.get_by_name('Cure Precious'))
+            self.assertEqual(cure_colors.title_to_characters['Delicious Party PreCure'], ('Cure Precious',))
+            # 組み込みの配色はそのまま
+            self.assertIsNotNone(cure_colors.get_by_name('キュアトゥインクル'))
+            precure_colormap._registry = self.registry
+
+    def test_load_catalog_unknown_character(self):
+        # 配色のないプリキュアを作品に登録しようとするとエラー
+        path = self.write_catalog({
+            'titles': [{'title': 'Gorilla PreCure', 'characters': ['Cure Gorilla']}],
+            'palettes': [],
+        })
+        with self.assertRaises(ValueError):
+            precure_colormap.load_catalog(path)
+        self.assertIs(precure_colormap.get_registry(), self.registry)
+
+    def test_load_catalog_name_collision(self):
+        # ほかの配色の名称・属性名を使う配色はエラー
+        for palette in [{'names': ['キュアブラック', 'My Black'], 'colors': ['black', 'white']},
+                        {'names': ['My White'], 'attribute': 'cure_white', 'colors': ['white', 'black']}]:
+            with self.assertRaises(ValueError):
+                precure_colormap.load_catalog(self.write_catalog({'titles': [], 'palettes': [palette]}))
+            self.assertIs(precure_colormap.get_registry(), self.registry)
+
+    def test_replace_palettes(self):
+        black = self.registry.palettes['Cure Black']
+        precious = cure_palette('Cure Precious', ('キュアプレシャス', 'Cure Precious'), ('#E4007F', 'white'))
+        black2 = cure_palette('Cure Black', black.aliases, ('black', 'red'), black.title, attribute=black.attribute)
+        replaced = precure_colormap.replace_palettes([precious, black2], remove=['Cure White'])
+        self.assertEqual(replaced, {'Cure Black': black, 'Cure White': self.registry.palettes['Cure White']})
+        registry = precure_colormap.get_registry()
+        self.assertEqual(registry.version, self.registry.version + 1)
+        self.assertIs(registry.palettes['キュアプレシャス'], precious)
+        self.assertIs(registry.attributes['cure_black'], black2)
+        self.assertNotIn('Cure White', registry.palettes)
+
+        # 登録できない配色があれば何も変えない
+        bad = [cure_palette('My Black', ('キュアブラック', 'My Black'), ('black', 'white')),
+               cure_palette('Cure Gorilla', ('Cure Gorilla',), ('gorilla',))]
+        self.assertEqual(set(precure_colormap.check_palettes(bad + [precious])), {'My Black', 'Cure Gorilla'})
+        with self.assertRaises(ValueError):
+            precure_colormap.replace_palettes(bad)
+        self.assertIs(precure_colormap.get_registry(), registry)
+
+    def test_load_catalog_japanese_title(self):
+        path = self.write_catalog({
+            'titles': [{'title': 'Delicious Party PreCure', 'title_ja': 'デリシャスパーティ♡プリキュア',
+                        'characters': ['キュアプレシャス']}],
+            'palettes': [{'names': ['キュアプレシャス', 'Cure Precious'], 'colors': ['#E4007F', 'white']}],
+        })
+        precure_colormap.load_catalog(path)
+        cure_colors = cure_colormap()
+        self.assertEqual(cure_colors.characters_of('デリシャスパーティ♡プリキュア'), ('Cure Precious',))
+        self.assertEqual(cure_colors.title_of('Cure Precious'), 'Delicious Party PreCure')
+
+    def test_load_catalog_invalid_kind(self):
+        path = self.write_catalog({
+            'titles': [],
+            'palettes': [{'names': ['Cure Gorilla'], 'kind': 'gorilla', 'colors': ['black', 'white']}],
+        })
+        with self.assertRaises(ValueError):
+            precure_colormap.load_catalog(path)
+
+    def test_register_palette(self):
+        cure_colors = cure_colormap()
+        black = cure_colors.get_by_name('Cure Black')
+        black_lut = cure_colors.get_lut('Cure Black')
+
+        palette = precure_colormap.register_palette('Cure Precious', ['#E4007F', 'white'], aliases=['キュアプレシャス'],
+                                                    attribute='cure_precious')
+        self.assertEqual(palette.aliases, ('キュアプレシャス', 'Cure Precious'))
+        self.assertIsInstance(cure_colors.get_by_name('きゅあぷれしゃす'), LinearSegmentedColormap)
+        self.assertIs(cure_colors.cure_precious, cure_colors.get_by_name('Cure Precious'))
+        # ほかの配色のカラーマップと LUT はそのまま使う
+        self.assertIs(cure_colors.get_by_name('Cure Black'), black)
+        self.assertIs(cure_colors.get_lut('Cure Black'), black_lut)
+
+        with self.assertRaises(ValueError):
+            precure_colormap.register_palette('Cure Precious', ['black'])
+        with self.assertRaises(ValueError):
+            precure_colormap.register_palette('Cure Gorilla', ['gorilla'])
+        with self.assertRaises(ValueError):
+            precure_colormap.register_palette('Cure Gorilla', ['black'], kind='gorilla')
+        self.assertIsNone(cure_colors.get_by_name('Cure Gorilla'))
+
+    def test_update_palette(self):
+        cure_colors = cure_colormap()
+        black = cure_colors.get_by_name('キュアブラック')
+        white = cure_colors.get_by_name('キュアホワイト')
+        cure_colors.get_lut('キュアブラック')
+        cure_colors.get_by_name('キュアブラック', n=5)
+
+        palette = precure_colormap.update_palette('キュアブラック', colors=['#000000', '#FF69B4'])
+        self.assertEqual((palette.name, palette.aliases), ('Cure Black', ('キュアブラック', 'Cure Black')))
+        self.assertEqual(palette.title, 'Futari wa Pretty Cure')
+        # 置き換えた配色のカラーマップだけを作り直す
+        self.assertIsNot(cure_colors.get_by_name('キュアブラック'), black)
+        self.assertIs(cure_colors.get_by_name('キュアホワイト'), white)
+        self.assertTrue(np.array_equal(cure_colors.get_lut('Cure Black')[-1], [255, 105, 180, 255]))
+        self.assertTrue(np.array_equal(cure_colors.get_by_name('Cure Black', n=5)(1.0, bytes=True), [255, 105, 180, 255]))
+        self.assertIs(cure_colors.cure_black, cure_colors.get_by_name('キュアブラック'))
+        self.assertEqual(cure_colors.characters_of('Futari wa Pretty Cure'), ('Cure Black', 'Cure White'))
+
+        # 色以外だけを変えることもできる
+        self.assertEqual(precure_colormap.update_palette('Cure Black', kind='qualitative').colors, ('#000000', '#FF69B4'))
+        with self.assertRaises(KeyError):
+            precure_colormap.update_palette('Cure Gorilla', colors=['black'])
+        # ほかの配色の名称・属性名は使えない
+        with self.assertRaises(ValueError):
+            precure_colormap.update_palette('Cure Black', aliases=['キュアホワイト'])
+        with self.assertRaises(ValueError):
+            precure_colormap.update_palette('Cure Black', attribute='cure_white')
+        self.assertEqual(precure_colormap.get_registry().palettes['キュアホワイト'].name, 'Cure White')
+
+    def testregistry_cache(self):
+        # レジストリが変わったときだけ作り直す
+        built = []
+
+        class value :
+            def __init__(self, registry):
+                self.registry = registry
+                built.append(registry)
+
+        cache = precure_colormap.registry_cache(value)
+        registry = precure_colormap.get_registry()
+        self.assertIsNone(cache.peek(registry))
+        first = cache.get()
+        self.assertIs(cache.get(registry), first)
+        self.assertIs(cache.peek(registry), first)
+        precure_colormap.update_palette('Cure Black', colors=['#000000', '#FF69B4'])
+        self.assertIsNone(cache.peek(precure_colormap.get_registry()))
+        self.assertIsNot(cache.get(), first)
+        self.assertEqual(built, [registry, precure_colormap.get_registry()])
+
+    def test_unregister_palette(self):
+        cure_colors = cure_colormap()
+        white = cure_colors.get_by_name('Cure White')
+        palette = precure_colormap.unregister_palette('キュアブラック')
+        self.assertEqual(palette.name, 'Cure Black')
+        self.assertIsNone(cure_colors.get_by_name('Cure Black'))
+        self.assertNotIn('Cure Black', cure_colors.name_to_cmap)
+        self.assertEqual(cure_colors.characters_of('Futari wa Pretty Cure'), ('Cure White',))
+        self.assertIs(cure_colors.get_by_name('Cure White'), white)
+        with self.assertRaises(AttributeError):
+            cure_colors.cure_black
+        with self.assertRaises(KeyError):
+            precure_colormap.unregister_palette('Cure Black')
+
+
+
+
+#########################################################
+#                                                       #
+# import 時間のベンチマーク                               #
+#                                                       #
+#########################################################
+
+# import precure_colormap にかけてよい時間 [秒]
+# 環境変数 PRECURE_IMPORT_BUDGET で上書きできる
+IMPORT_TIME_BUDGET = float(os.environ.get('PRECURE_IMPORT_BUDGET', '1.0'))
+
+# import 時に読み込んではいけない重いモジュール
+HEAVY_MODULES = ['seaborn', 'pandas', 'matplotlib.pyplot']
+
+IMPORT_SCRIPT = """
+import sys, time
+t = time.perf_counter()
+import precure_colormap
+print(time.perf_counter() - t)
+print(','.join(m for m in sys.argv[1:] if m in sys.modules))
+"""
+
+class test_import_time(unittest.TestCase) :
+    def run_import(self):
+        # 毎回まっさらなプロセスで import する
+        result = subprocess.run([sys.executable, '-c', IMPORT_SCRIPT] + HEAVY_MODULES,
+                                cwd=os.path.dirname(os.path.abspath(__file__)),
+                                capture_output=True, text=True, check=True)
+        elapsed, loaded = result.stdout.splitlines()
+        return float(elapsed), loaded
+
+    def test_import_time(self):
+        # ばらつきがあるので3回のうち最速で判定する
+        runs = [self.run_import() for _ in range(3)]
+        elapsed = min(t for t, _ in runs)
+        self.assertLess(elapsed, IMPORT_TIME_BUDGET,
+                        msg='import precure_colormap took {:.3f}s (budget {:.3f}s)'.format(elapsed, IMPORT_TIME_BUDGET))
+
+    def test_import_no_heavy_modules(self):
+        _, loaded = self.run_import()
+        self.assertEqual(loaded, '', msg='loaded at import: ' + loaded)
+
+
+
+
+#########################################################
+#                                                       #
+# main                                                  #
+#                                                       #
+#########################################################
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
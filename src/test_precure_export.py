@@ -0,0 +1,102 @@
+#########################################################
+#                                                       #
+# test_precure_export.py                                #
+#                                                       #
+# precure_export のテスト                                #
+#                                                       #
+#########################################################
+
+
+import csv
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+import precure_colormap
+import precure_export
+from precure_colormap import cure_colormap
+
+
+
+class test_export(unittest.TestCase) :
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cure_colors = cure_colormap()
+        self.entries = precure_colormap.get_registry().entries
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_palettes_to_luts(self):
+        # まとめて作っても、カラーマップから1つずつ作った LUT と同じ
+        for n in [256, 7]:
+            luts = precure_colormap.palettes_to_luts(self.entries, n)
+            self.assertEqual(luts.shape, (len(self.entries), n, 4))
+            for palette, lut in zip(self.entries, luts):
+                self.assertTrue(np.array_equal(lut, self.cure_colors.get_lut(palette.name, n)), msg=palette.name)
+
+    def test_export_catalog(self):
+        paths = precure_export.export_catalog(self.tmpdir.name)
+        self.assertEqual(sorted(paths), sorted(precure_export.EXPORT_FORMATS))
+        names = [palette.name for palette in self.entries]
+        black = names.index('Cure Black')
+        expected = self.cure_colors.get_lut('Cure Black', 256)
+
+        luts = np.load(paths['npy'])
+        self.assertEqual(luts.shape, (len(names), 256, 4))
+        self.assertTrue(np.array_equal(luts[black], expected))
+        with open(os.path.join(self.tmpdir.name, precure_export.NAMES_FILENAME), encoding='utf-8') as f:
+            self.assertEqual(f.read().splitlines(), names)
+
+        with np.load(paths['npz']) as npz:
+            self.assertEqual(list(npz['names']), names)
+            self.assertTrue(np.array_equal(npz['luts'], luts))
+
+        with open(paths['csv'], encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual(len(rows), len(names) * 256)
+        row = rows[black * 256 + 100]
+        self.assertEqual(row['name'], 'Cure Black')
+        self.assertEqual([int(row[c]) for c in 'rgba'], expected[100].tolist())
+
+        with open(paths['json'], encoding='utf-8') as f:
+            catalog = json.load(f)
+        self.assertEqual(catalog['palettes'][black]['aliases'], ['キュアブラック', 'Cure Black'])
+        self.assertEqual(catalog['palettes'][black]['lut'], expected.tolist())
+
+        with open(paths['css'], encoding='utf-8') as f:
+            css = f.read()
+        self.assertIn('.precure-cure-black { background-image: linear-gradient(to right, #00072a 0%', css)
+
+        from PIL import Image
+        with Image.open(paths['png']) as image:
+            self.assertTrue(np.array_equal(np.asarray(image), luts))
+
+    def test_export_catalog_invalid(self):
+        with self.assertRaises(ValueError):
+            precure_export.export_catalog(self.tmpdir.name, ['gif'])
+
+    def test_main(self):
+        # python -m precure_colormap export
+        cwd = os.path.dirname(os.path.abspath(__file__))
+        subprocess.run([sys.executable, '-m', 'precure_colormap', 'export', '-o', self.tmpdir.name, '-f', 'npy,css',
+                        '-n', '16'], cwd=cwd, check=True, capture_output=True)
+        self.assertEqual(np.load(os.path.join(self.tmpdir.name, 'precure_luts.npy')).shape[1:], (16, 4))
+        self.assertTrue(os.path.exists(os.path.join(self.tmpdir.name, 'precure_gradients.css')))
+        self.assertFalse(os.path.exists(os.path.join(self.tmpdir.name, 'precure_luts.csv')))
+
+
+
+#########################################################
+#                                                       #
+# main                                                  #
+#                                                       #
+#########################################################
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
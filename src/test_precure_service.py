@@ -0,0 +1,270 @@
+#########################################################
+#                                                       #
+# test_precure_service.py                               #
+#                                                       #
+# precure_service と precure_client のテスト              #
+#                                                       #
+#########################################################
+
+
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+
+import numpy as np
+
+import precure_client
+import precure_colormap
+import precure_service
+from precure_colormap import cure_colormap
+
+
+
+class _server_thread :
+    # 別スレッドのイベントループでサービスを動かす
+    def __init__(self, service, **address):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.server = asyncio.run_coroutine_threadsafe(service.start(**address), self.loop).result()
+
+    @property
+    def port(self):
+        return self.server.sockets[0].getsockname()[1]
+
+    def stop(self):
+        async def close():
+            self.server.close()
+            await self.server.wait_closed()
+        asyncio.run_coroutine_threadsafe(close(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+
+class test_service(unittest.TestCase) :
+    @classmethod
+    def setUpClass(cls):
+        cls.cure_colors = cure_colormap()
+        cls.service = precure_service.cure_service(cls.cure_colors)
+
+    def get(self, target, headers=None):
+        return self.service.handle('GET', target, headers)
+
+    def test_palettes(self):
+        status, headers, body = self.get('/palettes/%E3%82%AD%E3%83%A5%E3%82%A2%E3%83%96%E3%83%A9%E3%83%83%E3%82%AF')
+        self.assertEqual(status, 200)
+        self.assertTrue(headers['Content-Type'].startswith('application/json'))
+        record = json.loads(body)
+        self.assertEqual(record['name'], 'Cure Black')
+        self.assertEqual(record['titles'][0], self.cure_colors.title_of('Cure Black'))
+        # 正規化した名称と属性名でも引ける
+        self.assertEqual(json.loads(self.get('/palettes/cure%20black')[2]), record)
+        self.assertEqual(json.loads(self.get('/palettes/cure_black')[2]), record)
+        self.assertEqual(len(json.loads(self.get('/palettes')[2])), len(precure_colormap.get_registry().entries))
+
+    def test_lut(self):
+        for name in ['Cure Black', 'キュアスター', 'Cure Ace', 'キュアコスモ']:
+            status, headers, body = self.get('/lut/' + name)
+            self.assertEqual(status, 200)
+            self.assertEqual(headers['Content-Type'], 'application/octet-stream')
+            self.assertEqual(body, self.cure_colors.get_lut(name).tobytes())
+            self.assertEqual(self.get('/lut/{}?n=7'.format(name))[2], self.cure_colors.get_lut(name, 7).tobytes())
+            self.assertEqual(self.get('/lut/{}?n=256'.format(name))[2], self.cure_colors.get_lut(name, 256).tobytes())
+        # n を省略すると、qualitative は色の数
+        cosmo = self.cure_colors.name_to_cmap.palette('Cure Cosmo')
+        self.assertEqual(len(self.get('/lut/Cure%20Cosmo')[2]), len(cosmo.colors) * 4)
+
+    def test_titles(self):
+        titles = json.loads(self.get('/titles')[2])
+        self.assertEqual(titles, dict((title, list(names)) for title, names in self.cure_colors.title_to_characters.items()))
+        status, _, body = self.get('/titles/ふたりはプリキュア')
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body), list(self.cure_colors.characters_of('Futari wa Pretty Cure')))
+        self.assertEqual(json.loads(self.get('/search?q=cure%20blak&k=1')[2])[0][0], 'Cure Black')
+
+    def test_etag(self):
+        status, headers, body = self.get('/lut/Cure%20White')
+        status, not_modified, empty = self.get('/lut/Cure%20White', {'if-none-match': headers['ETag']})
+        self.assertEqual(status, 304)
+        self.assertEqual(not_modified['ETag'], headers['ETag'])
+        self.assertEqual(empty, b'')
+        self.assertEqual(self.get('/lut/Cure%20White', {'if-none-match': '"0"'})[0], 200)
+        self.assertNotEqual(self.get('/lut/Cure%20White?n=16')[1]['ETag'], headers['ETag'])
+        # HEAD は本文を返さない
+        status, head, body = self.service.handle('HEAD', '/lut/Cure%20White')
+        self.assertEqual((status, body, head['Content-Length']), (200, b'', str(256 * 4)))
+
+    def test_errors(self):
+        self.assertEqual(self.get('/palettes/キュアゴリラ')[0], 404)
+        self.assertEqual(self.get('/lut/キュアゴリラ')[0], 404)
+        self.assertEqual(self.get('/titles/*** PreCure')[0], 404)
+        self.assertEqual(self.get('/colormaps')[0], 404)
+        self.assertEqual(self.get('/lut/Cure%20Black?n=0')[0], 400)
+        self.assertEqual(self.get('/lut/Cure%20Black?n=many')[0], 400)
+        self.assertEqual(self.get('/lut/Cure%20Black?n={}'.format(precure_service.MAX_LUT_SIZE + 1))[0], 400)
+        self.assertEqual(self.get('/search?q=cure&k=0')[0], 400)
+        self.assertEqual(self.get('/search?q=cure&k=-1')[0], 400)
+        self.assertEqual(self.service.handle('POST', '/palettes')[0], 405)
+
+    def test_response_cache(self):
+        # 段階数を指定した LUT と検索の結果はキャッシュせず、cure_colors の LUT のキャッシュにも入れない
+        service = precure_service.cure_service(self.cure_colors)
+        luts = len(self.cure_colors.name_to_cmap._luts)
+        for i in range(20):
+            self.assertEqual(service.handle('GET', '/search?q=cure{}'.format(i))[0], 200)
+            self.assertEqual(service.handle('GET', '/lut/Cure%20Black?n={}'.format(i + 2))[0], 200)
+        self.assertEqual(len(service._responses), 0)
+        self.assertEqual(len(self.cure_colors.name_to_cmap._luts), luts)
+        # 既定の段階数の LUT はキャッシュする
+        body = service.handle('GET', '/lut/Cure%20Black')[2]
+        self.assertIs(service.handle('GET', '/lut/Cure%20Black')[2], body)
+        self.assertEqual(service.handle('GET', '/lut/Cure%20Black?n=256')[2], body)
+
+        # キャッシュする応答の数には上限がある
+        for i in range(precure_service.RESPONSE_CACHE_SIZE + 10):
+            service.handle('GET', '/version?{}'.format(i))
+        self.assertEqual(len(service._responses), precure_service.RESPONSE_CACHE_SIZE)
+        self.assertNotIn(('/lut/Cure%20Black', ''), service._responses)
+
+    def test_update_palette(self):
+        # 変わった配色の応答だけを作り直す
+        registry = precure_colormap.get_registry()
+        service = precure_service.cure_service(self.cure_colors)
+        try:
+            white = service.handle('GET', '/lut/Cure%20White')
+            black = service.handle('GET', '/lut/Cure%20Black')
+            precure_colormap.update_palette('Cure Black', colors=['#000000', '#FF69B4'])
+            self.assertIs(service.handle('GET', '/lut/Cure%20White')[2], white[2])
+            updated = service.handle('GET', '/lut/Cure%20Black')
+            self.assertNotEqual(updated[1]['ETag'], black[1]['ETag'])
+            self.assertEqual(updated[2], self.cure_colors.get_lut('Cure Black').tobytes())
+            self.assertEqual(service.handle('GET', '/lut/Cure%20Black', {'if-none-match': black[1]['ETag']})[0], 200)
+            self.assertEqual(json.loads(service.handle('GET', '/palettes/Cure%20Black')[2])['colors'],
+                             ['#000000', '#FF69B4'])
+            self.assertEqual(service.handle('GET', '/lut/Cure%20White')[1]['ETag'], white[1]['ETag'])
+
+            precure_colormap.unregister_palette('Cure Black')
+            self.assertEqual(service.handle('GET', '/lut/Cure%20Black')[0], 404)
+            self.assertEqual(json.loads(service.handle('GET', '/titles/Futari%20wa%20Pretty%20Cure')[2]), ['Cure White'])
+        finally:
+            precure_colormap._registry = registry
+
+
+class test_client(unittest.TestCase) :
+    @classmethod
+    def setUpClass(cls):
+        cls.cure_colors = cure_colormap()
+        cls.service = precure_service.cure_service(cls.cure_colors)
+        cls.server = _server_thread(cls.service, host='127.0.0.1', port=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        self.client = precure_client.cure_colormap_client(port=self.server.port)
+
+    def tearDown(self):
+        self.client.close()
+
+    def test_mirrors_cure_colormap(self):
+        self.assertEqual(self.client.version(), self.service._registry.version)
+        self.assertTrue(np.array_equal(self.client.get_lut('キュアブラック'), self.cure_colors.get_lut('キュアブラック')))
+        self.assertTrue(np.array_equal(self.client.get_lut('Cure Black', 9), self.cure_colors.get_lut('Cure Black', 9)))
+        self.assertEqual(self.client.characters_of('ふたりはプリキュア'), self.cure_colors.characters_of('ふたりはプリキュア'))
+        self.assertEqual(self.client.title_of('キュアブラック'), self.cure_colors.title_of('キュアブラック'))
+        self.assertEqual(self.client.title_to_characters, dict(self.cure_colors.title_to_characters))
+        self.assertEqual(self.client.search('cure blak', 3), self.cure_colors.search('cure blak', 3))
+        self.assertIsNone(self.client.get_by_name('キュアゴリラ'))
+        self.assertIsNone(self.client.characters_of('*** PreCure'))
+
+    def test_remote_colormap(self):
+        # 呼び出すと matplotlib の Colormap と同じ色を返す
+        X = np.array([[-0.5, 0.0, 0.3], [0.5, 0.999, 1.0], [1.5, np.nan, 0.75]])
+        for name in ['キュアブラック', 'キュアエース']:
+            remote = self.client.get_by_name(name)
+            cmap = self.cure_colors.get_by_name(name)
+            self.assertTrue(np.array_equal(remote(X, bytes=True), cmap(X, bytes=True)))
+            self.assertTrue(np.allclose(remote(X), cmap(X), atol=1 / 255))
+            self.assertTrue(np.array_equal(remote(0.3, bytes=True), cmap(0.3, bytes=True)))
+            self.assertTrue(np.array_equal(remote.to_matplotlib()(X, bytes=True), cmap(X, bytes=True)))
+        self.assertEqual(self.client.cure_black.name, 'Cure Black')
+        with self.assertRaises(AttributeError):
+            self.client.cure_gorilla
+
+    def test_lut_native_size(self):
+        # n を省略した LUT の段階数はサービスが決める (cure_colormap.get_lut と同じ)
+        for name in ['Cure Cosmo', 'Cure Black']:
+            self.assertTrue(np.array_equal(self.client.get_lut(name), self.cure_colors.get_lut(name)))
+        self.assertEqual(self.client.get_by_name('キュアコスモ').N, self.cure_colors.get_by_name('キュアコスモ').N)
+
+    def test_cache_size(self):
+        # 取っておく応答の数には上限があり、最近使ったものを残す
+        size = precure_client.CACHE_SIZE
+        precure_client.CACHE_SIZE = 3
+        try:
+            for name in ['Cure Black', 'Cure White', 'Cure Bloom', 'Cure Black', 'Cure Egret']:
+                self.client.get_lut(name)
+        finally:
+            precure_client.CACHE_SIZE = size
+        self.assertEqual(list(self.client._cache), ['/lut/Cure%20Bloom', '/lut/Cure%20Black', '/lut/Cure%20Egret'])
+
+    def test_long_line(self):
+        # 長すぎるリクエストの行・ヘッダーには 400 を返す
+        for request in [b'GET /' + b'a' * (2 * precure_service._MAX_LINE) + b' HTTP/1.1\r\n\r\n',
+                        b'GET /version HTTP/1.1\r\nX-Long: ' + b'a' * (2 * precure_service._MAX_LINE) + b'\r\n\r\n']:
+            with socket.create_connection(('127.0.0.1', self.server.port), timeout=10) as sock:
+                sock.sendall(request)
+                self.assertTrue(sock.makefile('rb').readline().startswith(b'HTTP/1.1 400 '))
+
+    def test_etag_cache(self):
+        lut = self.client.get_lut('Cure White')
+        target = '/lut/Cure%20White'
+        etag, body = self.client._cache[target]
+        # 2回目は 304 で、取っておいた本文を使う
+        self.assertEqual(self.service.handle('GET', target, {'if-none-match': etag})[0], 304)
+        self.assertTrue(np.array_equal(self.client.get_lut('Cure White'), lut))
+        self.assertIs(self.client._cache[target][1], body)
+
+    def test_unix_socket(self):
+        if not hasattr(socket, 'AF_UNIX'):
+            self.skipTest('Unix sockets are not available')
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'precure.sock')
+            server = _server_thread(self.service, path=path)
+            try:
+                client = precure_client.cure_colormap_client(path=path)
+                self.assertTrue(np.array_equal(client.get_lut('Cure Bloom'), self.cure_colors.get_lut('Cure Bloom')))
+                self.assertEqual(client.characters_of('Futari wa Pretty Cure'),
+                                 self.cure_colors.characters_of('Futari wa Pretty Cure'))
+                client.close()
+            finally:
+                server.stop()
+
+    def test_no_matplotlib(self):
+        # クライアントは matplotlib を読み込まない
+        cwd = os.path.dirname(os.path.abspath(__file__))
+        script = ('import sys, precure_client; '
+                  'cmap = precure_client.cure_colormap_client(port={}).get_by_name("Cure Black"); '
+                  'cmap([0.0, 1.0]); '
+                  'print(cmap.name, "matplotlib" in sys.modules)').format(self.server.port)
+        result = subprocess.run([sys.executable, '-c', script], cwd=cwd, check=True, capture_output=True, text=True)
+        self.assertEqual(result.stdout.split(), ['Cure', 'Black', 'False'])
+
+
+
+#########################################################
+#                                                       #
+# main                                                  #
+#                                                       #
+#########################################################
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
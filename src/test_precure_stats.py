@@ -0,0 +1,83 @@
+#########################################################
+#                                                       #
+# test_precure_stats.py                                 #
+#                                                       #
+# precure_stats のテスト                                 #
+#                                                       #
+#########################################################
+
+
+import unittest
+
+import precure_stats
+from precure_colormap import cure_colormap
+
+
+
+class test_stats(unittest.TestCase) :
+    def setUp(self):
+        self.cure_colors = cure_colormap()
+        self.events = []
+        self.stats = precure_stats.enable(callback=lambda event, seconds: self.events.append((event, seconds)))
+        precure_stats.reset()
+
+    def tearDown(self):
+        precure_stats.disable()
+
+    def test_disabled(self):
+        # 無効なときは何も記録しない
+        precure_stats.disable()
+        self.cure_colors.get_by_name('キュアブラック')
+        self.assertIsNone(precure_stats.get_stats())
+        self.assertEqual(self.events, [])
+        self.assertEqual(self.stats.snapshot(), {'counts': {}, 'timings': {}})
+
+    def test_get_by_name(self):
+        self.cure_colors.get_by_name('キュアブラック')
+        self.cure_colors.get_by_name('Cure Black')
+        self.cure_colors.get_by_name('キュアゴリラ')
+        stats = precure_stats.get_stats()
+        self.assertEqual(stats['counts']['get_by_name.hit'], 2)
+        self.assertEqual(stats['counts']['get_by_name.miss'], 1)
+        # 2回目はキャッシュから
+        self.assertEqual(stats['counts']['cmap_cache.miss'], 1)
+        self.assertEqual(stats['counts']['cmap_cache.hit'], 1)
+        timing = stats['timings']['get_by_name']
+        self.assertEqual(timing['count'], 3)
+        self.assertTrue(0 <= timing['min'] <= timing['mean'] <= timing['max'])
+        self.assertIn(('get_by_name.miss', None), self.events)
+
+    def test_generate_cure_cmap(self):
+        self.cure_colors.generate_cure_cmap(['black', 'white'], ['cure_tmp'])
+        timings = precure_stats.get_stats()['timings']
+        self.assertEqual(timings['generate_cure_cmap']['count'], 1)
+        self.assertEqual(timings['generate_cmap']['count'], 1)
+        self.assertIn('generate_cure_cmap', [event for event, seconds in self.events if seconds is not None])
+
+    def test_plot_color_maps(self):
+        self.cure_colors.plot_color_maps('Futari wa Pretty Cure', ['Cure Black', 'Cure White'])
+        stats = precure_stats.get_stats()
+        self.assertEqual(stats['timings']['plot_color_maps']['count'], 1)
+        self.assertEqual(stats['timings']['plot_color_maps.subplots']['count'], 1)
+        self.assertEqual(stats['timings']['plot_color_maps.swatch']['count'], 2)
+        self.assertEqual(stats['timings']['plot_color_maps.imshow']['count'], 2)
+        self.assertEqual(stats['counts']['lut_cache.miss'], 2)
+
+    def test_reset(self):
+        self.cure_colors.get_by_name('キュアブラック')
+        precure_stats.reset()
+        self.assertEqual(precure_stats.get_stats(), {'counts': {}, 'timings': {}})
+        # disable は最後の集計結果を返す
+        self.cure_colors.get_by_name('キュアブラック')
+        self.assertEqual(precure_stats.disable()['counts']['get_by_name.hit'], 1)
+
+
+
+#########################################################
+#                                                       #
+# main                                                  #
+#                                                       #
+#########################################################
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
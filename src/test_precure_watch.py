@@ -0,0 +1,153 @@
+#########################################################
+#                                                       #
+# test_precure_watch.py                                 #
+#                                                       #
+# precure_watch のテスト                                 #
+#                                                       #
+#########################################################
+
+
+import json
+import os
+import tempfile
+import threading
+import unittest
+
+import numpy as np
+
+import precure_colormap
+import precure_watch
+from precure_colormap import cure_colormap
+
+
+
+class test_watch(unittest.TestCase) :
+    def setUp(self):
+        self.registry = precure_colormap.get_registry()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cure_colors = cure_colormap()
+        self.watcher = precure_watch.palette_watcher(self.tmpdir.name)
+
+    def tearDown(self):
+        self.watcher.stop()
+        precure_colormap._registry = self.registry
+        self.tmpdir.cleanup()
+
+    def write(self, filename, palettes, mtime=None):
+        path = os.path.join(self.tmpdir.name, filename)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'palettes': palettes}, f, ensure_ascii=False)
+        # 更新時刻の分解能によらず、変更を見つけられるようにする
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+        return path
+
+    def test_poll(self):
+        white = self.cure_colors.get_by_name('Cure White')
+        self.write('a.json', [{'names': ['キュアプレシャス', 'Cure Precious'], 'colors': ['#E4007F', 'white']},
+                              {'names': ['Cure Spicy'], 'kind': 'qualitative', 'colors': ['#FFD700', '#F5F5DC']}])
+        self.assertEqual(self.watcher.poll(), (['Cure Precious', 'Cure Spicy'], []))
+        precious = self.cure_colors.get_by_name('キュアプレシャス')
+        spicy = self.cure_colors.get_by_name('Cure Spicy')
+        self.assertIsNotNone(precious)
+        # 変わっていなければ何もしない
+        self.assertEqual(self.watcher.poll(), ([], []))
+
+        # 変わった配色だけを置き換える
+        self.write('a.json', [{'names': ['キュアプレシャス', 'Cure Precious'], 'colors': ['#E4007F', 'black']},
+                              {'names': ['Cure Spicy'], 'kind': 'qualitative', 'colors': ['#FFD700', '#F5F5DC']}],
+                   mtime=1)
+        self.assertEqual(self.watcher.poll(), (['Cure Precious'], []))
+        self.assertIsNot(self.cure_colors.get_by_name('キュアプレシャス'), precious)
+        self.assertIs(self.cure_colors.get_by_name('Cure Spicy'), spicy)
+        self.assertIs(self.cure_colors.get_by_name('Cure White'), white)
+        self.assertTrue(np.array_equal(self.cure_colors.get_lut('Cure Precious')[-1], [0, 0, 0, 255]))
+
+        os.remove(os.path.join(self.tmpdir.name, 'a.json'))
+        self.assertEqual(self.watcher.poll(), ([], ['Cure Precious', 'Cure Spicy']))
+        self.assertIsNone(self.cure_colors.get_by_name('Cure Spicy'))
+
+    def test_override_builtin(self):
+        # 組み込みの配色を上書きし、ファイルを消したら元に戻す
+        builtin = precure_colormap.get_registry().palettes['Cure Black']
+        path = self.write('black.json', [{'names': ['キュアブラック', 'Cure Black'], 'colors': ['black', 'red']}])
+        self.watcher.poll()
+        self.assertEqual(self.cure_colors.name_to_cmap.find('キュアブラック').colors, ('black', 'red'))
+        self.assertEqual(self.cure_colors.title_of('Cure Black'), 'Futari wa Pretty Cure')
+        os.remove(path)
+        self.watcher.poll()
+        self.assertIs(precure_colormap.get_registry().palettes['Cure Black'], builtin)
+
+    def test_invalid_file(self):
+        # 読めないファイルは飛ばし、直ったら読む
+        path = os.path.join(self.tmpdir.name, 'broken.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('{"palettes": [')
+        self.assertEqual(self.watcher.poll(), ([], []))
+        self.assertIn(path, self.watcher.errors)
+        self.write('broken.json', [{'names': ['Cure Gorilla'], 'colors': ['gorilla']}], mtime=1)
+        self.assertEqual(self.watcher.poll(), ([], []))
+        self.write('broken.json', [{'names': ['Cure Gorilla'], 'colors': ['#654321']}], mtime=2)
+        self.assertEqual(self.watcher.poll(), (['Cure Gorilla'], []))
+        self.assertEqual(self.watcher.errors, {})
+
+    def test_name_collision(self):
+        # ほかの配色の名称・属性名を使う配色のファイルは、前の内容のままにする
+        path = self.write('mine.json', [{'names': ['My Black'], 'colors': ['black', 'gray']}])
+        self.assertEqual(self.watcher.poll(), (['My Black'], []))
+        mine = self.cure_colors.get_by_name('My Black')
+        self.write('mine.json', [{'names': ['キュアブラック', 'My Black'], 'attribute': 'cure_white',
+                                  'colors': ['black', 'white']}], mtime=1)
+        self.write('other.json', [{'names': ['My White'], 'colors': ['white', 'gray']}])
+        self.assertEqual(self.watcher.poll(), (['My White'], []))
+        self.assertIn(path, self.watcher.errors)
+        self.assertIs(self.cure_colors.get_by_name('My Black'), mine)
+        self.assertEqual(self.cure_colors.title_of('キュアブラック'), 'Futari wa Pretty Cure')
+        self.assertEqual(self.cure_colors.name_to_cmap.find('cure_white').name, 'Cure White')
+
+        # 直ったら読む
+        self.write('mine.json', [{'names': ['My Black'], 'colors': ['black', 'white']}], mtime=2)
+        self.assertEqual(self.watcher.poll(), (['My Black'], []))
+        self.assertNotIn(path, self.watcher.errors)
+
+    def test_thread_errors(self):
+        # callback の例外で監視を止めない
+        reloaded = threading.Event()
+
+        def callback(changed, removed):
+            reloaded.set()
+            raise RuntimeError('callback failed')
+
+        self.watcher = precure_watch.watch_palettes(self.tmpdir.name, interval=0.01, callback=callback)
+        self.write('a.json', [{'names': ['Cure Precious'], 'colors': ['#E4007F', 'white']}])
+        self.assertTrue(reloaded.wait(5))
+        reloaded.clear()
+        self.write('b.json', [{'names': ['Cure Spicy'], 'colors': ['#FFD700', 'white']}])
+        self.assertTrue(reloaded.wait(5))
+        self.assertIsInstance(self.watcher.last_error, RuntimeError)
+        self.assertTrue(self.watcher._thread.is_alive())
+
+    def test_thread(self):
+        changes = []
+        reloaded = threading.Event()
+
+        def callback(changed, removed):
+            changes.append((changed, removed))
+            reloaded.set()
+
+        self.watcher = precure_watch.watch_palettes(self.tmpdir.name, interval=0.01, callback=callback)
+        self.write('a.json', [{'names': ['Cure Precious'], 'colors': ['#E4007F', 'white']}])
+        self.assertTrue(reloaded.wait(5))
+        self.assertEqual(changes, [(['Cure Precious'], [])])
+        self.assertIsNotNone(self.cure_colors.get_by_name('Cure Precious'))
+
+
+
+#########################################################
+#                                                       #
+# main                                                  #
+#                                                       #
+#########################################################
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)